@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+
+import argparse
+import json
+import math
+import random
+import sys
+import arinna.config as config
+import arinna.schema as schema
+from arinna.poller import AdaptivePoller
+from report_by_exception_benchmark import FakeClock, qpigs
+
+
+def cloudy_qpigs(t, rng, depth, period=3600, length=300):
+    response = qpigs(t, rng)
+    phase = t % period
+    voltage = float(response['pv_input_voltage'][0])
+    if voltage > 20 and phase < length:
+        voltage -= depth * math.sin(math.pi * phase / length)
+        response['pv_input_voltage'][0] = '{:05.1f}'.format(max(0, voltage))
+    return response
+
+
+def qmod(t):
+    day = math.sin(2 * math.pi * t / 86400) * 0.5 + 0.5
+    return {'device_mode': ['Battery' if day > 0.3 else 'Line', '']}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description='Adaptive polling against a fixed timer on a synthetic '
+                    'day')
+    parser.add_argument('--hours', type=float, default=24)
+    parser.add_argument('--fixed-interval', type=float, default=10)
+    parser.add_argument('--cloud-depth', type=float, default=40,
+                        help='PV voltage dip of a 5 minute cloud every hour')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    rng = random.Random(args.seed)
+    clock = FakeClock()
+    decoders = schema.load_decoders()
+    responses = {
+        'QPIGS': lambda: cloudy_qpigs(clock.now, rng, args.cloud_depth),
+        'QMOD': lambda: qmod(clock.now),
+    }
+
+    def publish(command):
+        response = responses.get(command, dict)()
+        for key, (value, unit) in response.items():
+            measurement, parse = decoders[key]
+            poller.observe(measurement, parse(value.encode()))
+
+    poller = AdaptivePoller(config.Config().polling_rates, publish, clock)
+    duration = args.hours * 3600
+    while clock.now < duration:
+        poller.poll()
+        clock.now = poller.next_poll()
+
+    stats = poller.stats()
+    fixed_polls = int(duration / args.fixed_interval)
+    polls = {command: s['polls'] for command, s in stats.items()}
+    fixed = {command: fixed_polls for command in ('QPIGS', 'QMOD')}
+    print(json.dumps({
+        'hours': args.hours,
+        'adaptive_polls': polls,
+        'fixed_polls': fixed,
+        'adaptive_total': sum(polls.values()),
+        'fixed_total': sum(fixed.values()),
+        'mean_interval': {command: duration / count
+                          for command, count in polls.items()},
+    }, indent=2))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+
+import argparse
+import datetime
+import json
+import os
+import platform
+import sys
+import time
+import numpy
+import arinna.backtest as backtest
+
+
+def synthetic_history(days, period, seed=0):
+    rng = numpy.random.default_rng(seed)
+    start = time.time() - days * 86400
+    times = start + numpy.arange(0, days * 86400, period)
+    day = numpy.clip(numpy.sin(2 * numpy.pi * ((times % 86400) / 86400
+                                               - 0.25)), 0, None)
+    return {
+        'battery_voltage': (times, 48 + 8 * day
+                            + rng.normal(0, 0.05, len(times))),
+        'device_mode': (times, numpy.where(day > 0.2, 3.0, 2.0)),
+        'is_charging_to_floating_enabled': (
+            times, (day > 0.9).astype(float)),
+        'pv_charging_power': (times, 1500 * day
+                              + rng.normal(0, 20, len(times))),
+        'pv_input_voltage': (times, 110 * day
+                             + rng.normal(0, 0.5, len(times))),
+    }
+
+
+def timed(function):
+    start = time.perf_counter()
+    value = function()
+    return time.perf_counter() - start, value
+
+
+def run(days, period, component, workers):
+    history = synthetic_history(days, period)
+    prepare_seconds, test = timed(lambda: backtest.Backtest(
+        history, components=[component]))
+    replay_seconds, _ = timed(lambda: test.replay(component))
+    if component == 'charger':
+        values = {'day_bulk_voltage': [54.0, 54.5, 55.0, 55.5],
+                  'night_min_voltage': [46.8, 47.2, 47.6, 48.0]}
+    else:
+        values = {'bulk_voltage': [56.0, 56.4, 56.8, 57.2],
+                  'min_pv_voltage': [85.0, 90.0, 95.0, 100.0]}
+    parameter_grid = backtest.grid(values)
+    sweep_seconds, results = timed(lambda: backtest.sweep(
+        test, component, parameter_grid, workers))
+    return {
+        'points_per_measurement': len(history['battery_voltage'][0]),
+        'steps': results[0]['steps'],
+        'prepare_seconds': prepare_seconds,
+        'replay_seconds': replay_seconds,
+        'parameter_sets': len(parameter_grid),
+        'workers': workers or os.cpu_count(),
+        'sweep_seconds': sweep_seconds,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description='Replay a synthetic history through a controller and '
+                    'sweep its thresholds')
+    parser.add_argument('--days', type=int, default=365)
+    parser.add_argument('--period', type=float, default=10.0,
+                        help='Seconds between samples')
+    parser.add_argument('--component', choices=backtest.COMPONENTS,
+                        default='charger')
+    parser.add_argument('--workers', type=int)
+    parser.add_argument('--output', help='Write results to this JSON file')
+    args = parser.parse_args(argv)
+
+    results = {
+        'benchmark': 'backtest',
+        'date': datetime.datetime.utcnow().isoformat(),
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'days': args.days,
+        'period': args.period,
+        'component': args.component,
+    }
+    results.update(run(args.days, args.period, args.component,
+                       args.workers))
+
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+    print(output)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
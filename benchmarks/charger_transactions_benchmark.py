@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+
+import argparse
+import datetime
+import json
+import math
+import sys
+import arinna.config as config
+from arinna.charger import Charger, ChargingManager, InverterSettings
+from arinna.charger import DISABLED_SETTINGS
+from tests.fakes.inverter import FakeInverter
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class SyntheticDatabase:
+    def __init__(self, clock):
+        self.clock = clock
+
+    def moving_aggregates(self, specs):
+        day = math.sin(2 * math.pi * (self.clock.now - 21600) / 86400) \
+            * 0.5 + 0.5
+        values = {
+            'battery_voltage': 47 + 8 * day,
+            'is_charging_to_floating_enabled': 1.0 if day > 0.9 else 0.0,
+        }
+        return {spec: values[spec[1]] for spec in specs}
+
+
+def simulate(charger, clock, hours, period):
+    charging_manager = ChargingManager(SyntheticDatabase(clock), charger)
+    start = datetime.datetime(2020, 1, 1)
+    while clock.now < hours * 3600:
+        now = start + datetime.timedelta(seconds=clock.now)
+        charging_manager.process(now.time())
+        clock.now += period
+
+
+def main(argv=None):
+    settings = config.Config()
+    parser = argparse.ArgumentParser(
+        description='Serial transactions sent by the charger in a day')
+    parser.add_argument('--hours', type=float, default=24)
+    parser.add_argument('--period', type=float,
+                        default=settings.charger_period)
+    parser.add_argument('--ttl', type=float,
+                        default=settings.charger_settings_ttl)
+    parser.add_argument('--driver', choices=['mppsolar', 'native'],
+                        default=settings.serial_driver,
+                        help='Format of the QPIRI settings responses')
+    args = parser.parse_args(argv)
+
+    legacy_inverter = FakeInverter()
+    simulate(Charger(legacy_inverter), FakeClock(), args.hours, args.period)
+
+    clock = FakeClock()
+    inverter_settings = InverterSettings(args.ttl, clock)
+    inverter = FakeInverter(inverter_settings, DISABLED_SETTINGS,
+                            args.driver)
+    charger = Charger(inverter, inverter_settings, timeout=0)
+    simulate(charger, clock, args.hours, args.period)
+
+    legacy = len(legacy_inverter.requests)
+    tracked = len(inverter.requests)
+    print(json.dumps({
+        'hours': args.hours,
+        'period': args.period,
+        'ttl': args.ttl,
+        'driver': args.driver,
+        'legacy_transactions': legacy,
+        'tracked_transactions': tracked,
+        'setting_commands': charger.sent,
+        'settings_reads': charger.reads,
+        'saved_transactions': legacy - tracked,
+        'saved_ratio': 1 - tracked / legacy,
+    }, indent=2))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
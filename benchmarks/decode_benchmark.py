@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+
+import argparse
+import collections
+import json
+import logging
+import sys
+import timeit
+import arinna.database_provider as database_provider
+import arinna.schema as schema
+
+logger = logging.getLogger(database_provider.__name__)
+
+SAMPLE_RESPONSE = {
+    'grid_voltage': b'230.0',
+    'grid_frequency': b'49.9',
+    'ac_output_voltage': b'230.0',
+    'ac_output_frequency': b'49.9',
+    'ac_output_apparent_power': b'0161',
+    'ac_output_active_power': b'0119',
+    'output_load_percent': b'003',
+    'bus_voltage': b'460',
+    'battery_voltage': b'57,50',
+    'battery_charging_current': b'012',
+    'battery_capacity': b'100',
+    'inverter_heat_sink_temperature': b'0069',
+    'pv_input_current_for_battery': b'0014',
+    'pv_input_voltage': b'103.8',
+    'battery_voltage_from_scc': b'57.49',
+    'battery_discharge_current': b'00000',
+    'is_sbu_priority_version_added': b'0',
+    'is_configuration_changed': b'0',
+    'is_scc_firmware_updated': b'1',
+    'is_load_on': b'1',
+    'is_battery_voltage_to_steady_while_charging': b'0',
+    'is_charging_on': b'1',
+    'is_scc_charging_on': b'1',
+    'is_ac_charging_on': b'0',
+    'battery_voltage_offset_for_fans_on': b'00',
+    'eeprom_version': b'00',
+    'pv_charging_power': b'00856',
+    'is_charging_to_floating_enabled': b'0',
+    'is_switch_on': b'1',
+    'is_dustproof_installed': b'0',
+    'device_mode': b'Battery',
+}
+
+LEGACY_TYPES = {
+    'float': float,
+    'int': int,
+    'percent': database_provider.percent,
+    'bool_from_string': database_provider.bool_from_string,
+    'int_from_device_mode': database_provider.int_from_device_mode,
+}
+
+
+class FakeMessage:
+    def __init__(self, topic, payload):
+        self.topic = topic
+        self.payload = payload
+
+
+class NullWriter:
+    def add(self, measurement, value, timestamp=None):
+        pass
+
+
+def legacy_subscriptions():
+    return {
+        'inverter/response/' + name: {
+            'measurement': name,
+            'type': LEGACY_TYPES[parser]
+        } for name, parser in schema.load().items()
+    }
+
+
+def legacy_decode(subscriptions, messages):
+    for message in messages:
+        subscription = subscriptions[message.topic]
+        raw_value = message.payload.decode().replace(',', '.')
+        subscription['type'](raw_value)
+
+
+def legacy_on_message(_, user_data, message):
+    try:
+        logger.info('Message received')
+        logger.info('Payload: {}'.format(message.payload))
+        logger.info('Topic: {}'.format(message.topic))
+        subscription = user_data['subscriptions'][message.topic]
+        raw_value = message.payload.decode().replace(',', '.')
+        user_data['writer'].add(subscription['measurement'],
+                                subscription['type'](raw_value))
+    except Exception:
+        logger.exception('Unknown exception occurred in on_message')
+
+
+def legacy_on_messages(user_data, messages):
+    for message in messages:
+        legacy_on_message(None, user_data, message)
+
+
+def table_decode(topic_decoders, messages):
+    for message in messages:
+        _, parse = topic_decoders[message.topic]
+        parse(message.payload)
+
+
+def table_on_message(user_data, messages):
+    for message in messages:
+        database_provider.on_message(None, user_data, message)
+
+
+def measure(function, messages, repeat):
+    best = min(timeit.repeat(function, number=1, repeat=repeat))
+    return len(messages) / best
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Decoder microbenchmark')
+    parser.add_argument('--messages', type=int, default=100000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.WARNING)
+
+    response = list(SAMPLE_RESPONSE.items())
+    messages = [FakeMessage('inverter/response/' + name, payload)
+                for name, payload in
+                (response[i % len(response)] for i in range(args.messages))]
+    subscriptions = legacy_subscriptions()
+    decoders = schema.load_decoders()
+    topic_decoders = schema.topic_decoders(decoders,
+                                           database_provider.RESPONSE_PREFIX)
+    user_data = {
+        'decoders': decoders,
+        'topic_decoders': topic_decoders,
+        'unknown_topics': collections.Counter(),
+        'writer': NullWriter()
+    }
+
+    legacy_user_data = {
+        'subscriptions': subscriptions,
+        'writer': NullWriter()
+    }
+
+    results = {
+        'messages': args.messages,
+        'legacy_on_message_per_second': measure(
+            lambda: legacy_on_messages(legacy_user_data, messages), messages,
+            args.repeat),
+        'legacy_decode_per_second': measure(
+            lambda: legacy_decode(subscriptions, messages), messages,
+            args.repeat),
+        'table_decode_per_second': measure(
+            lambda: table_decode(topic_decoders, messages), messages,
+            args.repeat),
+        'table_on_message_per_second': measure(
+            lambda: table_on_message(user_data, messages), messages,
+            args.repeat),
+    }
+    results['decode_speedup'] = results['table_decode_per_second'] / \
+        results['legacy_decode_per_second']
+    results['on_message_speedup'] = \
+        results['table_on_message_per_second'] / \
+        results['legacy_on_message_per_second']
+    print(json.dumps(results, indent=2))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
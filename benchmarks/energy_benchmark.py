@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+
+import argparse
+import datetime
+import json
+import math
+import platform
+import random
+import sys
+import time
+import numpy
+import arinna.energy as energy
+
+
+def python_loop(times, power, max_gap):
+    total = 0.0
+    previous = None
+    for t, p in zip(times, power):
+        if math.isnan(p):
+            continue
+        if previous is not None and 0 < t - previous[0] <= max_gap:
+            total += (p + previous[1]) * (t - previous[0]) / 2 / 3600
+        previous = (t, p)
+    return total
+
+
+def best_of(repeat, function):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        value = function()
+        timings.append(time.perf_counter() - start)
+    return min(timings), value
+
+
+def run(days, period, repeat, seed=0):
+    rng = random.Random(seed)
+    start = time.time() - days * 86400
+    times = start + numpy.arange(0, days * 86400, period)
+    power = numpy.array([max(0.0, 1500 * math.sin(math.pi * (t % 86400)
+                                                  / 86400)
+                             + rng.gauss(0, 20)) for t in times])
+    power[rng.sample(range(len(power)), len(power) // 100)] = numpy.nan
+    times_list, power_list = times.tolist(), power.tolist()
+    loop_seconds, loop_total = best_of(
+        repeat, lambda: python_loop(times_list, power_list, 60.0))
+    vector_seconds, vector_total = best_of(
+        repeat, lambda: energy.integrate(times, power, 60.0))
+    columns = {
+        'pv_charging_power': power,
+        'ac_output_active_power': power / 2,
+        'battery_charging_current': power / 50,
+        'battery_voltage': numpy.full(len(power), 52.0),
+    }
+    ledger_seconds, _ = best_of(
+        repeat, lambda: energy.EnergyLedger().update(times, columns))
+    return {
+        'samples': len(times),
+        'python_loop_seconds': loop_seconds,
+        'vectorized_seconds': vector_seconds,
+        'speedup': loop_seconds / vector_seconds,
+        'totals_match': math.isclose(loop_total, vector_total),
+        'ledger_update_seconds': ledger_seconds,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description='Vectorized gap-aware energy integration versus a '
+                    'Python loop')
+    parser.add_argument('--days', type=int, default=7)
+    parser.add_argument('--period', type=float, default=10.0,
+                        help='Seconds between samples')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--output', help='Write results to this JSON file')
+    args = parser.parse_args(argv)
+
+    results = {
+        'benchmark': 'energy',
+        'date': datetime.datetime.utcnow().isoformat(),
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'days': args.days,
+        'period': args.period,
+    }
+    results.update(run(args.days, args.period, args.repeat))
+
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+    print(output)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
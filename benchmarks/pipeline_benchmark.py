@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+
+import argparse
+import collections
+import datetime
+import json
+import logging
+import platform
+import queue
+import resource
+import sys
+import threading
+import time
+import arinna.database_provider as database_provider
+import arinna.inverter_provider as inverter_provider
+import arinna.schema as schema
+from arinna.command_queue import CommandQueue, ResponsePublisher
+from arinna.database_client import DatabaseClient
+from arinna.database_writer import DatabaseWriter
+from arinna.inverter_serial import InverterSerial
+from arinna.mqtt_client import MQTTClient
+from tests.fakes.database import FakeDatabase
+from tests.fakes.mqtt import FakeBroker, FakePahoClient
+from tests.fakes.serial import FakeInverterSerial
+
+PAYLOADS = {
+    'QPIGS': b'000.0 00.0 230.0 49.9 0161 0119 003 460 57.50 012 100 '
+             b'0069 0014 103.8 57.49 00000 00110110 00 00 00856 010',
+    'QMOD': b'B',
+}
+
+
+class SimulatedInverter(FakeInverterSerial):
+    def __init__(self, payloads, baudrate):
+        super().__init__(payloads)
+        self.byte_time = 10 / baudrate if baudrate else 0
+
+    def write(self, data):
+        super().write(data)
+        if self.byte_time:
+            time.sleep((len(data) + len(self.response)) * self.byte_time)
+
+
+class Stage:
+    def __init__(self):
+        self.samples = []
+
+    def add(self, value):
+        self.samples.append(value)
+
+    def wrap(self, function):
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                self.add(time.perf_counter() - start)
+        return timed
+
+    def summary(self):
+        samples = sorted(self.samples)
+        if not samples:
+            return {'count': 0}
+        return {
+            'count': len(samples),
+            'mean_ms': 1000 * sum(samples) / len(samples),
+            'p50_ms': 1000 * percentile(samples, 0.5),
+            'p95_ms': 1000 * percentile(samples, 0.95),
+            'p99_ms': 1000 * percentile(samples, 0.99),
+            'max_ms': 1000 * samples[-1],
+        }
+
+
+def percentile(samples, q):
+    return samples[min(len(samples) - 1, int(q * len(samples)))]
+
+
+def peak_rss_kb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def run(rate, duration, baudrate, batch_size, flush_interval,
+        snapshots=False):
+    stages = collections.OrderedDict(
+        (name, Stage()) for name in ['queue_wait', 'serial', 'publish',
+                                     'database_provider', 'database_write'])
+    broker = FakeBroker()
+
+    database = FakeDatabase()
+    database.create_database('inverter')
+    db_client = DatabaseClient(database)
+    db_client.save_points = stages['database_write'].wrap(
+        db_client.save_points)
+    writer = DatabaseWriter(db_client, batch_size, flush_interval)
+    decoders = schema.load_decoders()
+    prefix = database_provider.SNAPSHOT_PREFIX if snapshots \
+        else database_provider.RESPONSE_PREFIX
+    consumer = MQTTClient(FakePahoClient(broker),
+                          on_connect=database_provider.on_connect,
+                          on_message=stages['database_provider'].wrap(
+                              database_provider.on_message),
+                          user_data={
+                              'decoders': decoders,
+                              'topic_decoders': schema.topic_decoders(
+                                  decoders, database_provider.RESPONSE_PREFIX),
+                              'topics': [prefix + '#'],
+                              'unknown_topics': collections.Counter(),
+                              'writer': writer,
+                          })
+
+    command_queue = CommandQueue()
+    producer = MQTTClient(FakePahoClient(broker))
+    subscriber = inverter_provider.InverterMQTTSubscriber(command_queue,
+                                                          producer)
+    publisher = inverter_provider.InverterMQTTPublisher(
+        producer, publish_fields=not snapshots, publish_snapshots=snapshots)
+    publisher.publish_response = stages['publish'].wrap(
+        publisher.publish_response)
+    response_publisher = ResponsePublisher(publisher)
+    serial = InverterSerial(
+        '/dev/null', baudrate,
+        serial_factory=lambda *args: SimulatedInverter(PAYLOADS, baudrate))
+    serial.send_command = stages['serial'].wrap(serial.send_command)
+
+    requester = MQTTClient(FakePahoClient(broker))
+    stop_event = threading.Event()
+
+    def serve():
+        while not stop_event.is_set() or not command_queue.empty():
+            try:
+                command = command_queue.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            stages['queue_wait'].add(command_queue.last_wait_time)
+            inverter_provider.handle_command(command, serial, command_queue,
+                                             response_publisher)
+
+    writer.start()
+    consumer.connect()
+    consumer.loop_start()
+    while not consumer.mqtt_client.subscriptions:
+        time.sleep(0.01)
+    producer.connect()
+    producer.loop_start()
+    subscriber.subscribe_request()
+    response_publisher.start()
+    worker = threading.Thread(target=serve, daemon=True)
+    worker.start()
+
+    requests = 0
+    start = time.monotonic()
+    next_request = start
+    commands = list(PAYLOADS)
+    while time.monotonic() - start < duration:
+        requester.publish('inverter/request', commands[requests % 2])
+        requests += 1
+        next_request += 1 / rate
+        delay = next_request - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+    stop_event.set()
+    worker.join()
+    response_publisher.stop()
+    producer.loop_stop()
+    consumer.loop_stop()
+    writer.stop()
+    elapsed = time.monotonic() - start
+
+    points = len(database.data['inverter'])
+    return {
+        'requests': requests,
+        'commands_served': command_queue.served,
+        'commands_coalesced': command_queue.coalesced,
+        'commands_dropped': command_queue.dropped,
+        'points_stored': points,
+        'elapsed_s': elapsed,
+        'requests_per_s': requests / elapsed,
+        'commands_per_s': command_queue.served / elapsed,
+        'points_per_s': points / elapsed,
+        'stages': {name: stage.summary() for name, stage in stages.items()},
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description='End-to-end inverter to database pipeline benchmark')
+    parser.add_argument('--rates', type=float, nargs='+',
+                        default=[10, 100, 1000],
+                        help='Request rates in requests/s')
+    parser.add_argument('--duration', type=float, default=5)
+    parser.add_argument('--baudrate', type=int, default=0,
+                        help='Simulated serial speed, 0 for instant')
+    parser.add_argument('--batch-size', type=int, default=100)
+    parser.add_argument('--flush-interval', type=float, default=1.0)
+    parser.add_argument('--snapshots', action='store_true')
+    parser.add_argument('--log-level', default='WARNING')
+    parser.add_argument('--output', help='Write results to this JSON file')
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=args.log_level)
+
+    results = {
+        'benchmark': 'pipeline',
+        'date': datetime.datetime.utcnow().isoformat(),
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'settings': {
+            'duration': args.duration,
+            'baudrate': args.baudrate,
+            'batch_size': args.batch_size,
+            'flush_interval': args.flush_interval,
+            'snapshots': args.snapshots,
+        },
+        'runs': [],
+    }
+    for rate in args.rates:
+        result = run(rate, args.duration, args.baudrate, args.batch_size,
+                     args.flush_interval, args.snapshots)
+        result['rate'] = rate
+        result['peak_rss_kb'] = peak_rss_kb()
+        results['runs'].append(result)
+
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+    print(output)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
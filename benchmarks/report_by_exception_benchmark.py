@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+
+import argparse
+import json
+import math
+import random
+import sys
+import arinna.config as config
+from arinna.inverter_provider import ExceptionFilter
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def qpigs(t, rng):
+    day = math.sin(2 * math.pi * t / 86400) * 0.5 + 0.5
+    pv_power = max(0.0, 1500 * day + rng.gauss(0, 20))
+    load = 300 + 200 * math.sin(2 * math.pi * t / 7200) + rng.gauss(0, 15)
+    return {
+        'grid_voltage': ['{:05.1f}'.format(230 + rng.gauss(0, 1)), 'V'],
+        'grid_frequency': ['{:04.1f}'.format(50 + rng.gauss(0, 0.05)), 'Hz'],
+        'ac_output_voltage': ['{:05.1f}'.format(230 + rng.gauss(0, 0.5)),
+                              'V'],
+        'ac_output_frequency': ['50.0', 'Hz'],
+        'ac_output_apparent_power': ['{:04d}'.format(int(load * 1.2)), 'VA'],
+        'ac_output_active_power': ['{:04d}'.format(int(load)), 'W'],
+        'output_load_percent': ['{:03d}'.format(int(load / 40)), '%'],
+        'bus_voltage': ['{:03d}'.format(int(460 + rng.gauss(0, 1))), 'V'],
+        'battery_voltage': ['{:05.2f}'.format(
+            50 + 4 * day + rng.gauss(0, 0.03)), 'V'],
+        'battery_charging_current': ['{:03d}'.format(
+            int(pv_power / 55)), 'A'],
+        'battery_capacity': ['{:03d}'.format(int(60 + 40 * day)), '%'],
+        'inverter_heat_sink_temperature': ['{:04d}'.format(
+            int(40 + 10 * day)), 'Deg_C'],
+        'pv_input_current_for_battery': ['{:04d}'.format(
+            int(pv_power / 55)), 'A'],
+        'pv_input_voltage': ['{:05.1f}'.format(
+            100 * day + rng.gauss(0, 0.5)), 'V'],
+        'battery_voltage_from_scc': ['{:05.2f}'.format(
+            50 + 4 * day + rng.gauss(0, 0.03)), 'V'],
+        'battery_discharge_current': ['{:05d}'.format(
+            int(max(0.0, load - pv_power) / 50)), 'A'],
+        'is_sbu_priority_version_added': ['0', ''],
+        'is_configuration_changed': ['0', ''],
+        'is_scc_firmware_updated': ['1', ''],
+        'is_load_on': ['1', ''],
+        'is_battery_voltage_to_steady_while_charging': ['0', ''],
+        'is_charging_on': ['1' if pv_power > 0 else '0', ''],
+        'is_scc_charging_on': ['1' if pv_power > 0 else '0', ''],
+        'is_ac_charging_on': ['0', ''],
+        'battery_voltage_offset_for_fans_on': ['00', '10mV'],
+        'eeprom_version': ['00', ''],
+        'pv_charging_power': ['{:05d}'.format(int(pv_power)), 'W'],
+        'is_charging_to_floating_enabled': ['1' if day > 0.9 else '0', ''],
+        'is_switch_on': ['1', ''],
+        'is_dustproof_installed': ['0', ''],
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description='Report-by-exception suppression on a synthetic day')
+    parser.add_argument('--hours', type=float, default=24)
+    parser.add_argument('--poll-interval', type=float, default=10)
+    parser.add_argument('--keyframe-interval', type=float, default=60)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    rng = random.Random(args.seed)
+    clock = FakeClock()
+    response_filter = ExceptionFilter(args.keyframe_interval,
+                                      config.Config().deadbands, clock)
+    polls = int(args.hours * 3600 / args.poll_interval)
+    for _ in range(polls):
+        response_filter.filter(qpigs(clock.now, rng), 'QPIGS')
+        clock.now += args.poll_interval
+
+    print(json.dumps({
+        'polls': polls,
+        'fields': response_filter.published + response_filter.suppressed,
+        'published': response_filter.published,
+        'suppressed': response_filter.suppressed,
+        'suppression_ratio': response_filter.suppression_ratio(),
+    }, indent=2))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
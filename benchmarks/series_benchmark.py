@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+
+import argparse
+import datetime
+import json
+import math
+import platform
+import random
+import sys
+import time
+from arinna.database_client import DatabaseClient
+from arinna.memory_database import MemoryDatabase
+
+try:
+    from influxdb.resultset import ResultSet
+except ImportError:
+    ResultSet = None
+
+SECOND = 10 ** 9
+
+MEASUREMENTS = ['battery_voltage', 'pv_input_voltage', 'output_load_percent']
+
+
+class RecordedDatabase:
+    def __init__(self, backend):
+        self.backend = backend
+        self.responses = {}
+
+    def query(self, query, **kwargs):
+        key = (query, kwargs.get('epoch'))
+        if key not in self.responses:
+            result = self.backend.query(query, **kwargs)
+            self.responses[key] = result
+            if ResultSet is not None:
+                results = result if isinstance(result, list) else [result]
+                results = [ResultSet(r.raw) for r in results]
+                self.responses[key] = \
+                    results if isinstance(result, list) else results[0]
+        return self.responses[key]
+
+
+def populate(database, days, period, seed=0):
+    rng = random.Random(seed)
+    now = database.clock()
+    count = int(days * 86400 / period)
+    for measurement in MEASUREMENTS:
+        database.write_points([
+            {'measurement': measurement,
+             'time': now - int((count - i) * period * SECOND),
+             'fields': {'value': 50 + 4 * math.sin(i / 8640)
+                        + rng.gauss(0, 0.03)}}
+            for i in range(count)], database='inverter')
+    return count
+
+
+def best_of(repeat, function):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def run(days, period, buckets, repeat):
+    now = int(time.time() * 10 ** 9)
+    database = MemoryDatabase(clock=lambda: now)
+    database.create_database('inverter')
+    points = populate(database, days, period)
+    database_client = DatabaseClient(RecordedDatabase(database))
+    window = '{}d'.format(days)
+    results = {
+        'points_per_measurement': points,
+        'influxdb_result_sets': ResultSet is not None,
+        'load_seconds': best_of(repeat, lambda: [
+            database_client.load(m, window) for m in MEASUREMENTS]),
+        'load_points_seconds': best_of(repeat, lambda: [
+            database_client.load_points(m, window) for m in MEASUREMENTS]),
+    }
+    for bucket in buckets:
+        results['series_{}_seconds'.format(bucket)] = best_of(
+            repeat, lambda: database_client.series(MEASUREMENTS, window,
+                                                   bucket))
+        results['series_{}_buckets'.format(bucket)] = len(
+            database_client.series(MEASUREMENTS, window, bucket).time)
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description='Client-side cost of time-bucketed NumPy series versus '
+                    'per-point load() on recorded query responses')
+    parser.add_argument('--days', type=int, default=7)
+    parser.add_argument('--period', type=float, default=10.0,
+                        help='Seconds between points')
+    parser.add_argument('--bucket', action='append', dest='buckets',
+                        help='GROUP BY interval, e.g. 1m')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--output', help='Write results to this JSON file')
+    args = parser.parse_args(argv)
+
+    results = {
+        'benchmark': 'series',
+        'date': datetime.datetime.utcnow().isoformat(),
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'measurements': MEASUREMENTS,
+        'days': args.days,
+        'period': args.period,
+    }
+    results.update(run(args.days, args.period, args.buckets or ['10s', '1m'],
+                       args.repeat))
+
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+    print(output)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+
+import argparse
+import datetime
+import json
+import os
+import platform
+import subprocess
+import sys
+
+COMPONENT_MODULES = {
+    'database_provider': ['arinna.database_provider', 'influxdb',
+                          'paho.mqtt.client', 'yaml'],
+    'inverter_provider': ['arinna.inverter_provider', 'paho.mqtt.client',
+                          'yaml', 'serial', 'mppsolar'],
+    'publisher': ['arinna.publisher', 'paho.mqtt.client', 'yaml'],
+    'load_balancer': ['arinna.load_balancer', 'influxdb',
+                      'paho.mqtt.client', 'yaml'],
+    'charger': ['arinna.charger', 'influxdb', 'paho.mqtt.client', 'yaml'],
+}
+
+PROBE = '''
+import importlib, json, sys
+missing = []
+for name in sys.argv[1:]:
+    try:
+        importlib.import_module(name)
+    except ImportError:
+        missing.append(name)
+if 'influxdb' in sys.modules:
+    sys.modules['influxdb'].InfluxDBClient()
+if 'paho.mqtt.client' in sys.modules:
+    sys.modules['paho.mqtt.client'].Client()
+with open('/proc/self/status') as f:
+    rss = next(int(line.split()[1]) for line in f
+               if line.startswith('VmRSS:'))
+print(json.dumps({'rss_kb': rss, 'missing': missing}))
+'''
+
+
+def measure(modules):
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(sys.path))
+    result = subprocess.run([sys.executable, '-c', PROBE] + modules,
+                            env=env, stdout=subprocess.PIPE,
+                            stderr=subprocess.PIPE, universal_newlines=True,
+                            check=True)
+    return json.loads(result.stdout)
+
+
+def run(components):
+    separate = {name: measure(COMPONENT_MODULES[name])
+                for name in components}
+    modules = ['arinna.supervisor']
+    for name in components:
+        modules += [m for m in COMPONENT_MODULES[name] if m not in modules]
+    single = measure(modules)
+    total = sum(r['rss_kb'] for r in separate.values())
+    return {
+        'components': components,
+        'separate_processes': separate,
+        'separate_total_rss_kb': total,
+        'single_process_rss_kb': single['rss_kb'],
+        'saved_rss_kb': total - single['rss_kb'],
+        'saved_ratio': 1 - single['rss_kb'] / total,
+        'missing_modules': sorted(set(single['missing'])),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description='Resident memory of one process per component versus '
+                    'a single supervised process')
+    parser.add_argument('--component', action='append', dest='components',
+                        choices=list(COMPONENT_MODULES))
+    parser.add_argument('--output', help='Write results to this JSON file')
+    args = parser.parse_args(argv)
+
+    results = {
+        'benchmark': 'supervisor_memory',
+        'date': datetime.datetime.utcnow().isoformat(),
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+    }
+    results.update(run(args.components or list(COMPONENT_MODULES)))
+
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+    print(output)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,34 +1,31 @@
 #!/bin/sh
 
-cp \
-    arinna-database.service \
-    arinna-inverter.service \
-    arinna-publisher.service \
-    arinna-publisher.timer \
-    arinna-load-balancer.service \
-    arinna-load-balancer.timer \
-    arinna-charger.service \
-    arinna-charger.timer \
-    arinna.target \
-    /etc/systemd/system/
+if [ "$1" = "--single" ]; then
+    units="
+    arinna.service"
+elif [ "$1" = "--daemon" ]; then
+    units="
+    arinna-database.service
+    arinna-inverter.service
+    arinna-publisher.service
+    arinna-publisher.timer
+    arinna-load-balancer-daemon.service
+    arinna-charger-daemon.service"
+else
+    units="
+    arinna-database.service
+    arinna-inverter.service
+    arinna-publisher.service
+    arinna-publisher.timer
+    arinna-load-balancer.service
+    arinna-load-balancer.timer
+    arinna-charger.service
+    arinna-charger.timer"
+fi
+
+cp $units arinna.target /etc/systemd/system/
 systemctl daemon-reload
 
-systemctl enable \
-    arinna-database.service \
-    arinna-inverter.service \
-    arinna-publisher.service \
-    arinna-publisher.timer \
-    arinna-load-balancer.service \
-    arinna-load-balancer.timer \
-    arinna-charger.service \
-    arinna-charger.timer
+systemctl enable $units
 
-systemctl start \
-    arinna-database.service \
-    arinna-inverter.service \
-    arinna-publisher.service \
-    arinna-publisher.timer \
-    arinna-load-balancer.service \
-    arinna-load-balancer.timer \
-    arinna-charger.service \
-    arinna-charger.timer
+systemctl start $units
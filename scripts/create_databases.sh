@@ -8,3 +8,5 @@ curl -POST http://localhost:8086/query --data-urlencode "q=CREATE DATABASE charg
 curl -POST http://localhost:8086/query --data-urlencode "q=CREATE RETENTION POLICY "one_year" ON "inverter" DURATION 52w REPLICATION 1"
 curl -POST http://localhost:8086/query --data-urlencode "q=CREATE RETENTION POLICY "one_year" ON "load" DURATION 52w REPLICATION 1"
 curl -POST http://localhost:8086/query --data-urlencode "q=CREATE RETENTION POLICY "one_year" ON "charger" DURATION 52w REPLICATION 1"
+
+python3 -m arinna rollups --database inverter
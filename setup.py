@@ -13,6 +13,10 @@ setuptools.setup(
     long_description_content_type='text/markdown',
     packages=setuptools.find_packages('src'),
     package_dir={'': 'src'},
+    package_data={'arinna': ['schema.yaml']},
+    entry_points={
+        'console_scripts': ['arinna=arinna.cli:main'],
+    },
     classifiers=(
         'Programming Language :: Python',
         'Programming Language :: Python :: 3',
@@ -29,6 +33,9 @@ setuptools.setup(
         'mpp-solar @ https://github.com/ltowarek/mpp-solar/archive/master.zip'
     ],
     extras_require={
+        'analysis': [
+            'numpy'
+        ],
         'dev': [
             'setuptools_scm',
             'tox',
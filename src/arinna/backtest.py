@@ -0,0 +1,346 @@
+#!/usr/bin/env python3
+
+import collections
+import concurrent.futures
+import csv
+import datetime
+import gzip
+import itertools
+import json
+import logging
+import math
+import os
+import time
+import arinna.tariff as tariff
+from arinna.charger import ENABLED_SETTINGS, ChargingManager
+from arinna.database_client import time_window_seconds
+from arinna.load_balancer import LoadBalancer
+
+logger = logging.getLogger(__name__)
+
+COMPONENTS = ['charger', 'load_balancer']
+
+PARAMETERS = {
+    'charger': ['day_float_voltage', 'day_bulk_voltage',
+                'night_min_voltage'],
+    'load_balancer': ['bulk_voltage', 'float_voltage', 'min_pv_voltage',
+                      'voltage_margin'],
+}
+
+MEASUREMENTS = [
+    'battery_voltage',
+    'device_mode',
+    'is_charging_to_floating_enabled',
+    'pv_charging_power',
+    'pv_input_voltage',
+]
+
+VALUES = {'true': 1.0, 'false': 0.0}
+
+
+def parse_value(value):
+    return VALUES[value] if value in VALUES else float(value)
+
+
+def load_export(directory, measurements=MEASUREMENTS):
+    import numpy
+    history = {}
+    for measurement in measurements:
+        path = os.path.join(directory, measurement + '.csv.gz')
+        logger.info('Loading history: {}'.format(path))
+        with gzip.open(path, 'rt', newline='') as f:
+            rows = csv.reader(f)
+            next(rows)
+            times, values = [], []
+            for _, _, t, value in rows:
+                times.append(int(t))
+                values.append(parse_value(value))
+        times = numpy.array(times, dtype=numpy.int64) / 10 ** 9
+        values = numpy.array(values, dtype=float)
+        order = numpy.argsort(times, kind='stable')
+        history[measurement] = (times[order], values[order])
+        logger.info('Loaded {} points of {}'.format(len(times), measurement))
+    return history
+
+
+def window_bounds(times, at, window):
+    import numpy
+    return (numpy.searchsorted(times, at - window, side='right'),
+            numpy.searchsorted(times, at, side='right'))
+
+
+def window_sums(values, lo, hi):
+    import numpy
+    prefix = numpy.concatenate(([0.0], numpy.cumsum(values)))
+    return prefix[hi] - prefix[lo]
+
+
+def window_extreme(times, values, at, window, sign):
+    import numpy
+    result = numpy.full(len(at), numpy.nan)
+    candidates = collections.deque()
+    times, values = times.tolist(), (sign * values).tolist()
+    j = 0
+    for i, t in enumerate(at.tolist()):
+        while j < len(times) and times[j] <= t:
+            while candidates and candidates[-1][1] <= values[j]:
+                candidates.pop()
+            candidates.append((times[j], values[j]))
+            j += 1
+        while candidates and candidates[0][0] <= t - window:
+            candidates.popleft()
+        if candidates:
+            result[i] = sign * candidates[0][1]
+    return result
+
+
+def moving_aggregate(times, values, at, aggregate, window):
+    import numpy
+    if aggregate in ('max', 'min'):
+        return window_extreme(times, values, at, window,
+                              1 if aggregate == 'max' else -1)
+    lo, hi = window_bounds(times, at, window)
+    counts = hi - lo
+    with numpy.errstate(divide='ignore', invalid='ignore'):
+        if aggregate in ('average', 'true_percentage'):
+            return numpy.where(counts > 0,
+                               window_sums(values, lo, hi) / counts,
+                               numpy.nan)
+        if aggregate == 'stddev':
+            sums = window_sums(values, lo, hi)
+            squares = window_sums(values * values, lo, hi)
+            variance = (squares - sums * sums / counts) / (counts - 1)
+            return numpy.where(counts > 1,
+                               numpy.sqrt(numpy.maximum(variance, 0)),
+                               numpy.nan)
+    raise ValueError('Unsupported aggregate: {}'.format(aggregate))
+
+
+class HistoryDatabase:
+    def __init__(self, history, times, specs=()):
+        self.history = history
+        self.times = times
+        self.step = 0
+        self.values = {}
+        self.columns = {}
+        for spec in specs:
+            self.precompute(spec)
+
+    def precompute(self, spec):
+        if spec not in self.values:
+            aggregate, measurement, time_window = spec
+            times, values = self.history[measurement]
+            self.values[spec] = moving_aggregate(
+                times, values, self.times, aggregate,
+                time_window_seconds(time_window))
+        return self.values[spec]
+
+    def column(self, spec):
+        column = self.columns.get(spec)
+        if column is None:
+            column = self.columns[spec] = self.precompute(spec).tolist()
+        return column
+
+    def moving_aggregates(self, specs):
+        results = {}
+        for spec in specs:
+            value = self.column(spec)[self.step]
+            if math.isnan(value):
+                aggregate, measurement, time_window = spec
+                raise RuntimeError(
+                    'No moving {} available for measurement \"{}\"'
+                    ' and time window \"{}\"'.format(
+                        aggregate.replace('_', ' '), measurement,
+                        time_window))
+            results[spec] = value
+        return results
+
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        state['columns'] = {}
+        return state
+
+    def detach(self):
+        database = HistoryDatabase(None, self.times)
+        database.values = self.values
+        return database
+
+
+class RecordingSwitch:
+    def __init__(self, steps):
+        import numpy
+        self.is_enabled = False
+        self.states = numpy.zeros(steps, dtype=bool)
+        self.switches = 0
+
+    def enable(self):
+        self.set_state(True)
+
+    def disable(self):
+        self.set_state(False)
+
+    def set_state(self, is_enabled):
+        if is_enabled != self.is_enabled:
+            self.switches += 1
+        self.is_enabled = is_enabled
+
+
+class Backtest:
+    def __init__(self, history, start=None, end=None, charger_period=60,
+                 load_balancer_period=10, components=COMPONENTS):
+        import numpy
+        start = start if start is not None else min(
+            times[0] for times, _ in history.values())
+        end = end if end is not None else max(
+            times[-1] for times, _ in history.values())
+        self.periods = {
+            'charger': charger_period,
+            'load_balancer': load_balancer_period,
+        }
+        self.databases = {}
+        self.clock = {}
+        self.windows = {}
+        for component in components:
+            period = self.periods[component]
+            times = numpy.arange(start + period, end + period / 2, period)
+            specs = [('average', 'pv_charging_power', '{}s'.format(period)),
+                     ('average', 'battery_voltage', '{}s'.format(period))]
+            if component == 'charger':
+                specs += ChargingManager.day_rate_specs \
+                    + ChargingManager.night_rate_specs
+                self.clock[component] = [
+                    datetime.datetime.fromtimestamp(t).time()
+                    for t in times.tolist()]
+                self.windows[component] = numpy.array(
+                    [tariff.window(now) for now in self.clock[component]])
+            else:
+                specs += LoadBalancer.specs
+            self.databases[component] = HistoryDatabase(
+                history, times, specs).detach()
+
+    def replay(self, component, parameters=None):
+        database = self.databases[component]
+        switch = RecordingSwitch(len(database.times))
+        clock = self.clock.get(component)
+        if component == 'charger':
+            controller = ChargingManager(database, switch,
+                                         **(parameters or {}))
+        else:
+            controller = LoadBalancer(database, switch, **(parameters or {}))
+        errors = 0
+        for step in range(len(database.times)):
+            database.step = step
+            try:
+                if clock is None:
+                    controller.balance()
+                else:
+                    controller.process(clock[step])
+            except RuntimeError:
+                errors += 1
+            switch.states[step] = switch.is_enabled
+        return self.outcome(component, parameters, switch, errors)
+
+    def outcome(self, component, parameters, switch, errors):
+        import numpy
+        database = self.databases[component]
+        period = self.periods[component]
+        hours = switch.states * period / 3600
+        suffix = '{}s'.format(period)
+        result = {
+            'component': component,
+            'parameters': dict(parameters or {}),
+            'steps': len(switch.states),
+            'errors': errors,
+            'switches': switch.switches,
+            'enabled_hours': float(hours.sum()),
+        }
+        if component == 'charger':
+            battery_voltage = numpy.nan_to_num(
+                database.values[('average', 'battery_voltage', suffix)])
+            result['grid_charging_wh'] = float(numpy.sum(
+                hours * battery_voltage
+                * ENABLED_SETTINGS['max_ac_charging_current']))
+            result['enabled_hours_by_window'] = {
+                window: float(hours[self.windows[component] == window].sum())
+                for window in list(tariff.WINDOWS) + [tariff.DEFAULT_WINDOW]}
+        else:
+            pv_power = numpy.nan_to_num(
+                database.values[('average', 'pv_charging_power', suffix)])
+            result['pv_wh_while_enabled'] = float(numpy.sum(hours * pv_power))
+        return result
+
+
+def grid(values):
+    names = sorted(values)
+    return [dict(zip(names, combination)) for combination
+            in itertools.product(*(values[name] for name in names))]
+
+
+worker_backtest = None
+
+
+def init_worker(backtest):
+    global worker_backtest
+    worker_backtest = backtest
+    for name in ('arinna.charger', 'arinna.load_balancer'):
+        logging.getLogger(name).setLevel(logging.WARNING)
+
+
+def replay(component, parameters):
+    return worker_backtest.replay(component, parameters)
+
+
+def sweep(backtest, component, parameter_grid, workers=None):
+    logger.info('Sweeping {} parameter sets of {}'.format(
+        len(parameter_grid), component))
+    with concurrent.futures.ProcessPoolExecutor(
+            workers, initializer=init_worker,
+            initargs=(backtest,)) as executor:
+        return list(executor.map(replay, itertools.repeat(component),
+                                 parameter_grid))
+
+
+def parse_parameter(text):
+    name, _, values = text.partition('=')
+    if not values:
+        raise ValueError('Invalid parameter: {}'.format(text))
+    return name, [float(value) for value in values.split(',')]
+
+
+def add_arguments(parser):
+    parser.add_argument('--history', default='.',
+                        help='Directory with <measurement>.csv.gz exports')
+    parser.add_argument('--component', choices=COMPONENTS,
+                        default='charger')
+    parser.add_argument('--param', action='append', default=[],
+                        metavar='NAME=V1,V2',
+                        help='Threshold values to sweep, e.g. '
+                             'day_bulk_voltage=54.5,55.0,55.5')
+    parser.add_argument('--workers', type=int,
+                        help='Worker processes, all CPUs when omitted')
+    parser.add_argument('--charger-period', type=int, default=60)
+    parser.add_argument('--load-balancer-period', type=int, default=10)
+    parser.add_argument('--output', help='Write results to this JSON file')
+
+
+def run(args):
+    parameters = dict(parse_parameter(p) for p in args.param)
+    unknown = set(parameters) - set(PARAMETERS[args.component])
+    if unknown:
+        raise ValueError('Unknown parameters for {}: {}'.format(
+            args.component, ', '.join(sorted(unknown))))
+    started = time.monotonic()
+    backtest = Backtest(load_export(args.history), None, None,
+                        args.charger_period, args.load_balancer_period,
+                        [args.component])
+    logger.info('History prepared in {:.1f} s'.format(
+        time.monotonic() - started))
+    results = sweep(backtest, args.component, grid(parameters), args.workers)
+    logger.info('Backtest finished in {:.1f} s'.format(
+        time.monotonic() - started))
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+    print(output)
+    return 0
@@ -1,50 +1,73 @@
 #!/usr/bin/env python3
 
-from datetime import datetime, time
+import argparse
+from datetime import datetime
+import json
 import logging
+import threading
+import time as time_module
+import arinna.config as config
 import arinna.log as log
+import arinna.metrics as metrics
 import arinna.mqtt_client
+import arinna.rollup as rollup
 import arinna.inverter_provider as inverter_provider
+import arinna.tariff as tariff
 import sys
-from arinna.database_client import DatabaseClient
+from arinna.database_client import DatabaseClient, create_db_client
+from arinna.inverter_serial import option_code
+from arinna.rolling_aggregator import RollingAggregator
+from arinna.scheduler import PeriodicScheduler
 
 logger = logging.getLogger(__name__)
 
 
 class ChargingManager:
-    def __init__(self, database, charger):
+    day_rate_specs = [
+        ('max', 'battery_voltage', '5m'),
+        ('true_percentage', 'is_charging_to_floating_enabled', '5m'),
+    ]
+    night_rate_specs = [
+        ('average', 'battery_voltage', '5m'),
+        ('true_percentage', 'is_charging_to_floating_enabled', '3h'),
+    ]
+
+    def __init__(self, database, charger, day_float_voltage=52.0,
+                 day_bulk_voltage=55.0, night_min_voltage=47.2):
         self.database = database
         self.charger = charger
+        self.day_float_voltage = day_float_voltage
+        self.day_bulk_voltage = day_bulk_voltage
+        self.night_min_voltage = night_min_voltage
 
     def process(self, now):
         if self.is_in_cheap_day_rate(now):
             logger.info('In cheap day rate')
-            battery_voltage = self.database.moving_max('battery_voltage', '5m')
-            is_charging_to_floating_enabled = \
-                self.database.moving_true_percentage(
-                    'is_charging_to_floating_enabled', '5m')
+            results = self.database.moving_aggregates(self.day_rate_specs)
+            battery_voltage = results[('max', 'battery_voltage', '5m')]
+            is_charging_to_floating_enabled = results[
+                ('true_percentage', 'is_charging_to_floating_enabled', '5m')]
 
             if (
                     is_charging_to_floating_enabled == 1.0
-                    and battery_voltage < 52.0
+                    and battery_voltage < self.day_float_voltage
             ) or (
                     is_charging_to_floating_enabled == 0.0
-                    and battery_voltage < 55.0
+                    and battery_voltage < self.day_bulk_voltage
             ):
                 self.charger.enable()
             else:
                 logger.info('Leaving charger as is')
         elif self.is_in_cheap_night_rate(now):
             logger.info('In cheap night rate')
-            battery_voltage = self.database.moving_average('battery_voltage',
-                                                           '5m')
-            is_charging_to_floating_enabled = \
-                self.database.moving_true_percentage(
-                    'is_charging_to_floating_enabled', '3h')
+            results = self.database.moving_aggregates(self.night_rate_specs)
+            battery_voltage = results[('average', 'battery_voltage', '5m')]
+            is_charging_to_floating_enabled = results[
+                ('true_percentage', 'is_charging_to_floating_enabled', '3h')]
 
             if is_charging_to_floating_enabled == 1.0:
                 self.charger.disable()
-            elif battery_voltage < 47.2:
+            elif battery_voltage < self.night_min_voltage:
                 self.charger.enable()
             else:
                 logger.info('Leaving charger as is')
@@ -54,54 +77,218 @@ class ChargingManager:
 
     @staticmethod
     def is_in_cheap_day_rate(now):
-        return time_in_range(time(13), time(15), now)
+        return tariff.time_in_range(*tariff.CHEAP_DAY_RATE, now)
 
     @staticmethod
     def is_in_cheap_night_rate(now):
-        return time_in_range(time(22), time(6), now)
+        return tariff.time_in_range(*tariff.CHEAP_NIGHT_RATE, now)
+
+
+SETTING_COMMANDS = {
+    'output_source_priority': 'POP{:02d}',
+    'charger_source_priority': 'PCP{:02d}',
+    'max_ac_charging_current': 'MUCHGC{:03d}',
+}
+
+ENABLED_SETTINGS = {
+    'output_source_priority': 0,
+    'charger_source_priority': 2,
+    'max_ac_charging_current': 30,
+}
+
+DISABLED_SETTINGS = {
+    'output_source_priority': 2,
+    'charger_source_priority': 1,
+    'max_ac_charging_current': 10,
+}
+
+CHARGER_COMMANDS = metrics.counter('arinna_charger_commands_total',
+                                   'Charger setting commands')
+
+
+class InverterSettings:
+    def __init__(self, ttl=600, clock=time_module.monotonic):
+        self.ttl = ttl
+        self.clock = clock
+        self.values = {}
+        self.updated = {}
+        self.condition = threading.Condition()
+
+    def update(self, field, value):
+        if field not in SETTING_COMMANDS:
+            return
+        with self.condition:
+            self.values[field] = int(float(option_code(field, value)))
+            self.updated[field] = self.clock()
+            self.condition.notify_all()
+
+    def fresh_values(self):
+        now = self.clock()
+        if len(self.updated) < len(SETTING_COMMANDS) or \
+                any(now - t > self.ttl for t in self.updated.values()):
+            return None
+        return dict(self.values)
+
+    def current(self):
+        with self.condition:
+            return self.fresh_values()
 
+    def wait(self, timeout):
+        with self.condition:
+            self.condition.wait_for(self.fresh_values, timeout)
+            return self.fresh_values()
 
-def time_in_range(start, end, x):
-    if start <= end:
-        return start <= x < end
-    else:
-        return start <= x or x < end
+    def invalidate(self):
+        with self.condition:
+            self.updated.clear()
+
+    def subscribe(self, mqtt_client, snapshots=False):
+        if snapshots:
+            topic = 'inverter/snapshot/QPIRI'
+            mqtt_client.add_message_callback(topic, self.on_snapshot)
+            mqtt_client.subscribe(topic)
+            return
+        for field in SETTING_COMMANDS:
+            topic = 'inverter/response/' + field
+            mqtt_client.add_message_callback(topic, self.on_message)
+            mqtt_client.subscribe(topic)
+
+    def on_message(self, _, user_data, message):
+        try:
+            self.update(message.topic.rsplit('/', 1)[-1],
+                        message.payload.decode())
+        except Exception:
+            logger.exception('Unknown exception occurred in on_message')
+
+    def on_snapshot(self, _, user_data, message):
+        try:
+            for field, value in json.loads(message.payload.decode()).items():
+                self.update(field, value)
+        except Exception:
+            logger.exception('Unknown exception occurred in on_snapshot')
 
 
 class Charger:
-    def __init__(self, inverter):
+    def __init__(self, inverter, settings=None, timeout=10.0):
         self.inverter = inverter
+        self.settings = settings
+        self.timeout = timeout
+        self.sent = 0
+        self.skipped = 0
+        self.reads = 0
 
     def enable(self):
         logger.info('Enabling charger')
-        self.inverter.publish_request('POP00')
-        self.inverter.publish_request('PCP02')
-        self.inverter.publish_request('MUCHGC030')
+        self.apply(ENABLED_SETTINGS)
         logger.info('Charger enabled')
 
     def disable(self):
         logger.info('Disabling charger')
-        self.inverter.publish_request('POP02')
-        self.inverter.publish_request('PCP01')
-        self.inverter.publish_request('MUCHGC010')
+        self.apply(DISABLED_SETTINGS)
         logger.info('Charger disabled')
 
+    def apply(self, target):
+        current = self.read_settings()
+        commands = [SETTING_COMMANDS[field].format(value)
+                    for field, value in target.items()
+                    if current is None or current.get(field) != value]
+        self.skipped += len(target) - len(commands)
+        CHARGER_COMMANDS.labels(result='skipped').inc(
+            len(target) - len(commands))
+        if not commands:
+            logger.info('Inverter settings already applied')
+            return
+        for command in commands:
+            self.inverter.publish_request(command)
+        self.sent += len(commands)
+        CHARGER_COMMANDS.labels(result='sent').inc(len(commands))
+        if self.settings is not None:
+            self.confirm(target)
 
-def main():
+    def read_settings(self):
+        if self.settings is None:
+            return None
+        current = self.settings.current()
+        if current is None:
+            logger.info('Refreshing inverter settings')
+            current = self.refresh()
+            if current is None:
+                logger.warning('Inverter settings unavailable, '
+                               'sending all commands')
+        return current
+
+    def refresh(self):
+        self.reads += 1
+        self.inverter.publish_request('QPIRI')
+        return self.settings.wait(self.timeout)
+
+    def confirm(self, target):
+        self.settings.invalidate()
+        current = self.refresh()
+        if current is None:
+            logger.warning('Inverter settings not confirmed')
+            return
+        mismatched = {field: current.get(field) for field, value
+                      in target.items() if current.get(field) != value}
+        if mismatched:
+            logger.warning('Inverter settings not applied: {}'.format(
+                mismatched))
+        else:
+            logger.info('Inverter settings confirmed')
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Arinna charger')
+    parser.add_argument('--daemon', action='store_true',
+                        help='keep running and process periodically')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    settings = config.load()
     log.setup_logging()
+    rollups = rollup.intervals() if settings.use_rollups else None
 
     try:
         with arinna.mqtt_client.MQTTClient() as mqtt_client, \
-                DatabaseClient() as inverter_database:
+                DatabaseClient(create_db_client(settings),
+                               rollups=rollups) as inverter_database:
+            router = arinna.mqtt_client.MessageRouter(mqtt_client)
             mqtt_client.loop_start()
             publisher = inverter_provider.InverterMQTTPublisher(mqtt_client)
-            charger = Charger(publisher)
-            charging_manager = ChargingManager(inverter_database, charger)
-            now = datetime.now().time()
-            charging_manager.process(now)
+            inverter_settings = None
+            if args.daemon:
+                inverter_settings = InverterSettings(
+                    settings.charger_settings_ttl)
+                inverter_settings.subscribe(router,
+                                            settings.publish_snapshots)
+            charger = Charger(publisher, inverter_settings,
+                              settings.charger_settings_timeout)
+            database = inverter_database
+            if args.daemon and settings.use_rolling_aggregator:
+                database = RollingAggregator(
+                    ChargingManager.day_rate_specs
+                    + ChargingManager.night_rate_specs)
+                database.warm(inverter_database)
+                database.subscribe(router, settings.publish_snapshots)
+            charging_manager = ChargingManager(database, charger)
+            if args.daemon:
+                scheduler = PeriodicScheduler(
+                    settings.charger_period,
+                    lambda: charging_manager.process(datetime.now().time()))
+                with metrics.exporter(settings, 'charger'):
+                    scheduler.run()
+            else:
+                now = datetime.now().time()
+                charging_manager.process(now)
             mqtt_client.loop_stop()
+    except KeyboardInterrupt:
+        logger.info('Charger stopped by user')
     except Exception:
         logger.exception('Unknown exception occurred')
+        if args.daemon:
+            return 1
 
     return 0
 
@@ -1,5 +1,68 @@
 #!/usr/bin/env python3
 
+import argparse
+import logging
+import arinna.backtest as backtest
+import arinna.energy as energy
+import arinna.export as export
+import arinna.importer as importer
+import arinna.rollup as rollup
+import arinna.supervisor as supervisor
 
-def main():
-    return 0
+logger = logging.getLogger(__name__)
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(prog='arinna')
+    subparsers = parser.add_subparsers(dest='command')
+    subparsers.required = True
+
+    export_parser = subparsers.add_parser(
+        'export', help='Export measurements into compressed CSV files')
+    export.add_arguments(export_parser)
+    export_parser.set_defaults(run=export.run)
+
+    import_parser = subparsers.add_parser(
+        'import', help='Import CSV files into the database')
+    importer.add_arguments(import_parser)
+    import_parser.set_defaults(run=importer.run)
+
+    rollups_parser = subparsers.add_parser(
+        'rollups', help='Create downsampling retention policies and '
+                        'continuous queries')
+    rollup.add_arguments(rollups_parser)
+    rollups_parser.set_defaults(run=rollup.run)
+
+    backtest_parser = subparsers.add_parser(
+        'backtest', help='Replay exported history through the charger or '
+                         'load balancer and sweep their thresholds')
+    backtest.add_arguments(backtest_parser)
+    backtest_parser.set_defaults(run=backtest.run)
+
+    energy_parser = subparsers.add_parser(
+        'energy', help='Update daily PV, load and grid charging energy '
+                       'totals per tariff window')
+    energy.add_arguments(energy_parser)
+    energy_parser.set_defaults(run=energy.run)
+
+    run_parser = subparsers.add_parser(
+        'run', help='Run all enabled components in a single process')
+    supervisor.add_arguments(run_parser)
+    run_parser.set_defaults(run=supervisor.run)
+
+    return parser.parse_args(argv)
+
+
+def setup_logging():
+    import arinna.log as log
+    try:
+        log.setup_logging()
+    except OSError:
+        logging.basicConfig(level=logging.INFO)
+        logger.info('Logging configuration not found, using defaults')
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    setup_logging()
+    return args.run(args)
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+
+import collections
+import logging
+import queue
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+def is_query(command):
+    return command.startswith('Q')
+
+
+class CommandQueue:
+    def __init__(self, max_depth=32, clock=time.monotonic):
+        self.max_depth = max_depth
+        self.clock = clock
+        self.settings = collections.deque()
+        self.queries = collections.OrderedDict()
+        self.condition = threading.Condition()
+        self.enqueued = 0
+        self.coalesced = 0
+        self.dropped = 0
+        self.served = 0
+        self.last_wait_time = 0.0
+        self.max_wait_time = 0.0
+        self.total_wait_time = 0.0
+
+    def put(self, command):
+        with self.condition:
+            if is_query(command):
+                if command in self.queries:
+                    logger.info('Coalescing command: {}'.format(command))
+                    self.coalesced += 1
+                    return
+                self.queries[command] = self.clock()
+            else:
+                self.settings.append((command, self.clock()))
+            self.enqueued += 1
+            if self.qsize() > self.max_depth:
+                self.drop()
+            self.condition.notify()
+
+    def drop(self):
+        if self.queries:
+            command, _ = self.queries.popitem(last=False)
+        else:
+            command, _ = self.settings.popleft()
+        logger.warning('Queue is full, dropping command: {}'.format(command))
+        self.dropped += 1
+
+    def get(self, timeout=None):
+        with self.condition:
+            if not self.condition.wait_for(self.qsize, timeout):
+                raise queue.Empty
+            if self.settings:
+                command, enqueue_time = self.settings.popleft()
+            else:
+                command, enqueue_time = self.queries.popitem(last=False)
+            wait_time = self.clock() - enqueue_time
+            self.served += 1
+            self.last_wait_time = wait_time
+            self.total_wait_time += wait_time
+            self.max_wait_time = max(self.max_wait_time, wait_time)
+            return command
+
+    def qsize(self):
+        return len(self.settings) + len(self.queries)
+
+    def empty(self):
+        return self.qsize() == 0
+
+    def mean_wait_time(self):
+        return self.total_wait_time / self.served if self.served else 0.0
+
+
+class ResponsePublisher:
+    def __init__(self, mqtt_publisher):
+        self.mqtt_publisher = mqtt_publisher
+        self.responses = queue.Queue()
+        self.thread = None
+
+    def start(self):
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        if self.thread:
+            self.responses.put(None)
+            self.thread.join()
+            self.thread = None
+
+    def put(self, command, response):
+        self.responses.put((command, response))
+
+    def run(self):
+        while True:
+            item = self.responses.get()
+            if item is None:
+                return
+            command, response = item
+            try:
+                self.mqtt_publisher.publish_response(response, command)
+            except Exception:
+                logger.exception('Unknown exception occurred while publishing')
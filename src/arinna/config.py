@@ -2,7 +2,6 @@
 
 import os
 import sys
-import yaml
 
 
 class Config:
@@ -11,9 +10,75 @@ class Config:
             'logging_config': '',
             'serial_port': '',
             'baudrate': 2400,
+            'serial_driver': 'mppsolar',
+            'serial_timeout': 1.0,
+            'database_batch_size': 100,
+            'database_flush_interval': 1.0,
+            'spool_path': '',
+            'spool_max_bytes': 64 * 2 ** 20,
+            'charger_period': 60,
+            'charger_settings_ttl': 600,
+            'charger_settings_timeout': 10.0,
+            'load_balancer_period': 10,
+            'publisher_period': 10,
+            'adaptive_polling': False,
+            'polling_rates': {
+                'QPIGS': {
+                    'min_interval': 2,
+                    'max_interval': 30,
+                    'thresholds': {
+                        'battery_voltage': 0.2,
+                        'pv_input_voltage': 5.0,
+                        'output_load_percent': 0.05,
+                    },
+                },
+                'QMOD': {
+                    'min_interval': 10,
+                    'max_interval': 60,
+                    'thresholds': {
+                        'device_mode': 0,
+                    },
+                },
+                'QPIRI': {
+                    'min_interval': 900,
+                    'max_interval': 3600,
+                },
+            },
+            'use_rolling_aggregator': False,
+            'use_rollups': False,
+            'hot_tier_retention': 0,
+            'publish_fields': True,
+            'publish_snapshots': False,
+            'command_queue_depth': 32,
+            'report_by_exception': False,
+            'keyframe_interval': 60,
+            'metrics_ports': {},
+            'metrics_database': '',
+            'metrics_interval': 10,
+            'components': {
+                'database_provider': True,
+                'inverter_provider': True,
+                'publisher': True,
+                'load_balancer': True,
+                'charger': True,
+            },
+            'restart_delay': 1.0,
+            'max_restart_delay': 60.0,
+            'deadbands': {
+                'grid_voltage': 2.0,
+                'ac_output_voltage': 2.0,
+                'battery_voltage': 0.1,
+                'battery_voltage_from_scc': 0.1,
+                'pv_input_voltage': 2.0,
+                'bus_voltage': 2,
+                'ac_output_apparent_power': 10,
+                'ac_output_active_power': 10,
+                'pv_charging_power': 10,
+            },
         }
 
     def from_yaml(self, path):
+        import yaml
         with open(path) as f:
             self.settings.update(yaml.safe_load(f))
 
@@ -1,19 +1,37 @@
 #!/usr/bin/env python3
 
-import influxdb
+import collections
+import concurrent.futures
+import functools
 import logging
+import arinna.metrics as metrics
 
 logger = logging.getLogger(__name__)
 
+TimeSeries = collections.namedtuple('TimeSeries', ['time', 'columns'])
+
+POINTS_WRITTEN = metrics.counter(
+    'arinna_database_points_written_total', 'Points written into InfluxDB')
+WRITE_SECONDS = metrics.histogram(
+    'arinna_database_write_seconds', 'InfluxDB write latency')
+QUERY_SECONDS = metrics.histogram(
+    'arinna_database_query_seconds', 'InfluxDB query latency')
+
 
 class DatabaseClient:
     def __init__(self, db_client=None,
-                 db_name='inverter'):
+                 db_name='inverter', rollups=None, min_buckets=60):
         if not db_client:
+            import influxdb
             self.db_client = influxdb.InfluxDBClient()
         else:
             self.db_client = db_client
         self.db_name = db_name
+        self.rollups = sorted(
+            ((policy, time_window_seconds(interval))
+             for policy, interval in (rollups or [])),
+            key=lambda rollup: rollup[1], reverse=True)
+        self.min_buckets = min_buckets
 
     def close(self):
         logger.info('Closing database connection')
@@ -24,36 +42,101 @@ class DatabaseClient:
         logger.info('Saving points into database')
         logger.info('Measurement: {}'.format(measurement))
         logger.info('Value: {}'.format(value))
-        self.db_client.write_points([{
-            'measurement': measurement,
-            'fields': {
-                'value': value
-            }
-        }], database=self.db_name)
+        with WRITE_SECONDS.time():
+            self.db_client.write_points([{
+                'measurement': measurement,
+                'fields': {
+                    'value': value
+                }
+            }], database=self.db_name)
+        POINTS_WRITTEN.inc()
+        logger.info('Points saved into database')
+
+    def save_points(self, points):
+        logger.info('Saving points into database')
+        logger.info('Points: {}'.format(len(points)))
+        with WRITE_SECONDS.time():
+            self.db_client.write_points(points, database=self.db_name)
+        POINTS_WRITTEN.inc(len(points))
         logger.info('Points saved into database')
 
     def load(self, measurement, time_window):
+        return list(self.iter_load(measurement, time_window))
+
+    def iter_load(self, measurement, time_window, chunk_size=10000):
+        for point in self.iter_points(measurement, time_window, chunk_size):
+            yield point['value']
+
+    def load_points(self, measurement, time_window):
+        return list(self.iter_load_points(measurement, time_window))
+
+    def iter_load_points(self, measurement, time_window, chunk_size=10000):
+        for point in self.iter_points(measurement, time_window, chunk_size):
+            yield point['time'] / 10 ** 9, point['value']
+
+    def iter_points(self, measurement, time_window, chunk_size):
         logger.info('Loading points from database')
         logger.info('Measurement: {}'.format(measurement))
         logger.info('Time window: {}'.format(time_window))
-        query = 'SELECT "value" ' \
-                'FROM "{}" WHERE time > now() - {}'.format(measurement,
-                                                           time_window)
+        after = None
+        count = 0
+        while True:
+            query = page_query(measurement, time_window, after, chunk_size)
+            logger.debug('Query: {}'.format(query))
+            result = self.db_client.query(query, database=self.db_name,
+                                          epoch='ns')
+            points = list(result.get_points(measurement))
+            count += len(points)
+            yield from points
+            if len(points) < chunk_size:
+                break
+            after = points[-1]['time']
+        logger.info('Points load from database: {}'.format(count))
+
+    def series(self, measurements, time_window, bucket, aggregate='average',
+               fill='null'):
+        import numpy
+        logger.info('Getting series')
+        logger.info('Measurements: {}'.format(measurements))
+        logger.info('Time window: {}'.format(time_window))
+        logger.info('Bucket: {}'.format(bucket))
+        query = '; '.join(series_query(aggregate, measurement, time_window,
+                                       bucket, fill)
+                          for measurement in measurements)
         logger.debug('Query: {}'.format(query))
-        result = self.db_client.query(query, database=self.db_name)
-        logger.debug('Query result: {}'.format(result))
-        logger.info('Points load from database')
-        return [point['value'] for point in result.get_points(measurement)]
+        with QUERY_SECONDS.labels(aggregate='series').time():
+            result = self.db_client.query(query, database=self.db_name,
+                                          epoch='ms')
+        results = result if isinstance(result, list) else [result]
+        if len(results) != len(measurements):
+            raise RuntimeError(
+                'Expected {} results but got {}'.format(len(measurements),
+                                                        len(results)))
+        frames = [series_frame(numpy, r) for r in results]
+        time = functools.reduce(numpy.union1d, (f[:, 0] for f in frames),
+                                numpy.empty(0))
+        columns = collections.OrderedDict()
+        for measurement, frame in zip(measurements, frames):
+            column = numpy.full(len(time), numpy.nan)
+            column[numpy.searchsorted(time, frame[:, 0])] = frame[:, 1]
+            columns[measurement] = column
+        if fill == 'none' and columns:
+            keep = ~numpy.isnan(numpy.column_stack(
+                list(columns.values()))).any(axis=1)
+            time = time[keep]
+            for measurement in columns:
+                columns[measurement] = columns[measurement][keep]
+        logger.info('Series get: {} buckets'.format(len(time)))
+        return TimeSeries(time / 1000, columns)
 
     def moving_average(self, measurement, time_window):
         logger.info('Getting moving average')
         logger.info('Measurement: {}'.format(measurement))
         logger.info('Time window: {}'.format(time_window))
-        query = 'SELECT MEAN("value") ' \
-                'FROM "{}" WHERE time > now() - {}'.format(measurement,
-                                                           time_window)
+        query = self.aggregate_query('average', measurement, time_window)
         logger.debug('Query: {}'.format(query))
-        result = self.db_client.query(query, database=self.db_name)
+        with QUERY_SECONDS.labels(aggregate='average').time():
+            result = self.db_client.query(query, database=self.db_name)
         logger.debug('Query result: {}'.format(result))
         logger.info('Moving average get')
         for point in result.get_points(measurement):
@@ -71,7 +154,8 @@ class DatabaseClient:
                 'FROM "{}" WHERE time > now() - {}'.format(measurement,
                                                            time_window)
         logger.debug('Query: {}'.format(query))
-        result = self.db_client.query(query, database=self.db_name)
+        with QUERY_SECONDS.labels(aggregate='stddev').time():
+            result = self.db_client.query(query, database=self.db_name)
         logger.debug('Query result: {}'.format(result))
         logger.info('Moving stddev get')
         for point in result.get_points(measurement):
@@ -85,11 +169,10 @@ class DatabaseClient:
         logger.info('Getting moving min')
         logger.info('Measurement: {}'.format(measurement))
         logger.info('Time window: {}'.format(time_window))
-        query = 'SELECT MIN("value") ' \
-                'FROM "{}" WHERE time > now() - {}'.format(measurement,
-                                                           time_window)
+        query = self.aggregate_query('min', measurement, time_window)
         logger.debug('Query: {}'.format(query))
-        result = self.db_client.query(query, database=self.db_name)
+        with QUERY_SECONDS.labels(aggregate='min').time():
+            result = self.db_client.query(query, database=self.db_name)
         logger.debug('Query result: {}'.format(result))
         logger.info('Moving min get')
         for point in result.get_points(measurement):
@@ -103,11 +186,10 @@ class DatabaseClient:
         logger.info('Getting moving max')
         logger.info('Measurement: {}'.format(measurement))
         logger.info('Time window: {}'.format(time_window))
-        query = 'SELECT MAX("value") ' \
-                'FROM "{}" WHERE time > now() - {}'.format(measurement,
-                                                           time_window)
+        query = self.aggregate_query('max', measurement, time_window)
         logger.debug('Query: {}'.format(query))
-        result = self.db_client.query(query, database=self.db_name)
+        with QUERY_SECONDS.labels(aggregate='max').time():
+            result = self.db_client.query(query, database=self.db_name)
         logger.debug('Query result: {}'.format(result))
         logger.info('Moving max get')
         for point in result.get_points(measurement):
@@ -121,19 +203,52 @@ class DatabaseClient:
         logger.info('Getting moving true percentage')
         logger.info('Measurement: {}'.format(measurement))
         logger.info('Time window: {}'.format(time_window))
-        query = 'SELECT "value"' \
-                'FROM "{}" WHERE time > now() - {}'.format(measurement,
-                                                           time_window)
+        spec = ('true_percentage', measurement, time_window)
+        query = self.aggregate_query(*spec)
         logger.debug('Query: {}'.format(query))
-        result = self.db_client.query(query, database=self.db_name)
+        with QUERY_SECONDS.labels(aggregate='true_percentage').time():
+            result = self.db_client.query(query, database=self.db_name)
         logger.debug('Query result: {}'.format(result))
         logger.info('Moving true percentage get')
-        values = [p['value'] for p in result.get_points(measurement)]
-        if not values:
+        return aggregate_value(spec, result)
+
+    def moving_aggregates(self, specs):
+        logger.info('Getting moving aggregates')
+        logger.info('Specs: {}'.format(specs))
+        query = '; '.join(self.aggregate_query(*spec) for spec in specs)
+        logger.debug('Query: {}'.format(query))
+        with QUERY_SECONDS.labels(aggregate='aggregates').time():
+            result = self.db_client.query(query, database=self.db_name)
+        logger.debug('Query result: {}'.format(result))
+        results = result if isinstance(result, list) else [result]
+        expected = sum(STATEMENTS.get(aggregate, 1)
+                       for aggregate, _, _ in specs)
+        if len(results) != expected:
             raise RuntimeError(
-                'No moving true percentage available for measurement \"{}\"'
-                ' and time window \"{}\"'.format(measurement, time_window))
-        return true_percentage(values)
+                'Expected {} results but got {}'.format(expected,
+                                                        len(results)))
+        logger.info('Moving aggregates get')
+        values = {}
+        for spec in specs:
+            count = STATEMENTS.get(spec[0], 1)
+            values[spec] = aggregate_value(spec, results[:count])
+            results = results[count:]
+        return values
+
+    def rollup(self, aggregate, time_window):
+        if aggregate not in ROLLUP_FIELDS:
+            return None
+        seconds = time_window_seconds(time_window)
+        for policy, interval in self.rollups:
+            if seconds >= self.min_buckets * interval:
+                return policy
+        return None
+
+    def aggregate_query(self, aggregate, measurement, time_window):
+        policy = self.rollup(aggregate, time_window)
+        if policy is not None:
+            logger.info('Using rollup: {}'.format(policy))
+        return aggregate_query(aggregate, measurement, time_window, policy)
 
     def __enter__(self):
         logger.debug('Entering context manager')
@@ -144,5 +259,180 @@ class DatabaseClient:
         self.close()
 
 
+class AsyncDatabaseClient:
+    def __init__(self, database_client=None, max_workers=4):
+        if not database_client:
+            self.database_client = DatabaseClient()
+        else:
+            self.database_client = database_client
+        self.executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=max_workers)
+
+    async def run(self, method, *args):
+        import asyncio
+        loop = asyncio.get_event_loop()
+        return await loop.run_in_executor(
+            self.executor, functools.partial(method, *args))
+
+    async def close(self):
+        await self.run(self.database_client.close)
+        self.executor.shutdown()
+
+    async def save(self, measurement, value):
+        await self.run(self.database_client.save, measurement, value)
+
+    async def save_points(self, points):
+        await self.run(self.database_client.save_points, points)
+
+    async def load(self, measurement, time_window):
+        return await self.run(self.database_client.load, measurement,
+                              time_window)
+
+    async def load_points(self, measurement, time_window):
+        return await self.run(self.database_client.load_points, measurement,
+                              time_window)
+
+    async def moving_average(self, measurement, time_window):
+        return await self.run(self.database_client.moving_average,
+                              measurement, time_window)
+
+    async def moving_stddev(self, measurement, time_window):
+        return await self.run(self.database_client.moving_stddev,
+                              measurement, time_window)
+
+    async def moving_min(self, measurement, time_window):
+        return await self.run(self.database_client.moving_min,
+                              measurement, time_window)
+
+    async def moving_max(self, measurement, time_window):
+        return await self.run(self.database_client.moving_max,
+                              measurement, time_window)
+
+    async def moving_true_percentage(self, measurement, time_window):
+        return await self.run(self.database_client.moving_true_percentage,
+                              measurement, time_window)
+
+    async def moving_aggregates(self, specs):
+        return await self.run(self.database_client.moving_aggregates, specs)
+
+    async def __aenter__(self):
+        logger.debug('Entering async context manager')
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        logger.debug('Exiting async context manager')
+        await self.close()
+
+
+AGGREGATES = {
+    'average': ('MEAN("value")', 'mean'),
+    'stddev': ('STDDEV("value")', 'stddev'),
+    'min': ('MIN("value")', 'min'),
+    'max': ('MAX("value")', 'max'),
+    'true_percentage': ('COUNT("value")', 'count'),
+}
+
+STATEMENTS = {
+    'true_percentage': 2,
+}
+
+FILLS = ('null', 'none', 'previous', 'linear')
+
+
+ROLLUP_FIELDS = {
+    'average': 'mean',
+    'min': 'min',
+    'max': 'max',
+}
+
+
+def aggregate_query(aggregate, measurement, time_window,
+                    retention_policy=None):
+    selector, _ = AGGREGATES[aggregate]
+    source = '"{}"'.format(measurement)
+    if retention_policy is not None:
+        selector = selector.replace('"value"', '"{}"'.format(
+            ROLLUP_FIELDS[aggregate]))
+        source = '"{}".{}'.format(retention_policy, source)
+    query = 'SELECT {} ' \
+            'FROM {} WHERE time > now() - {}'.format(selector, source,
+                                                     time_window)
+    if aggregate == 'true_percentage':
+        return '{0}; {0} AND "value" = true'.format(query)
+    return query
+
+
+def create_db_client(settings):
+    import influxdb
+    db_client = influxdb.InfluxDBClient()
+    if settings.hot_tier_retention:
+        from arinna.memory_database import HotTierDatabase
+        logger.info('Hot tier retention: {} s'.format(
+            settings.hot_tier_retention))
+        db_client = HotTierDatabase(db_client, settings.hot_tier_retention)
+    return db_client
+
+
+def series_query(aggregate, measurement, time_window, bucket, fill='null'):
+    if aggregate == 'true_percentage':
+        raise ValueError('Unsupported series aggregate: {}'.format(aggregate))
+    if fill not in FILLS:
+        try:
+            float(fill)
+        except ValueError:
+            raise ValueError('Unsupported fill: {}'.format(fill))
+    selector, _ = AGGREGATES[aggregate]
+    return 'SELECT {} FROM "{}" WHERE time > now() - {} ' \
+           'GROUP BY time({}) fill({})'.format(selector, measurement,
+                                               time_window, bucket, fill)
+
+
+def series_frame(numpy, result):
+    for series in result.raw.get('series', []):
+        return numpy.array(series['values'], dtype=float).reshape(-1, 2)
+    return numpy.empty((0, 2))
+
+
+def page_query(measurement, time_window, after=None, limit=10000):
+    query = 'SELECT "value" FROM "{}" WHERE time > now() - {}'.format(
+        measurement, time_window)
+    if after is not None:
+        query += ' AND time > {}'.format(after)
+    return query + ' ORDER BY time LIMIT {}'.format(limit)
+
+
+def aggregate_value(spec, results):
+    aggregate, measurement, time_window = spec
+    _, column = AGGREGATES[aggregate]
+    if not isinstance(results, list):
+        results = [results]
+    values = [p[column] for p in results[0].get_points(measurement)]
+    if not values:
+        raise RuntimeError(
+            'No moving {} available for measurement \"{}\"'
+            ' and time window \"{}\"'.format(aggregate.replace('_', ' '),
+                                             measurement, time_window))
+    if aggregate == 'true_percentage':
+        true_counts = [p[column] for p in results[1].get_points(measurement)]
+        return (true_counts[0] if true_counts else 0) / values[0]
+    return values[0]
+
+
+TIME_UNITS = {
+    's': 1,
+    'm': 60,
+    'h': 60 * 60,
+    'd': 24 * 60 * 60,
+    'w': 7 * 24 * 60 * 60,
+}
+
+
+def time_window_seconds(time_window):
+    value, unit = time_window[:-1], time_window[-1]
+    if unit not in TIME_UNITS or not value.isdigit():
+        raise ValueError('Invalid time window: \"{}\"'.format(time_window))
+    return int(value) * TIME_UNITS[unit]
+
+
 def true_percentage(x):
     return len([y for y in x if y is True]) / len(x)
@@ -1,46 +1,96 @@
 #!/usr/bin/env python3
 
+import collections
+import contextlib
+import json
 import logging
+import arinna.config as config
 import arinna.log as log
+import arinna.metrics as metrics
+import arinna.schema as schema
 import sys
 
 from arinna.database_client import DatabaseClient
+from arinna.database_writer import DatabaseWriter, now_ns, point
 from arinna.mqtt_client import MQTTClient
+from arinna.spool import Spool, SpoolReplayer
 
 logger = logging.getLogger(__name__)
 
+RESPONSE_PREFIX = 'inverter/response/'
+SNAPSHOT_PREFIX = 'inverter/snapshot/'
 
-def on_connect(client, subscriptions, flags, rc):
+MESSAGES_RECEIVED = metrics.counter(
+    'arinna_database_provider_messages_total', 'MQTT messages received')
+MESSAGE_ERRORS = metrics.counter(
+    'arinna_database_provider_errors_total', 'MQTT messages failed to store')
+MESSAGE_SECONDS = metrics.histogram(
+    'arinna_database_provider_message_seconds',
+    'Time spent handling MQTT messages')
+
+
+def on_connect(client, user_data, flags, rc):
     try:
         logger.info('Connection returned result: {}'.format(rc))
-        for topic in subscriptions:
+        for topic in user_data['topics']:
             client.subscribe(topic)
     except Exception:
         logger.exception('Unknown exception occurred in on_connect')
 
 
-def on_disconnect(client, subscriptions, rc):
+def on_disconnect(client, user_data, rc):
     try:
         logger.info('Disconnection returned result: {}'.format(rc))
     except Exception:
         logger.exception('Unknown exception occurred in on_disconnect')
 
 
-def on_message(_, subscriptions, message):
+def on_message(_, user_data, message):
+    MESSAGES_RECEIVED.inc()
+    with MESSAGE_SECONDS.time():
+        handle_message(user_data, message)
+
+
+def handle_message(user_data, message):
     try:
-        logger.info('Message received')
-        logger.info('Payload: {}'.format(message.payload))
-        logger.info('Topic: {}'.format(message.topic))
         topic = message.topic
-        subscription = subscriptions[topic]
-        raw_value = message.payload.decode().replace(',', '.')
-        with DatabaseClient() as db_client:
-            db_client.save(subscription['measurement'],
-                           subscription['type'](raw_value))
+        logger.debug('Message received on %s: %s', topic, message.payload)
+        if topic.startswith(SNAPSHOT_PREFIX):
+            on_snapshot(user_data, message)
+            return
+        decoder = user_data['topic_decoders'].get(topic)
+        if decoder is None:
+            count_unknown_topic(user_data, topic)
+            return
+        measurement, parse = decoder
+        user_data['writer'].add(measurement, parse(message.payload))
     except Exception:
+        MESSAGE_ERRORS.inc()
         logger.exception('Unknown exception occurred in on_message')
 
 
+def on_snapshot(user_data, message):
+    snapshot = json.loads(message.payload.decode())
+    timestamp = now_ns()
+    points = []
+    for key, raw_value in snapshot.items():
+        decoder = user_data['decoders'].get(key)
+        if decoder is None:
+            count_unknown_topic(user_data, RESPONSE_PREFIX + key)
+            continue
+        measurement, parse = decoder
+        points.append(point(measurement, parse(str(raw_value).encode()),
+                            timestamp))
+    user_data['writer'].add_points(points)
+
+
+def count_unknown_topic(user_data, topic):
+    unknown_topics = user_data['unknown_topics']
+    if topic not in unknown_topics:
+        logger.warning('Unknown topic: {}'.format(topic))
+    unknown_topics[topic] += 1
+
+
 def percent(value):
     return float(int(value) / 100)
 
@@ -61,118 +111,81 @@ def int_from_device_mode(value):
     return mapping[value]
 
 
+def register_metrics(writer, spool=None):
+    metrics.gauge('arinna_database_writer_buffered_points',
+                  'Points waiting to be flushed',
+                  lambda: len(writer.buffer))
+    metrics.gauge('arinna_database_writer_flush_seconds',
+                  'Latency of the last flush',
+                  lambda: writer.last_flush_latency)
+    metrics.gauge('arinna_database_writer_points_per_second',
+                  'Points flushed per second since start',
+                  writer.points_rate)
+    if spool is not None:
+        metrics.gauge('arinna_spool_points_spooled',
+                      'Points appended to the spool',
+                      lambda: spool.points_spooled)
+        metrics.gauge('arinna_spool_points_replayed',
+                      'Points replayed from the spool',
+                      lambda: spool.points_replayed)
+        metrics.gauge('arinna_spool_evicted_segments',
+                      'Spool segments evicted because the spool was full',
+                      lambda: spool.evicted_segments)
+
+
+def open_writer(stack, settings, db_client):
+    spool = None
+    if settings.spool_path:
+        spool = stack.enter_context(
+            Spool(settings.spool_path, settings.spool_max_bytes))
+        stack.enter_context(SpoolReplayer(spool, db_client))
+    writer = stack.enter_context(
+        DatabaseWriter(db_client,
+                       settings.database_batch_size,
+                       settings.database_flush_interval,
+                       spool))
+    register_metrics(writer, spool)
+    return writer
+
+
 def main():
+    settings = config.load()
     log.setup_logging()
 
-    subscriptions = {
-        'inverter/response/grid_voltage': {
-            'measurement': 'grid_voltage',
-            'type': float
-        }, 'inverter/response/grid_frequency': {
-            'measurement': 'grid_frequency',
-            'type': float
-        }, 'inverter/response/ac_output_voltage': {
-            'measurement': 'ac_output_voltage',
-            'type': float
-        }, 'inverter/response/ac_output_frequency': {
-            'measurement': 'ac_output_frequency',
-            'type': float
-        }, 'inverter/response/ac_output_apparent_power': {
-            'measurement': 'ac_output_apparent_power',
-            'type': int
-        }, 'inverter/response/ac_output_active_power': {
-            'measurement': 'ac_output_active_power',
-            'type': int
-        }, 'inverter/response/output_load_percent': {
-            'measurement': 'output_load_percent',
-            'type': percent
-        }, 'inverter/response/bus_voltage': {
-            'measurement': 'bus_voltage',
-            'type': int
-        }, 'inverter/response/battery_voltage': {
-            'measurement': 'battery_voltage',
-            'type': float
-        }, 'inverter/response/battery_charging_current': {
-            'measurement': 'battery_charging_current',
-            'type': int
-        }, 'inverter/response/battery_capacity': {
-            'measurement': 'battery_capacity',
-            'type': percent
-        }, 'inverter/response/inverter_heat_sink_temperature': {
-            'measurement': 'inverter_heat_sink_temperature',
-            'type': int
-        }, 'inverter/response/pv_input_current_for_battery': {
-            'measurement': 'pv_input_current_for_battery',
-            'type': int
-        }, 'inverter/response/pv_input_voltage': {
-            'measurement': 'pv_input_voltage',
-            'type': float
-        }, 'inverter/response/battery_voltage_from_scc': {
-            'measurement': 'battery_voltage_from_scc',
-            'type': float
-        }, 'inverter/response/battery_discharge_current': {
-            'measurement': 'battery_discharge_current',
-            'type': int
-        }, 'inverter/response/is_sbu_priority_version_added': {
-            'measurement': 'is_sbu_priority_version_added',
-            'type': bool_from_string
-        }, 'inverter/response/is_configuration_changed': {
-            'measurement': 'is_configuration_changed',
-            'type': bool_from_string
-        }, 'inverter/response/is_scc_firmware_updated': {
-            'measurement': 'is_scc_firmware_updated',
-            'type': bool_from_string
-        }, 'inverter/response/is_load_on': {
-            'measurement': 'is_load_on',
-            'type': bool_from_string
-        }, 'inverter/response/is_battery_voltage_to_steady_while_charging': {
-            'measurement': 'is_battery_voltage_to_steady_while_charging',
-            'type': bool_from_string
-        }, 'inverter/response/is_charging_on': {
-            'measurement': 'is_charging_on',
-            'type': bool_from_string
-        }, 'inverter/response/is_scc_charging_on': {
-            'measurement': 'is_scc_charging_on',
-            'type': bool_from_string
-        }, 'inverter/response/is_ac_charging_on': {
-            'measurement': 'is_ac_charging_on',
-            'type': bool_from_string
-        }, 'inverter/response/battery_voltage_offset_for_fans_on': {
-            'measurement': 'battery_voltage_offset_for_fans_on',
-            'type': int
-        }, 'inverter/response/eeprom_version': {
-            'measurement': 'eeprom_version',
-            'type': int
-        }, 'inverter/response/pv_charging_power': {
-            'measurement': 'pv_charging_power',
-            'type': int
-        }, 'inverter/response/is_charging_to_floating_enabled': {
-            'measurement': 'is_charging_to_floating_enabled',
-            'type': bool_from_string
-        }, 'inverter/response/is_switch_on': {
-            'measurement': 'is_switch_on',
-            'type': bool_from_string
-        }, 'inverter/response/is_dustproof_installed': {
-            'measurement': 'is_dustproof_installed',
-            'type': bool_from_string
-        }, 'inverter/response/device_mode': {
-            'measurement': 'device_mode',
-            'type': int_from_device_mode
-        }
-    }
+    decoders = schema.load_decoders()
+    if settings.publish_snapshots:
+        topics = [SNAPSHOT_PREFIX + '+']
+    else:
+        topics = [RESPONSE_PREFIX + '#']
+    unknown_topics = collections.Counter()
 
     logger.info('MQTT loop started')
     try:
-        with MQTTClient(on_connect=on_connect,
-                        on_disconnect=on_disconnect,
-                        on_message=on_message,
-                        user_data=subscriptions) as mqtt_client:
+        with contextlib.ExitStack() as stack:
+            db_client = stack.enter_context(DatabaseClient())
+            writer = open_writer(stack, settings, db_client)
+            stack.enter_context(metrics.exporter(settings,
+                                                 'database_provider'))
+            mqtt_client = stack.enter_context(
+                MQTTClient(on_connect=on_connect,
+                           on_disconnect=on_disconnect,
+                           on_message=on_message,
+                           user_data={
+                               'decoders': decoders,
+                               'topic_decoders': schema.topic_decoders(
+                                   decoders, RESPONSE_PREFIX),
+                               'topics': topics,
+                               'unknown_topics': unknown_topics,
+                               'writer': writer
+                           }))
             mqtt_client.loop_forever()
     except KeyboardInterrupt:
         logger.info('MQTT loop stopped by user')
     except Exception:
         logger.exception('Unknown exception occurred')
     logger.info('MQTT loop stopped')
+    if unknown_topics:
+        logger.warning('Unknown topics: {}'.format(dict(unknown_topics)))
 
     return 0
 
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+
+import logging
+import threading
+import time
+import arinna.metrics as metrics
+
+logger = logging.getLogger(__name__)
+
+POINTS_DROPPED = metrics.counter(
+    'arinna_database_points_dropped_total',
+    'Points lost after a failed flush')
+
+
+class DatabaseWriter:
+    def __init__(self, database, batch_size=100, flush_interval=1.0,
+                 spool=None):
+        self.database = database
+        self.spool = spool
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.buffer = []
+        self.condition = threading.Condition()
+        self.thread = None
+        self.is_running = False
+        self.start_time = None
+        self.points_written = 0
+        self.points_dropped = 0
+        self.flush_count = 0
+        self.last_flush_latency = 0.0
+
+    def start(self):
+        logger.info('Starting database writer')
+        logger.info('Batch size: {}'.format(self.batch_size))
+        logger.info('Flush interval: {}'.format(self.flush_interval))
+        self.is_running = True
+        self.start_time = time.monotonic()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+        logger.info('Database writer started')
+
+    def stop(self):
+        logger.info('Stopping database writer')
+        with self.condition:
+            self.is_running = False
+            self.condition.notify()
+        if self.thread:
+            self.thread.join()
+            self.thread = None
+        self.flush()
+        logger.info('Database writer stopped')
+
+    def add(self, measurement, value, timestamp=None):
+        self.add_points([point(measurement, value, timestamp)])
+
+    def add_points(self, points):
+        with self.condition:
+            self.buffer.extend(points)
+            if len(self.buffer) >= self.batch_size:
+                self.condition.notify()
+
+    def run(self):
+        while True:
+            with self.condition:
+                deadline = time.monotonic() + self.flush_interval
+                while self.is_running and len(self.buffer) < self.batch_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self.condition.wait(remaining)
+                if not self.is_running:
+                    return
+            self.flush()
+
+    def flush(self):
+        with self.condition:
+            points, self.buffer = self.buffer, []
+        if not points:
+            return
+        start = time.monotonic()
+        try:
+            self.database.save_points(points)
+        except Exception:
+            logger.exception('Failed to flush {} points'.format(len(points)))
+            self.spool_points(points)
+            return
+        end = time.monotonic()
+        self.points_written += len(points)
+        self.flush_count += 1
+        self.last_flush_latency = end - start
+        logger.info('Flushed {} points in {:.1f} ms ({:.1f} points/s)'.format(
+            len(points), self.last_flush_latency * 1000, self.points_rate()))
+
+    def spool_points(self, points):
+        if self.spool is not None:
+            try:
+                self.spool.append(points)
+                return
+            except Exception:
+                logger.exception('Failed to spool {} points'.format(
+                    len(points)))
+        self.points_dropped += len(points)
+        POINTS_DROPPED.inc(len(points))
+
+    def points_rate(self):
+        if self.start_time is None:
+            return 0.0
+        elapsed = time.monotonic() - self.start_time
+        return self.points_written / elapsed if elapsed > 0 else 0.0
+
+    def __enter__(self):
+        logger.debug('Entering context manager')
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        logger.debug('Exiting context manager')
+        self.stop()
+
+
+def point(measurement, value, timestamp=None):
+    if timestamp is None:
+        timestamp = now_ns()
+    return {
+        'measurement': measurement,
+        'time': timestamp,
+        'fields': {
+            'value': value
+        }
+    }
+
+
+def now_ns():
+    return int(time.time() * 10 ** 9)
@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+
+import datetime
+import json
+import logging
+import math
+import os
+import time
+import arinna.tariff as tariff
+from arinna.database_client import DatabaseClient, time_window_seconds
+
+logger = logging.getLogger(__name__)
+
+MEASUREMENTS = [
+    'pv_charging_power',
+    'ac_output_active_power',
+    'battery_charging_current',
+    'battery_voltage',
+]
+
+ENERGIES = ['pv_yield', 'load_consumption', 'grid_charging']
+
+
+def hold(times, values, max_gap):
+    import numpy
+    finite = numpy.isfinite(values)
+    index = numpy.maximum.accumulate(
+        numpy.where(finite, numpy.arange(len(values)), -1))
+    last = numpy.maximum(index, 0)
+    fresh = (index >= 0) & (times - times[last] <= max_gap)
+    return numpy.where(fresh, values[last], numpy.nan)
+
+
+def segments(times, power, max_gap=60.0):
+    import numpy
+    times = numpy.asarray(times, dtype=float)
+    power = numpy.asarray(power, dtype=float)
+    finite = numpy.isfinite(power)
+    times, power = times[finite], power[finite]
+    dt = numpy.diff(times)
+    valid = (dt > 0) & (dt <= max_gap)
+    midpoints = (times[:-1] + times[1:]) / 2
+    energy = (power[:-1] + power[1:]) * dt / 2 / 3600
+    return midpoints[valid], energy[valid]
+
+
+def integrate(times, power, max_gap=60.0):
+    _, energy = segments(times, power, max_gap)
+    return float(energy.sum())
+
+
+def grid_charging_power(battery_voltage, battery_charging_current,
+                        pv_charging_power):
+    import numpy
+    return numpy.clip(battery_voltage * battery_charging_current
+                      - pv_charging_power, 0, None)
+
+
+def powers(times, columns, max_gap=60.0):
+    held = {measurement: hold(times, column, max_gap)
+            for measurement, column in columns.items()}
+    return {
+        'pv_yield': held['pv_charging_power'],
+        'load_consumption': held['ac_output_active_power'],
+        'grid_charging': grid_charging_power(
+            held['battery_voltage'], held['battery_charging_current'],
+            held['pv_charging_power']),
+    }
+
+
+def boundaries(start, end):
+    changes = sorted({datetime.time(0)}.union(
+        *(set(window) for window in tariff.WINDOWS.values())))
+    day = datetime.date.fromtimestamp(start) - datetime.timedelta(days=1)
+    last_day = datetime.date.fromtimestamp(end)
+    edges = []
+    while day <= last_day:
+        for change in changes:
+            moment = datetime.datetime.combine(day, change)
+            edges.append((moment.timestamp(), day.isoformat(),
+                          tariff.window(change)))
+        day += datetime.timedelta(days=1)
+    return sorted(edges)
+
+
+def totals(midpoints, energy, edges):
+    import numpy
+    index = numpy.searchsorted([edge[0] for edge in edges], midpoints,
+                               side='right') - 1
+    sums = numpy.bincount(index, weights=energy, minlength=len(edges))
+    result = {}
+    for (_, day, window), value in zip(edges, sums):
+        if value:
+            windows = result.setdefault(day, {})
+            windows[window] = windows.get(window, 0.0) + float(value)
+    return result
+
+
+class EnergyLedger:
+    def __init__(self, path=None, max_gap=60.0):
+        self.path = path
+        self.max_gap = max_gap
+        self.days = {}
+        self.last_time = None
+        self.last_values = {}
+        if path and os.path.exists(path):
+            with open(path) as f:
+                state = json.load(f)
+            self.days = state['days']
+            self.last_time = state['last_time']
+            self.last_values = state['last_values']
+
+    def update(self, times, columns):
+        import numpy
+        times = numpy.asarray(times, dtype=float)
+        columns = {measurement: numpy.asarray(column, dtype=float)
+                   for measurement, column in columns.items()}
+        if self.last_time is not None:
+            new = times > self.last_time
+            times = numpy.concatenate(([self.last_time], times[new]))
+            columns = {measurement: numpy.concatenate((
+                [numpy.nan if self.last_values.get(measurement) is None
+                 else self.last_values[measurement]], column[new]))
+                for measurement, column in columns.items()}
+        if len(times) < 2:
+            return 0
+        edges = boundaries(times[0], times[-1])
+        for energy_name, power in powers(times, columns,
+                                         self.max_gap).items():
+            midpoints, energy = segments(times, power, self.max_gap)
+            self.add(energy_name, totals(midpoints, energy, edges))
+        self.last_time = float(times[-1])
+        self.last_values = {
+            measurement: None if math.isnan(column[-1]) else float(column[-1])
+            for measurement, column in columns.items()}
+        self.save()
+        return len(times) - 1
+
+    def add(self, energy_name, day_totals):
+        for day, windows in day_totals.items():
+            energies = self.days.setdefault(day, {})
+            ledger = energies.setdefault(energy_name, {'total': 0.0})
+            for window, value in windows.items():
+                ledger[window] = ledger.get(window, 0.0) + value
+                ledger['total'] += value
+
+    def save(self):
+        if not self.path:
+            return
+        temporary_path = self.path + '.tmp'
+        with open(temporary_path, 'w') as f:
+            json.dump({'days': self.days, 'last_time': self.last_time,
+                       'last_values': self.last_values}, f)
+        os.replace(temporary_path, self.path)
+
+
+def update(database_client, ledger, bucket='10s', initial_window='7d',
+           now=None):
+    now = time.time() if now is None else now
+    seconds = time_window_seconds(bucket)
+    if ledger.last_time is None:
+        window = initial_window
+    else:
+        window = '{}s'.format(
+            int(math.ceil(now - ledger.last_time)) + 2 * seconds)
+    logger.info('Updating energy totals from last {}'.format(window))
+    series = database_client.series(MEASUREMENTS, window, bucket)
+    complete = series.time + seconds <= now
+    times = series.time[complete] + seconds / 2
+    columns = {measurement: series.columns[measurement][complete]
+               for measurement in MEASUREMENTS}
+    processed = ledger.update(times, columns)
+    logger.info('Energy totals updated: {} buckets'.format(processed))
+    return processed
+
+
+def add_arguments(parser):
+    parser.add_argument('--host', default='localhost')
+    parser.add_argument('--port', type=int, default=8086)
+    parser.add_argument('--database', default='inverter')
+    parser.add_argument('--checkpoint', default='energy.json',
+                        help='File with daily totals to update')
+    parser.add_argument('--bucket', default='10s',
+                        help='Resampling interval, e.g. 10s')
+    parser.add_argument('--max-gap', type=float, default=60.0,
+                        help='Longest gap in seconds to integrate across')
+    parser.add_argument('--initial-window', default='7d',
+                        help='How far back to start without a checkpoint')
+
+
+def run(args):
+    import influxdb
+    db_client = influxdb.InfluxDBClient(args.host, args.port)
+    ledger = EnergyLedger(args.checkpoint, args.max_gap)
+    try:
+        update(DatabaseClient(db_client, args.database), ledger, args.bucket,
+               args.initial_window)
+    finally:
+        db_client.close()
+    print(json.dumps(ledger.days, indent=2, sort_keys=True))
+    return 0
@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+
+import concurrent.futures
+import csv
+import gzip
+import json
+import logging
+import os
+import threading
+import time
+from arinna.memory_database import time_ns
+
+logger = logging.getLogger(__name__)
+
+HEADER = ['name', 'tags', 'time', 'value']
+
+
+def parse_time(value):
+    if value is None:
+        return None
+    if value.isdigit():
+        return int(value)
+    return time_ns(value)
+
+
+def format_value(value):
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    return value
+
+
+class Checkpoint:
+    def __init__(self, path=None):
+        self.path = path
+        self.lock = threading.Lock()
+        self.positions = {}
+        if path and os.path.exists(path):
+            with open(path) as f:
+                self.positions = json.load(f)
+
+    def get(self, measurement):
+        return self.positions.get(measurement)
+
+    def set(self, measurement, position):
+        with self.lock:
+            self.positions[measurement] = position
+            if not self.path:
+                return
+            temporary_path = self.path + '.tmp'
+            with open(temporary_path, 'w') as f:
+                json.dump(self.positions, f)
+            os.replace(temporary_path, self.path)
+
+
+def discover_measurements(db_client, database):
+    result = db_client.query('SHOW MEASUREMENTS', database=database)
+    return [p['name'] for p in result.get_points()]
+
+
+def page_query(measurement, after=None, start=None, end=None,
+               page_size=10000):
+    conditions = []
+    if after is not None:
+        conditions.append('time > {}'.format(after))
+    elif start is not None:
+        conditions.append('time >= {}'.format(start))
+    if end is not None:
+        conditions.append('time < {}'.format(end))
+    query = 'SELECT "value" FROM "{}"'.format(measurement)
+    if conditions:
+        query += ' WHERE ' + ' AND '.join(conditions)
+    return query + ' ORDER BY time LIMIT {}'.format(page_size)
+
+
+def read_pages(db_client, database, measurement, after=None, start=None,
+               end=None, page_size=10000):
+    while True:
+        query = page_query(measurement, after, start, end, page_size)
+        result = db_client.query(query, database=database, epoch='ns',
+                                 chunked=True, chunk_size=page_size)
+        chunks = [result] if hasattr(result, 'get_points') else result
+        count = 0
+        for chunk in chunks:
+            points = list(chunk.get_points(measurement))
+            if points:
+                count += len(points)
+                after = points[-1]['time']
+                yield points
+        if count < page_size:
+            return
+
+
+def export_measurement(db_client, database, measurement, output_dir,
+                       start=None, end=None, page_size=10000,
+                       checkpoint=None):
+    checkpoint = checkpoint or Checkpoint()
+    path = os.path.join(output_dir, measurement + '.csv.gz')
+    after = checkpoint.get(measurement) if os.path.exists(path) else None
+    if after is not None:
+        logger.info('Resuming {} after {}'.format(measurement, after))
+    count = 0
+    with gzip.open(path, 'wt' if after is None else 'at', newline='') as f:
+        writer = csv.writer(f)
+        if after is None:
+            writer.writerow(HEADER)
+        for points in read_pages(db_client, database, measurement, after,
+                                 start, end, page_size):
+            writer.writerows([measurement, '', p['time'],
+                              format_value(p['value'])] for p in points)
+            count += len(points)
+            f.flush()
+            checkpoint.set(measurement, points[-1]['time'])
+    return count
+
+
+def export(db_client, database, output_dir, measurements=None, start=None,
+           end=None, workers=4, page_size=10000, checkpoint_path=None):
+    logger.info('Exporting database: {}'.format(database))
+    os.makedirs(output_dir, exist_ok=True)
+    if not measurements:
+        measurements = discover_measurements(db_client, database)
+    logger.info('Measurements: {}'.format(measurements))
+    checkpoint = Checkpoint(checkpoint_path)
+    started = time.monotonic()
+    total = 0
+    failed = []
+    with concurrent.futures.ThreadPoolExecutor(workers) as executor:
+        futures = {
+            executor.submit(export_measurement, db_client, database,
+                            measurement, output_dir, start, end, page_size,
+                            checkpoint): measurement
+            for measurement in measurements
+        }
+        for future in concurrent.futures.as_completed(futures):
+            measurement = futures[future]
+            try:
+                count = future.result()
+            except Exception:
+                logger.exception('Failed to export {}'.format(measurement))
+                failed.append(measurement)
+                continue
+            logger.info('Exported {} points from {}'.format(count,
+                                                            measurement))
+            total += count
+    elapsed = time.monotonic() - started
+    logger.info('Exported {} points in {:.1f} s ({:.1f} points/s)'.format(
+        total, elapsed, total / elapsed if elapsed > 0 else 0.0))
+    return total, failed
+
+
+def add_arguments(parser):
+    parser.add_argument('--host', default='localhost')
+    parser.add_argument('--port', type=int, default=8086)
+    parser.add_argument('--database', default='inverter')
+    parser.add_argument('--output', default='.',
+                        help='Directory for <measurement>.csv.gz files')
+    parser.add_argument('--measurement', action='append', dest='measurements',
+                        help='Measurement to export, all when omitted')
+    parser.add_argument('--start', help='RFC3339 time or epoch ns, inclusive')
+    parser.add_argument('--end', help='RFC3339 time or epoch ns, exclusive')
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--page-size', type=int, default=10000)
+    parser.add_argument('--checkpoint',
+                        help='File to record progress and resume from')
+
+
+def run(args):
+    import influxdb
+    db_client = influxdb.InfluxDBClient(args.host, args.port)
+    try:
+        _, failed = export(db_client, args.database, args.output,
+                           args.measurements, parse_time(args.start),
+                           parse_time(args.end), args.workers,
+                           args.page_size, args.checkpoint)
+    finally:
+        db_client.close()
+    return 1 if failed else 0
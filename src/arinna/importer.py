@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+
+import concurrent.futures
+import csv
+import gzip
+import io
+import logging
+import sys
+import threading
+import time
+import arinna.schema as schema
+from arinna.memory_database import PRECISIONS, time_ns
+
+logger = logging.getLogger(__name__)
+
+BOOLEANS = {
+    'true': True, 't': True, '1': True,
+    'false': False, 'f': False, '0': False,
+}
+
+
+class InvalidRow(ValueError):
+    pass
+
+
+def escape_key(key):
+    return key.replace(',', r'\,').replace(' ', r'\ ').replace('=', r'\=')
+
+
+def infer_type(value):
+    if value.lower() in ('true', 'false'):
+        return 'bool'
+    try:
+        float(value)
+    except ValueError:
+        return 'str'
+    return 'float'
+
+
+def format_field(value, field_type):
+    if field_type == 'float':
+        return repr(float(value.replace(',', '.')))
+    if field_type == 'int':
+        return '{}i'.format(int(value))
+    if field_type == 'bool':
+        try:
+            return 't' if BOOLEANS[value.lower()] else 'f'
+        except KeyError:
+            raise ValueError('Invalid boolean: {}'.format(value)) from None
+    return '"{}"'.format(value.replace('\\', '\\\\').replace('"', '\\"'))
+
+
+def parse_row_time(value, precision):
+    t = int(value) if value.isdigit() else time_ns(value)
+    return t // PRECISIONS[precision]
+
+
+class LineConverter:
+    def __init__(self, field_types=None, precision='n'):
+        self.field_types = dict(field_types or {})
+        self.precision = precision
+
+    def convert(self, row):
+        try:
+            name, tags, t, value = row['name'], row.get('tags', ''), \
+                row['time'], row['value']
+        except KeyError as e:
+            raise InvalidRow('Missing column: {}'.format(e)) from None
+        if not name or value in (None, ''):
+            raise InvalidRow('Empty measurement or value')
+        field_type = self.field_types.get(name)
+        if field_type is None:
+            field_type = self.field_types[name] = infer_type(value)
+        try:
+            field = format_field(value, field_type)
+            timestamp = parse_row_time(t, self.precision)
+        except (ValueError, TypeError) as e:
+            raise InvalidRow(str(e)) from None
+        key = escape_key(name)
+        if tags:
+            key += ',' + tags
+        return '{} value={} {}'.format(key, field, timestamp)
+
+
+def open_input(path):
+    if path == '-':
+        return io.TextIOWrapper(sys.stdin.buffer, newline='')
+    if path.endswith('.gz'):
+        return gzip.open(path, 'rt', newline='')
+    return open(path, newline='')
+
+
+def read_lines(paths, converter, stats):
+    for path in paths:
+        logger.info('Reading {}'.format(path))
+        with open_input(path) as f:
+            for number, row in enumerate(csv.DictReader(f), start=2):
+                try:
+                    yield converter.convert(row)
+                except InvalidRow as e:
+                    stats.invalid += 1
+                    if stats.invalid <= 10:
+                        logger.warning('Invalid row {}:{}: {}'.format(
+                            path, number, e))
+
+
+def batches(lines, batch_size):
+    batch = []
+    for line in lines:
+        batch.append(line)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+class ImportStats:
+    def __init__(self):
+        self.points = 0
+        self.written = 0
+        self.invalid = 0
+        self.failed_batches = 0
+        self.elapsed = 0.0
+
+    def points_rate(self):
+        return self.points / self.elapsed if self.elapsed > 0 else 0.0
+
+
+class Importer:
+    def __init__(self, client_factory, database, precision='n',
+                 batch_size=5000, connections=4, field_types=None,
+                 dry_run=False):
+        self.client_factory = client_factory
+        self.database = database
+        self.precision = precision
+        self.batch_size = batch_size
+        self.connections = connections
+        self.converter = LineConverter(field_types, precision)
+        self.dry_run = dry_run
+        self.local = threading.local()
+        self.clients = []
+        self.lock = threading.Lock()
+
+    def client(self):
+        client = getattr(self.local, 'client', None)
+        if client is None:
+            client = self.local.client = self.client_factory()
+            with self.lock:
+                self.clients.append(client)
+        return client
+
+    def write(self, batch):
+        self.client().write_points(batch, database=self.database,
+                                   time_precision=self.precision,
+                                   protocol='line')
+        return len(batch)
+
+    def run(self, paths):
+        stats = ImportStats()
+        started = time.monotonic()
+        lines = read_lines(paths, self.converter, stats)
+        if self.dry_run:
+            for _ in lines:
+                stats.points += 1
+        else:
+            self.write_batches(lines, stats)
+        stats.elapsed = time.monotonic() - started
+        for client in self.clients:
+            client.close()
+        logger.info('{} {} points in {:.1f} s ({:.1f} points/s), '
+                    '{} invalid rows, {} failed batches'.format(
+                        'Validated' if self.dry_run else 'Imported',
+                        stats.points, stats.elapsed, stats.points_rate(),
+                        stats.invalid, stats.failed_batches))
+        return stats
+
+    def write_batches(self, lines, stats):
+        in_flight = threading.BoundedSemaphore(2 * self.connections)
+        lock = threading.Lock()
+
+        def done(future):
+            in_flight.release()
+            try:
+                written = future.result()
+            except Exception:
+                logger.exception('Failed to write batch')
+                with lock:
+                    stats.failed_batches += 1
+                return
+            with lock:
+                stats.written += written
+
+        with concurrent.futures.ThreadPoolExecutor(
+                self.connections) as executor:
+            for batch in batches(lines, self.batch_size):
+                stats.points += len(batch)
+                in_flight.acquire()
+                executor.submit(self.write, batch).add_done_callback(done)
+
+
+def add_arguments(parser):
+    parser.add_argument('paths', nargs='+', metavar='CSV',
+                        help='CSV files with name,tags,time,value columns, '
+                             'optionally gzipped, or - for stdin')
+    parser.add_argument('--host', default='localhost')
+    parser.add_argument('--port', type=int, default=8086)
+    parser.add_argument('--database', default='inverter')
+    parser.add_argument('--precision', default='n',
+                        choices=[p for p in PRECISIONS if p],
+                        help='Precision of written timestamps')
+    parser.add_argument('--batch-size', type=int, default=5000)
+    parser.add_argument('--connections', type=int, default=4)
+    parser.add_argument('--dry-run', action='store_true',
+                        help='Only validate the input')
+
+
+def run(args):
+    import influxdb
+    importer = Importer(
+        lambda: influxdb.InfluxDBClient(args.host, args.port),
+        args.database, args.precision, args.batch_size, args.connections,
+        schema.field_types(schema.load()), args.dry_run)
+    stats = importer.run(args.paths)
+    return 1 if stats.invalid or stats.failed_batches else 0
@@ -1,12 +1,18 @@
 #!/usr/bin/env python3
 
+import json
 import logging
+import queue
 import arinna.log as log
+import arinna.metrics as metrics
 import sys
-import queue
+import time
 import arinna.config as config
 import arinna.mqtt_client
-import mppsolar
+from arinna.command_queue import CommandQueue, ResponsePublisher, is_query
+from arinna.inverter_serial import InverterSerial, ProtocolError
+from arinna.inverter_serial import normalise_options
+from arinna.inverter_serial import SERIAL_ERRORS, SERIAL_SECONDS
 
 logger = logging.getLogger(__name__)
 
@@ -15,11 +21,19 @@ class InverterSerialAdapter:
     def __init__(self, port, baudrate):
         logger.info('Port: {}'.format(port))
         logger.info('Baudrate: {}'.format(baudrate))
+        import mppsolar
         self.serial_adapter = mppsolar.mppUtils(port, baudrate)
 
     def send_command(self, command):
         logger.info('Sending command: {}'.format(command))
-        response = self.serial_adapter.getResponseDict(command)
+        try:
+            with SERIAL_SECONDS.labels(command=command).time():
+                response = self.serial_adapter.getResponseDict(command)
+        except Exception:
+            SERIAL_ERRORS.labels(command=command).inc()
+            raise
+        if command == 'QPIRI':
+            response = normalise_options(response)
         return response
 
 
@@ -44,18 +58,89 @@ class InverterMQTTSubscriber:
         self.mqtt_client.subscribe('inverter/request')
 
 
+class ExceptionFilter:
+    def __init__(self, keyframe_interval=60, deadbands=None,
+                 clock=time.monotonic, keyframe_commands=('QPIRI',)):
+        self.keyframe_interval = keyframe_interval
+        self.deadbands = deadbands or {}
+        self.keyframe_commands = keyframe_commands
+        self.clock = clock
+        self.last_values = {}
+        self.last_keyframes = {}
+        self.published = 0
+        self.suppressed = 0
+
+    def filter(self, response, command=None):
+        now = self.clock()
+        last_keyframe = self.last_keyframes.get(command)
+        if last_keyframe is None or command in self.keyframe_commands or \
+                now - last_keyframe >= self.keyframe_interval:
+            logger.info('Publishing keyframe for {}'.format(command))
+            logger.info('Suppression ratio: {:.3f}'.format(
+                self.suppression_ratio()))
+            self.last_keyframes[command] = now
+            changes = response
+        else:
+            changes = {key: status for key, status in response.items()
+                       if self.is_changed(key, status[0])}
+        for key, (value, unit) in changes.items():
+            self.last_values[key] = value
+        self.published += len(changes)
+        self.suppressed += len(response) - len(changes)
+        return changes
+
+    def is_changed(self, key, value):
+        if key not in self.last_values:
+            return True
+        last_value = self.last_values[key]
+        deadband = self.deadbands.get(key)
+        if deadband is None:
+            return value != last_value
+        try:
+            return abs(float(value.replace(',', '.'))
+                       - float(last_value.replace(',', '.'))) > deadband
+        except ValueError:
+            return value != last_value
+
+    def suppression_ratio(self):
+        total = self.published + self.suppressed
+        return self.suppressed / total if total else 0.0
+
+
 class InverterMQTTPublisher:
-    def __init__(self, mqtt_client):
+    def __init__(self, mqtt_client, publish_fields=True,
+                 publish_snapshots=False, response_filter=None):
         self.mqtt_client = mqtt_client
+        self.publish_fields = publish_fields
+        self.publish_snapshots = publish_snapshots
+        self.response_filter = response_filter
 
-    def publish_response(self, response):
-        for key, status in response.items():
-            logger.info('Sending response')
-            topic = 'inverter/response/' + key
-            value, unit = status
-            logger.info('Topic: {}'.format(topic))
-            logger.info('Payload: {}'.format(value))
-            self.mqtt_client.publish(topic, value)
+    def publish_response(self, response, command=None):
+        if self.response_filter:
+            response = self.response_filter.filter(response, command)
+            if not response:
+                logger.info('No changes to publish')
+                return
+        if self.publish_fields:
+            for key, status in response.items():
+                logger.info('Sending response')
+                topic = 'inverter/response/' + key
+                value, unit = status
+                logger.info('Topic: {}'.format(topic))
+                logger.info('Payload: {}'.format(value))
+                self.mqtt_client.publish(topic, value)
+        if self.publish_snapshots and command:
+            self.publish_snapshot(command, response)
+
+    def publish_snapshot(self, command, response):
+        logger.info('Sending snapshot')
+        topic = 'inverter/snapshot/' + command
+        payload = json.dumps({key: value
+                              for key, (value, unit) in response.items()},
+                             separators=(',', ':'))
+        logger.info('Topic: {}'.format(topic))
+        logger.info('Payload: {}'.format(payload))
+        self.mqtt_client.publish(topic, payload)
 
     def publish_request(self, request):
         logger.info('Publishing message')
@@ -66,13 +151,85 @@ class InverterMQTTPublisher:
         logger.info('Message published')
 
 
+def handle_command(command, serial_adapter, command_queue,
+                   response_publisher):
+    start = time.monotonic()
+    try:
+        response = serial_adapter.send_command(command)
+    except (AttributeError, ProtocolError):
+        logger.warning('Failed to parse response. Skipping.', exc_info=True)
+        return
+    except OSError:
+        logger.warning('Failed to send command. Skipping.', exc_info=True)
+        return
+    finally:
+        service_time = time.monotonic() - start
+        logger.info(
+            'Queue depth: {}, wait time: {:.3f} s, '
+            'service time: {:.3f} s'.format(
+                command_queue.qsize(), command_queue.last_wait_time,
+                service_time))
+    if not response and not is_query(command):
+        logger.info('Command acknowledged')
+        return
+    if not response:
+        logger.warning('Response is empty!')
+        return
+    logger.info('Response: {}'.format(response))
+
+    response_publisher.put(command, response)
+
+
+def register_metrics(command_queue, response_filter=None):
+    metrics.gauge('arinna_command_queue_depth', 'Commands waiting in queue',
+                  command_queue.qsize)
+    metrics.gauge('arinna_command_queue_enqueued', 'Commands enqueued',
+                  lambda: command_queue.enqueued)
+    metrics.gauge('arinna_command_queue_coalesced', 'Commands coalesced',
+                  lambda: command_queue.coalesced)
+    metrics.gauge('arinna_command_queue_dropped', 'Commands dropped',
+                  lambda: command_queue.dropped)
+    metrics.gauge('arinna_command_queue_wait_seconds',
+                  'Mean time commands waited in queue',
+                  command_queue.mean_wait_time)
+    if response_filter is not None:
+        metrics.gauge('arinna_report_by_exception_suppression_ratio',
+                      'Share of fields suppressed by report-by-exception',
+                      response_filter.suppression_ratio)
+
+
+def create_serial_adapter(settings):
+    if settings.serial_driver == 'native':
+        return InverterSerial(settings.serial_port, settings.baudrate,
+                              settings.serial_timeout)
+    return InverterSerialAdapter(settings.serial_port, settings.baudrate)
+
+
+def create_response_filter(settings):
+    if not settings.report_by_exception:
+        return None
+    return ExceptionFilter(settings.keyframe_interval, settings.deadbands)
+
+
+def serve(command_queue, serial_adapter, response_publisher, stop_event):
+    logger.info('Starting serving loop')
+    while not stop_event.is_set():
+        try:
+            command = command_queue.get(timeout=1.0)
+        except queue.Empty:
+            continue
+        logger.info('Command received: {}'.format(command))
+        handle_command(command, serial_adapter, command_queue,
+                       response_publisher)
+    logger.info('Serving loop stopped')
+
+
 def main():
     settings = config.load()
     log.setup_logging()
 
-    serial_adapter = InverterSerialAdapter(settings.serial_port,
-                                           settings.baudrate)
-    command_queue = queue.Queue()
+    serial_adapter = create_serial_adapter(settings)
+    command_queue = CommandQueue(settings.command_queue_depth)
 
     logger.info('Starting MQTT loop')
     mqtt_client = arinna.mqtt_client.MQTTClient()
@@ -81,7 +238,16 @@ def main():
     mqtt_subscriber = InverterMQTTSubscriber(command_queue,
                                              mqtt_client)
     mqtt_subscriber.subscribe_request()
-    mqtt_publisher = InverterMQTTPublisher(mqtt_client)
+    response_filter = create_response_filter(settings)
+    mqtt_publisher = InverterMQTTPublisher(mqtt_client,
+                                           settings.publish_fields,
+                                           settings.publish_snapshots,
+                                           response_filter)
+    response_publisher = ResponsePublisher(mqtt_publisher)
+    response_publisher.start()
+    register_metrics(command_queue, response_filter)
+    metrics_exporter = metrics.exporter(settings, 'inverter_provider')
+    metrics_exporter.start()
 
     try:
         logger.info('Starting listening loop')
@@ -89,23 +255,15 @@ def main():
             logger.info('Waiting for command')
             command = command_queue.get()
             logger.info('Command received: {}'.format(command))
-
-            try:
-                response = serial_adapter.send_command(command)
-            except AttributeError:
-                logger.warning('Failed to parse response. Skipping.')
-                continue
-            if not response:
-                logger.warning('Response is empty!')
-                continue
-            logger.info('Response: {}'.format(response))
-
-            mqtt_publisher.publish_response(response)
+            handle_command(command, serial_adapter, command_queue,
+                           response_publisher)
     except KeyboardInterrupt:
         logger.info('Listening loop stopped by user')
     except Exception:
         logger.exception('Unknown exception occurred')
     finally:
+        metrics_exporter.stop()
+        response_publisher.stop()
         mqtt_client.loop_stop()
         mqtt_client.disconnect()
     logger.info('Listening loop stopped')
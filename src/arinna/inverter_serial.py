@@ -0,0 +1,305 @@
+#!/usr/bin/env python3
+
+import logging
+import time
+import arinna.metrics as metrics
+
+logger = logging.getLogger(__name__)
+
+SERIAL_SECONDS = metrics.histogram(
+    'arinna_serial_round_trip_seconds', 'Inverter command round-trip time')
+SERIAL_ERRORS = metrics.counter(
+    'arinna_serial_errors_total', 'Inverter commands that failed')
+
+
+class ProtocolError(RuntimeError):
+    pass
+
+
+def crc16(data):
+    crc = 0
+    for byte in data:
+        crc ^= byte << 8
+        for _ in range(8):
+            if crc & 0x8000:
+                crc = ((crc << 1) ^ 0x1021) & 0xffff
+            else:
+                crc = (crc << 1) & 0xffff
+    return adjust_crc(crc)
+
+
+def adjust_crc(crc):
+    high, low = crc >> 8, crc & 0xff
+    if high in (0x0a, 0x0d, 0x28):
+        high += 1
+    if low in (0x0a, 0x0d, 0x28):
+        low += 1
+    return bytes([high, low])
+
+
+FRAMES = {}
+
+
+def command_frame(command):
+    frame = FRAMES.get(command)
+    if frame is None:
+        data = command.encode()
+        frame = data + crc16(data) + b'\r'
+        FRAMES[command] = frame
+    return frame
+
+
+QPIGS_FIELDS = [
+    ('grid_voltage', 0, 5, 'V'),
+    ('grid_frequency', 6, 10, 'Hz'),
+    ('ac_output_voltage', 11, 16, 'V'),
+    ('ac_output_frequency', 17, 21, 'Hz'),
+    ('ac_output_apparent_power', 22, 26, 'VA'),
+    ('ac_output_active_power', 27, 31, 'W'),
+    ('output_load_percent', 32, 35, '%'),
+    ('bus_voltage', 36, 39, 'V'),
+    ('battery_voltage', 40, 45, 'V'),
+    ('battery_charging_current', 46, 49, 'A'),
+    ('battery_capacity', 50, 53, '%'),
+    ('inverter_heat_sink_temperature', 54, 58, 'Deg_C'),
+    ('pv_input_current_for_battery', 59, 63, 'A'),
+    ('pv_input_voltage', 64, 69, 'V'),
+    ('battery_voltage_from_scc', 70, 75, 'V'),
+    ('battery_discharge_current', 76, 81, 'A'),
+    ('is_sbu_priority_version_added', 82, 83, ''),
+    ('is_configuration_changed', 83, 84, ''),
+    ('is_scc_firmware_updated', 84, 85, ''),
+    ('is_load_on', 85, 86, ''),
+    ('is_battery_voltage_to_steady_while_charging', 86, 87, ''),
+    ('is_charging_on', 87, 88, ''),
+    ('is_scc_charging_on', 88, 89, ''),
+    ('is_ac_charging_on', 89, 90, ''),
+    ('battery_voltage_offset_for_fans_on', 91, 93, '10mV'),
+    ('eeprom_version', 94, 96, ''),
+    ('pv_charging_power', 97, 102, 'W'),
+    ('is_charging_to_floating_enabled', 103, 104, ''),
+    ('is_switch_on', 104, 105, ''),
+    ('is_dustproof_installed', 105, 106, ''),
+]
+
+QPIGS_MIN_LENGTH = 90
+
+QPIGS_SEPARATORS = sorted({end for _, _, end, _ in QPIGS_FIELDS
+                           if end not in {start for _, start, _, _
+                                          in QPIGS_FIELDS}})
+
+QMOD_MODES = {
+    ord('P'): 'Power On',
+    ord('S'): 'Standby',
+    ord('L'): 'Line',
+    ord('B'): 'Battery',
+    ord('F'): 'Fault',
+    ord('H'): 'Power Saving',
+}
+
+QPIRI_FIELDS = [
+    ('grid_rating_voltage', 'V'),
+    ('grid_rating_current', 'A'),
+    ('ac_output_rating_voltage', 'V'),
+    ('ac_output_rating_frequency', 'Hz'),
+    ('ac_output_rating_current', 'A'),
+    ('ac_output_rating_apparent_power', 'VA'),
+    ('ac_output_rating_active_power', 'W'),
+    ('battery_rating_voltage', 'V'),
+    ('battery_recharge_voltage', 'V'),
+    ('battery_under_voltage', 'V'),
+    ('battery_bulk_voltage', 'V'),
+    ('battery_float_voltage', 'V'),
+    ('battery_type', ''),
+    ('max_ac_charging_current', 'A'),
+    ('max_charging_current', 'A'),
+    ('input_voltage_range', ''),
+    ('output_source_priority', ''),
+    ('charger_source_priority', ''),
+    ('parallel_max_num', ''),
+    ('machine_type', ''),
+    ('topology', ''),
+    ('output_mode', ''),
+    ('battery_redischarge_voltage', 'V'),
+    ('pv_ok_condition_for_parallel', ''),
+    ('pv_power_balance', ''),
+]
+
+QPIRI_OPTIONS = {
+    'output_source_priority': ['Utility first', 'Solar first', 'SBU first'],
+    'charger_source_priority': ['Utility first', 'Solar first',
+                                'Solar + Utility',
+                                'Only solar charging permitted'],
+}
+
+
+def option_code(field, value):
+    value = str(value).strip()
+    for code, label in enumerate(QPIRI_OPTIONS.get(field, [])):
+        if value.lower() == label.lower():
+            return str(code)
+    return value
+
+
+def normalise_options(response):
+    return {name: [option_code(name, value), unit]
+            for name, (value, unit) in response.items()}
+
+
+def decode_qpigs(payload):
+    length = len(payload)
+    if length < QPIGS_MIN_LENGTH:
+        raise ProtocolError('QPIGS response too short: {}'.format(length))
+    for separator in QPIGS_SEPARATORS:
+        if separator < length and payload[separator] != 0x20:
+            raise ProtocolError(
+                'Unexpected QPIGS layout at offset {}'.format(separator))
+    return {name: [payload[start:end].decode(), unit]
+            for name, start, end, unit in QPIGS_FIELDS if end <= length}
+
+
+def decode_qmod(payload):
+    if len(payload) != 1 or payload[0] not in QMOD_MODES:
+        raise ProtocolError('Unexpected QMOD response: {}'.format(payload))
+    return {'device_mode': [QMOD_MODES[payload[0]], '']}
+
+
+def decode_qpiri(payload):
+    response = {}
+    start = 0
+    length = len(payload)
+    for name, unit in QPIRI_FIELDS:
+        if start >= length:
+            break
+        end = payload.find(b' ', start)
+        if end < 0:
+            end = length
+        response[name] = [payload[start:end].decode(), unit]
+        start = end + 1
+    if len(response) < len(QPIRI_FIELDS) - 2:
+        raise ProtocolError('QPIRI response too short: {}'.format(length))
+    return response
+
+
+DECODERS = {
+    'QPIGS': decode_qpigs,
+    'QMOD': decode_qmod,
+    'QPIRI': decode_qpiri,
+}
+
+
+def decode_response(command, payload):
+    decoder = DECODERS.get(command)
+    if decoder:
+        return decoder(payload)
+    if payload == b'ACK':
+        return {}
+    if payload == b'NAK':
+        raise ProtocolError('Command rejected: {}'.format(command))
+    raise ProtocolError('Unsupported command: {}'.format(command))
+
+
+def open_serial(port, baudrate, timeout):
+    import serial
+    return serial.Serial(port, baudrate, timeout=timeout)
+
+
+class InverterSerial:
+    def __init__(self, port, baudrate, timeout=1.0, stall_limit=3,
+                 serial_factory=open_serial, clock=time.monotonic):
+        logger.info('Port: {}'.format(port))
+        logger.info('Baudrate: {}'.format(baudrate))
+        self.port = port
+        self.baudrate = baudrate
+        self.timeout = timeout
+        self.stall_limit = stall_limit
+        self.serial_factory = serial_factory
+        self.clock = clock
+        self.serial = None
+        self.buffer = bytearray()
+        self.failures = 0
+        self.reconnects = 0
+
+    def open(self):
+        logger.info('Opening serial port')
+        self.serial = self.serial_factory(self.port, self.baudrate,
+                                          self.timeout)
+        logger.info('Serial port opened')
+
+    def close(self):
+        if self.serial is not None:
+            logger.info('Closing serial port')
+            try:
+                self.serial.close()
+            except OSError:
+                logger.warning('Failed to close serial port', exc_info=True)
+            self.serial = None
+            logger.info('Serial port closed')
+
+    def reconnect(self):
+        logger.warning('Serial link stalled, reconnecting')
+        self.close()
+        self.failures = 0
+        self.reconnects += 1
+        try:
+            self.open()
+        except OSError:
+            logger.warning('Failed to reopen serial port', exc_info=True)
+
+    def send_command(self, command):
+        logger.info('Sending command: {}'.format(command))
+        try:
+            if self.serial is None:
+                self.open()
+            with SERIAL_SECONDS.labels(command=command).time():
+                payload = self.transact(command)
+            response = decode_response(command, payload)
+        except ProtocolError:
+            SERIAL_ERRORS.labels(command=command).inc()
+            self.failures += 1
+            if self.failures >= self.stall_limit:
+                self.reconnect()
+            raise
+        except OSError:
+            logger.warning('Serial port error, reopening on next command')
+            SERIAL_ERRORS.labels(command=command).inc()
+            self.failures += 1
+            self.close()
+            raise
+        self.failures = 0
+        return response
+
+    def transact(self, command):
+        self.serial.reset_input_buffer()
+        self.serial.write(command_frame(command))
+        frame = self.read_frame()
+        if len(frame) < 3 or frame[0] != 0x28:
+            raise ProtocolError('Malformed response: {}'.format(frame))
+        if crc16(frame[:-2]) != frame[-2:]:
+            raise ProtocolError('Invalid CRC in response: {}'.format(frame))
+        return frame[1:-2]
+
+    def read_frame(self):
+        buffer = self.buffer
+        del buffer[:]
+        deadline = self.clock() + self.timeout
+        while True:
+            chunk = self.serial.read(max(1, self.serial.in_waiting))
+            if chunk:
+                end = chunk.find(b'\r')
+                if end >= 0:
+                    buffer += chunk[:end]
+                    return bytes(buffer)
+                buffer += chunk
+            elif self.clock() >= deadline:
+                raise ProtocolError(
+                    'Timeout waiting for response: {}'.format(bytes(buffer)))
+
+    def __enter__(self):
+        logger.debug('Entering context manager')
+        self.open()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        logger.debug('Exiting context manager')
+        self.close()
@@ -1,34 +1,54 @@
 #!/usr/bin/env python3
 
+import argparse
 import logging
+import arinna.config as config
 import arinna.log as log
+import arinna.metrics as metrics
+import arinna.mqtt_client
+import arinna.rollup as rollup
 import sys
-from arinna.database_client import DatabaseClient
+from arinna.database_client import DatabaseClient, create_db_client
+from arinna.rolling_aggregator import RollingAggregator
+from arinna.scheduler import PeriodicScheduler
 
 logger = logging.getLogger(__name__)
 
 
 class LoadBalancer:
-    def __init__(self, database, load):
+    specs = [
+        ('average', 'device_mode', '5m'),
+        ('average', 'battery_voltage', '5m'),
+        ('average', 'pv_input_voltage', '5m'),
+        ('true_percentage', 'is_charging_to_floating_enabled', '5m'),
+    ]
+
+    def __init__(self, database, load, bulk_voltage=56.4, float_voltage=54.0,
+                 min_pv_voltage=95.0, voltage_margin=0.4):
         self.database = database
         self.load = load
+        self.bulk_voltage = bulk_voltage
+        self.float_voltage = float_voltage
+        self.min_pv_voltage = min_pv_voltage
+        self.voltage_margin = voltage_margin
 
     def balance(self):
-        device_mode = self.database.moving_average('device_mode', '5m')
-        battery_voltage = self.database.moving_average('battery_voltage', '5m')
-        pv_input_voltage = self.database.moving_average('pv_input_voltage',
-                                                        '5m')
-        is_charging_to_floating_enabled = \
-            self.database.moving_true_percentage(
-                'is_charging_to_floating_enabled', '5m')
+        results = self.database.moving_aggregates(self.specs)
+        device_mode = results[('average', 'device_mode', '5m')]
+        battery_voltage = results[('average', 'battery_voltage', '5m')]
+        pv_input_voltage = results[('average', 'pv_input_voltage', '5m')]
+        is_charging_to_floating_enabled = results[
+            ('true_percentage', 'is_charging_to_floating_enabled', '5m')]
 
         if device_mode == 3.0 and \
-                pv_input_voltage > 95.0 and \
+                pv_input_voltage > self.min_pv_voltage and \
                 (
-                        (battery_voltage >= (56.4 - 0.4) and
+                        (battery_voltage >= (self.bulk_voltage -
+                                             self.voltage_margin) and
                          is_charging_to_floating_enabled == 0.0)
                         or
-                        (battery_voltage >= (54.0 - 0.4) and
+                        (battery_voltage >= (self.float_voltage -
+                                             self.voltage_margin) and
                          is_charging_to_floating_enabled == 1.0)
                 ):
             self.load.enable()
@@ -56,17 +76,48 @@ class Load:
         logger.info('Load state set')
 
 
-def main():
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Arinna load balancer')
+    parser.add_argument('--daemon', action='store_true',
+                        help='keep running and balance periodically')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    settings = config.load()
     log.setup_logging()
+    rollups = rollup.intervals() if settings.use_rollups else None
 
     try:
         with DatabaseClient(db_name='load') as load_database, \
-                DatabaseClient() as inverter_database:
+                DatabaseClient(create_db_client(settings),
+                               rollups=rollups) as inverter_database:
             load = Load(load_database)
-            load_balancer = LoadBalancer(inverter_database, load)
-            load_balancer.balance()
+            if not args.daemon:
+                load_balancer = LoadBalancer(inverter_database, load)
+                load_balancer.balance()
+                return 0
+            with arinna.mqtt_client.MQTTClient() as mqtt_client:
+                router = arinna.mqtt_client.MessageRouter(mqtt_client)
+                mqtt_client.loop_start()
+                database = inverter_database
+                if settings.use_rolling_aggregator:
+                    database = RollingAggregator(LoadBalancer.specs)
+                    database.warm(inverter_database)
+                    database.subscribe(router, settings.publish_snapshots)
+                load_balancer = LoadBalancer(database, load)
+                scheduler = PeriodicScheduler(settings.load_balancer_period,
+                                              load_balancer.balance)
+                with metrics.exporter(settings, 'load_balancer'):
+                    scheduler.run()
+                mqtt_client.loop_stop()
+    except KeyboardInterrupt:
+        logger.info('Load balancer stopped by user')
     except Exception:
         logger.exception('Unknown exception occurred')
+        if args.daemon:
+            return 1
 
     return 0
 
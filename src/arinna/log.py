@@ -1,11 +1,11 @@
 #!/usr/bin/env python3
 
 import arinna.config as config
-import logging.config
-import yaml
 
 
 def setup_logging():
+    import logging.config
+    import yaml
     settings = config.load()
     with open(settings.logging_config) as f:
         c = yaml.safe_load(f)
@@ -0,0 +1,607 @@
+#!/usr/bin/env python3
+
+import array
+import bisect
+import datetime
+import logging
+import math
+import operator as op
+import re
+import threading
+import time
+from arinna.database_client import TIME_UNITS
+
+logger = logging.getLogger(__name__)
+
+EPOCH = datetime.datetime(1970, 1, 1)
+
+PRECISIONS = {
+    None: 1,
+    'n': 1,
+    'u': 10 ** 3,
+    'ms': 10 ** 6,
+    's': 10 ** 9,
+    'm': 60 * 10 ** 9,
+    'h': 60 * 60 * 10 ** 9,
+}
+
+EPOCHS = {
+    'ns': 1,
+    'n': 1,
+    'u': 10 ** 3,
+    'ms': 10 ** 6,
+    's': 10 ** 9,
+}
+
+STATEMENT = re.compile(r'SELECT (?:(\w+)\("(\w+)"\)|"(\w+)") ?'
+                       r'FROM (?:"(\w+)"\.)?"(\w+)"(?: WHERE (.+?))?'
+                       r'(?: GROUP BY time\((\d+)(\w)\))?'
+                       r'(?: fill\((null|none|previous|linear|-?[\d.]+)\))?'
+                       r'(?: ORDER BY time(?: ASC)?)?(?: LIMIT (\d+))?$')
+
+RFC3339 = re.compile(r'(\d{4})-(\d{2})-(\d{2})[T ](\d{2}):(\d{2}):(\d{2})'
+                     r'(?:\.(\d{1,9}))?(Z|[+-]\d{2}:?\d{2})?$')
+
+CONDITION = re.compile(r'time (>=|>|<=|<) (?:now\(\) - (\d+)(\w)|(\d+))$')
+
+FILTER = re.compile(r'"(\w+)" (=|!=|>=|>|<=|<) '
+                    r"(true|false|-?[\d.]+|'[^']*')$")
+
+OPERATORS = {
+    '=': op.eq,
+    '!=': op.ne,
+    '>': op.gt,
+    '>=': op.ge,
+    '<': op.lt,
+    '<=': op.le,
+}
+
+AGGREGATES = {
+    'COUNT': 'count',
+    'MEAN': 'mean',
+    'STDDEV': 'stddev',
+    'MIN': 'min',
+    'MAX': 'max',
+}
+
+
+def now_ns():
+    return int(time.time() * 10 ** 9)
+
+
+def parse_rfc3339(t):
+    m = RFC3339.match(t.strip())
+    if not m:
+        raise ValueError('Invalid RFC3339 time: {}'.format(t))
+    moment = datetime.datetime(*map(int, m.group(1, 2, 3, 4, 5, 6)))
+    seconds = (moment - EPOCH) // datetime.timedelta(seconds=1)
+    offset = m.group(8)
+    if offset and offset != 'Z':
+        sign = -1 if offset[0] == '-' else 1
+        hours, minutes = int(offset[1:3]), int(offset[-2:])
+        seconds -= sign * (hours * 3600 + minutes * 60)
+    return seconds * 10 ** 9 + int((m.group(7) or '').ljust(9, '0'))
+
+
+def time_ns(t, precision=None):
+    if t is None:
+        return now_ns()
+    if isinstance(t, int):
+        return t * PRECISIONS[precision]
+    if isinstance(t, str):
+        return parse_rfc3339(t)
+    if t.tzinfo is not None:
+        t = t.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+    return (t - EPOCH) // datetime.timedelta(microseconds=1) * 1000
+
+
+def rfc3339(t):
+    seconds, nanoseconds = divmod(t, 10 ** 9)
+    return (EPOCH + datetime.timedelta(seconds=seconds)).strftime(
+        '%Y-%m-%dT%H:%M:%S') + ('.{:09d}'.format(nanoseconds).rstrip('0')
+                                if nanoseconds else '') + 'Z'
+
+
+def value_kind(value):
+    if isinstance(value, bool):
+        return 'bool'
+    if isinstance(value, int):
+        return 'int'
+    if isinstance(value, float):
+        return 'float'
+    return 'str'
+
+
+class Series:
+    def __init__(self, kind):
+        self.kind = kind
+        self.times = array.array('q')
+        if kind == 'str':
+            self.values = []
+        else:
+            self.values = array.array('d')
+
+    def __len__(self):
+        return len(self.times)
+
+    def add(self, t, value):
+        if value_kind(value) != self.kind and \
+                {value_kind(value), self.kind} != {'int', 'float'}:
+            raise ValueError('Field type conflict: {} is not {}'.format(
+                value_kind(value), self.kind))
+        if self.kind == 'int' and isinstance(value, float):
+            self.kind = 'float'
+        if not self.times or t > self.times[-1]:
+            self.times.append(t)
+            self.values.append(value)
+            return
+        index = bisect.bisect_left(self.times, t)
+        if index < len(self.times) and self.times[index] == t:
+            self.values[index] = value
+        else:
+            self.times.insert(index, t)
+            self.values.insert(index, value)
+
+    def evict(self, threshold):
+        index = bisect.bisect_left(self.times, threshold)
+        if index:
+            del self.times[:index]
+            del self.values[:index]
+        return index
+
+    def window(self, conditions):
+        start, end = 0, len(self.times)
+        for operator, t in conditions:
+            if operator == '>':
+                start = max(start, bisect.bisect_right(self.times, t))
+            elif operator == '>=':
+                start = max(start, bisect.bisect_left(self.times, t))
+            elif operator == '<':
+                end = min(end, bisect.bisect_left(self.times, t))
+            else:
+                end = min(end, bisect.bisect_right(self.times, t))
+        return start, end
+
+    def value(self, value):
+        if self.kind == 'bool':
+            return bool(value)
+        if self.kind == 'int':
+            return int(value)
+        return value
+
+    def filtered(self, start, end, filters):
+        for t, v in zip(self.times[start:end], self.values[start:end]):
+            v = self.value(v)
+            if all(OPERATORS[o](v, literal) for o, literal in filters):
+                yield t, v
+
+    def count(self, start, end, filters=()):
+        if not filters:
+            return end - start
+        return sum(1 for _ in self.filtered(start, end, filters))
+
+    def aggregate(self, column, start, end, filters=()):
+        if column == 'count':
+            return self.count(start, end, filters)
+        if start >= end:
+            return None
+        return getattr(self, column)(start, end)
+
+    def mean(self, start, end):
+        return math.fsum(self.values[start:end]) / (end - start)
+
+    def stddev(self, start, end):
+        if end - start < 2:
+            return None
+        mean = self.mean(start, end)
+        return math.sqrt(math.fsum((v - mean) ** 2
+                                   for v in self.values[start:end]) /
+                         (end - start - 1))
+
+    def min(self, start, end):
+        return self.value(min(self.values[start:end]))
+
+    def max(self, start, end):
+        return self.value(max(self.values[start:end]))
+
+
+class MemoryResultSet:
+    def __init__(self, measurement=None, points=()):
+        self.measurement = measurement
+        self.points = list(points)
+
+    def get_points(self, measurement=None):
+        if measurement is not None and measurement != self.measurement:
+            return iter([])
+        return iter(self.points)
+
+    @property
+    def raw(self):
+        if not self.points:
+            return {'statement_id': 0}
+        return {'statement_id': 0, 'series': [{
+            'name': self.measurement,
+            'columns': list(self.points[0]),
+            'values': [list(point.values()) for point in self.points],
+        }]}
+
+    def __repr__(self):
+        return 'MemoryResultSet({!r}, {!r})'.format(self.measurement,
+                                                    self.points)
+
+
+class MemoryDatabase:
+    def __init__(self, retention=None, clock=None):
+        self.retention = retention
+        self.clock = clock or now_ns
+        self.databases = {}
+        self.lock = threading.Lock()
+        self.points_evicted = 0
+
+    def create_database(self, database):
+        with self.lock:
+            self.databases.setdefault(database, {})
+
+    def drop_database(self, database):
+        with self.lock:
+            self.databases.pop(database, None)
+
+    def get_list_database(self):
+        return [{'name': name} for name in self.databases]
+
+    def close(self):
+        pass
+
+    def database(self, database):
+        try:
+            return self.databases[database]
+        except KeyError:
+            raise RuntimeError(
+                'database not found: \"{}\"'.format(database)) from None
+
+    def write_points(self, points, database=None, time_precision=None,
+                     retention_policy=None, protocol='json', **kwargs):
+        if protocol == 'line':
+            if isinstance(points, str):
+                points = points.splitlines()
+            points = [parse_line(line) for line in points if line]
+        with self.lock:
+            measurements = self.database(database)
+            now = self.clock()
+            for point in points:
+                t = time_ns(point.get('time'), time_precision) \
+                    if point.get('time') is not None else now
+                key = series_key(retention_policy, point['measurement'])
+                fields = measurements.setdefault(key, {})
+                for field, value in point['fields'].items():
+                    series = fields.get(field)
+                    if series is None:
+                        series = fields[field] = Series(value_kind(value))
+                    series.add(t, value)
+            if self.retention is not None:
+                self.evict(now - int(self.retention * 10 ** 9))
+        return True
+
+    def evict(self, threshold):
+        for measurements in self.databases.values():
+            for fields in measurements.values():
+                for series in fields.values():
+                    self.points_evicted += series.evict(threshold)
+
+    def query(self, query, database=None, epoch=None, chunked=False,
+              chunk_size=0, **kwargs):
+        statements = [s.strip() for s in query.split(';') if s.strip()]
+        if chunked:
+            return self.query_chunked(statements[0], database, epoch,
+                                      chunk_size or 10000)
+        with self.lock:
+            results = [self.query_statement(s, database, epoch)
+                       for s in statements]
+        if len(results) == 1:
+            return results[0]
+        return results
+
+    def query_chunked(self, statement, database, epoch, chunk_size):
+        with self.lock:
+            query = parse_statement(statement, self.clock())
+            series = self.series(database, query)
+            if series is None or query['function'] is not None:
+                yield self.query_statement(statement, database, epoch)
+                return
+            start, end = self.window(series, query)
+        for offset in range(start, end, chunk_size):
+            with self.lock:
+                yield self.raw_result(series, query, offset,
+                                      min(offset + chunk_size, end), epoch)
+
+    def query_statement(self, statement, database, epoch):
+        if statement.upper() == 'SHOW MEASUREMENTS':
+            return MemoryResultSet('measurements', (
+                {'name': name} for name, fields
+                in sorted((name, fields) for name, fields
+                          in self.database(database).items()
+                          if isinstance(name, str))
+                if any(len(series) for series in fields.values())))
+        query = parse_statement(statement, self.clock())
+        measurement = query['measurement']
+        series = self.series(database, query)
+        if series is None:
+            return MemoryResultSet(measurement)
+        start, end = self.window(series, query)
+        if start >= end:
+            return MemoryResultSet(measurement)
+
+        function = query['function']
+        if function is None:
+            if query['interval'] is not None:
+                raise ValueError('GROUP BY requires an aggregate function')
+            return self.raw_result(series, query, start, end, epoch)
+
+        column = AGGREGATES.get(function.upper())
+        if column is None:
+            raise ValueError('Unsupported function: {}'.format(function))
+        if column != 'count':
+            if query['filters']:
+                raise ValueError('Unsupported filter for {}'.format(
+                    function))
+            if series.kind in ('str', 'bool'):
+                raise ValueError('Unsupported type for {}: {}'.format(
+                    function, series.kind))
+        if query['interval'] is not None:
+            return self.grouped_result(series, query, column, start, end,
+                                       epoch)
+        value = series.aggregate(column, start, end, query['filters'])
+        if column == 'count' and not value:
+            return MemoryResultSet(measurement)
+        lower = [t for operator, t in query['conditions']
+                 if operator in ('>', '>=')]
+        return MemoryResultSet(measurement, [
+            {'time': self.format_time(max(lower, default=0), epoch),
+             column: value}])
+
+    def grouped_result(self, series, query, column, start, end, epoch):
+        interval = query['interval']
+        lower = max((t for operator, t in query['conditions']
+                     if operator in ('>', '>=')),
+                    default=series.times[start])
+        last = self.clock()
+        for operator, t in query['conditions']:
+            if operator == '<':
+                last = min(last, t - 1)
+            elif operator == '<=':
+                last = min(last, t)
+        rows = []
+        bucket = lower - lower % interval
+        while bucket <= last:
+            index = bisect.bisect_left(series.times, bucket + interval,
+                                       start, end)
+            rows.append([bucket, series.aggregate(column, start, index,
+                                                  query['filters'])])
+            start = index
+            bucket += interval
+        rows = fill_rows(rows, query['fill'])[:query['limit']]
+        return MemoryResultSet(query['measurement'], (
+            {'time': self.format_time(t, epoch), column: value}
+            for t, value in rows))
+
+    def window(self, series, query):
+        start, end = series.window(query['conditions'])
+        if query['limit'] is not None and query['interval'] is None:
+            end = min(end, start + query['limit'])
+        return start, end
+
+    def series(self, database, query):
+        key = series_key(query['retention_policy'], query['measurement'])
+        return self.database(database).get(key, {}).get(query['field'])
+
+    def raw_result(self, series, query, start, end, epoch):
+        field = query['field']
+        return MemoryResultSet(query['measurement'], (
+            {'time': self.format_time(t, epoch), field: v}
+            for t, v in series.filtered(start, end, query['filters'])))
+
+    def format_time(self, t, epoch):
+        if epoch:
+            return t // EPOCHS[epoch]
+        return rfc3339(t)
+
+
+def split_unescaped(text, separator):
+    parts = []
+    current = []
+    escaped = False
+    quoted = False
+    for character in text:
+        if escaped:
+            current.append(character)
+            escaped = False
+        elif character == '\\':
+            current.append(character)
+            escaped = True
+        elif character == '"':
+            current.append(character)
+            quoted = not quoted
+        elif character == separator and not quoted:
+            parts.append(''.join(current))
+            current = []
+        else:
+            current.append(character)
+    parts.append(''.join(current))
+    return parts
+
+
+def unescape(text):
+    return re.sub(r'\\(.)', r'\1', text)
+
+
+def parse_field_value(value):
+    if value.startswith('"'):
+        return unescape(value[1:-1])
+    if value in ('t', 'T', 'true', 'True', 'TRUE'):
+        return True
+    if value in ('f', 'F', 'false', 'False', 'FALSE'):
+        return False
+    if value.endswith('i'):
+        return int(value[:-1])
+    return float(value)
+
+
+def parse_line(line):
+    parts = split_unescaped(line.strip(), ' ')
+    if len(parts) not in (2, 3):
+        raise ValueError('Invalid line: {}'.format(line))
+    key = split_unescaped(parts[0], ',')
+    fields = {}
+    for field in split_unescaped(parts[1], ','):
+        name, value = field.split('=', 1)
+        fields[unescape(name)] = parse_field_value(value)
+    point = {
+        'measurement': unescape(key[0]),
+        'tags': dict(unescape(tag).split('=', 1) for tag in key[1:]),
+        'fields': fields,
+    }
+    if len(parts) == 3:
+        point['time'] = int(parts[2])
+    return point
+
+
+def fill_rows(rows, fill):
+    if fill == 'none':
+        return [row for row in rows if row[1] is not None]
+    if fill == 'previous':
+        previous = None
+        for row in rows:
+            if row[1] is None:
+                row[1] = previous
+            previous = row[1]
+    elif fill == 'linear':
+        known = [i for i, row in enumerate(rows) if row[1] is not None]
+        for left, right in zip(known, known[1:]):
+            step = (rows[right][1] - rows[left][1]) / (right - left)
+            for i in range(left + 1, right):
+                rows[i][1] = rows[left][1] + step * (i - left)
+    elif fill != 'null':
+        value = float(fill)
+        for row in rows:
+            if row[1] is None:
+                row[1] = value
+    return rows
+
+
+def parse_literal(literal):
+    if literal in ('true', 'false'):
+        return literal == 'true'
+    if literal.startswith("'"):
+        return literal[1:-1]
+    return float(literal)
+
+
+def series_key(retention_policy, measurement):
+    if retention_policy is None:
+        return measurement
+    return retention_policy, measurement
+
+
+def parse_statement(statement, now):
+    m = STATEMENT.match(statement)
+    if not m:
+        raise ValueError('Unsupported query: {}'.format(statement))
+    conditions = []
+    filters = []
+    relative_window = None
+    field = m.group(2) or m.group(3)
+    if m.group(6):
+        for condition in m.group(6).split(' AND '):
+            c = CONDITION.match(condition.strip())
+            f = FILTER.match(condition.strip())
+            if f and f.group(1) == field:
+                filters.append((f.group(2), parse_literal(f.group(3))))
+                continue
+            if not c:
+                raise ValueError('Unsupported condition: {}'.format(
+                    condition))
+            operator, value, unit, absolute = c.groups()
+            if absolute is not None:
+                conditions.append((operator, int(absolute)))
+                continue
+            if unit not in TIME_UNITS:
+                raise ValueError('Unsupported time unit: {}'.format(unit))
+            window = int(value) * TIME_UNITS[unit]
+            if operator in ('>', '>='):
+                relative_window = max(relative_window or 0, window)
+            conditions.append((operator, now - window * 10 ** 9))
+    interval = None
+    if m.group(7):
+        if m.group(8) not in TIME_UNITS:
+            raise ValueError('Unsupported time unit: {}'.format(m.group(8)))
+        interval = int(m.group(7)) * TIME_UNITS[m.group(8)] * 10 ** 9
+    return {
+        'function': m.group(1),
+        'field': field,
+        'retention_policy': m.group(4),
+        'measurement': m.group(5),
+        'conditions': conditions,
+        'filters': filters,
+        'relative_window': relative_window,
+        'interval': interval,
+        'fill': m.group(9) or 'null',
+        'limit': int(m.group(10)) if m.group(10) else None,
+    }
+
+
+class HotTierDatabase:
+    def __init__(self, backend, retention=3600, clock=None):
+        self.backend = backend
+        self.clock = clock or now_ns
+        self.hot = MemoryDatabase(retention, self.clock)
+        self.retention = retention
+        self.start_time = self.clock()
+        self.hot_queries = 0
+        self.backend_queries = 0
+
+    def create_database(self, database):
+        self.hot.create_database(database)
+        self.backend.create_database(database)
+
+    def drop_database(self, database):
+        self.hot.drop_database(database)
+        self.backend.drop_database(database)
+
+    def close(self):
+        self.hot.close()
+        self.backend.close()
+
+    def write_points(self, points, database=None, time_precision=None,
+                     retention_policy=None, **kwargs):
+        if retention_policy is None:
+            self.hot.create_database(database)
+            self.hot.write_points(points, database=database,
+                                  time_precision=time_precision,
+                                  protocol=kwargs.get('protocol', 'json'))
+        return self.backend.write_points(points, database=database,
+                                         time_precision=time_precision,
+                                         retention_policy=retention_policy,
+                                         **kwargs)
+
+    def covers(self, query):
+        now = self.clock()
+        for statement in query.split(';'):
+            try:
+                parsed = parse_statement(statement.strip(), now)
+            except ValueError:
+                return False
+            window = parsed['relative_window']
+            if parsed['retention_policy'] is not None or window is None \
+                    or window > self.retention \
+                    or window * 10 ** 9 > now - self.start_time:
+                return False
+        return True
+
+    def query(self, query, database=None, **kwargs):
+        if database in self.hot.databases and \
+                not kwargs.get('chunked') and self.covers(query):
+            self.hot_queries += 1
+            return self.hot.query(query, database=database,
+                                  epoch=kwargs.get('epoch'))
+        self.backend_queries += 1
+        return self.backend.query(query, database=database, **kwargs)
@@ -0,0 +1,336 @@
+#!/usr/bin/env python3
+
+import bisect
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1,
+                   0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join('{}="{}"'.format(k, v) for k, v in labels) + '}'
+
+
+def format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value))
+
+
+class Metric:
+    kind = 'untyped'
+
+    def __init__(self, name, description, labels=()):
+        self.name = name
+        self.description = description
+        self.label_values = labels
+        self.children = {}
+        self.lock = threading.Lock()
+
+    def labels(self, **labels):
+        key = tuple(sorted(labels.items()))
+        child = self.children.get(key)
+        if child is None:
+            with self.lock:
+                child = self.children.setdefault(key, self.child(key))
+        return child
+
+    def child(self, labels):
+        return type(self)(self.name, self.description, labels)
+
+    def samples(self):
+        yield from self.own_samples()
+        for child in list(self.children.values()):
+            yield from child.own_samples()
+
+    def own_samples(self):
+        return []
+
+    def exposition(self):
+        lines = ['# HELP {} {}'.format(self.name, self.description),
+                 '# TYPE {} {}'.format(self.name, self.kind)]
+        for suffix, labels, value in self.samples():
+            lines.append('{}{}{} {}'.format(self.name, suffix,
+                                            format_labels(labels),
+                                            format_value(value)))
+        return '\n'.join(lines)
+
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def __init__(self, name, description, labels=()):
+        super().__init__(name, description, labels)
+        self.value = 0
+
+    def inc(self, amount=1):
+        with self.lock:
+            self.value += amount
+
+    def get(self):
+        return self.value
+
+    def own_samples(self):
+        if self.value or not self.children:
+            yield '', self.label_values, self.value
+
+
+class Gauge(Metric):
+    kind = 'gauge'
+
+    def __init__(self, name, description, labels=(), function=None):
+        super().__init__(name, description, labels)
+        self.value = 0
+        self.function = function
+
+    def set(self, value):
+        self.value = value
+
+    def set_function(self, function):
+        self.function = function
+
+    def get(self):
+        if self.function is not None:
+            return self.function()
+        return self.value
+
+    def own_samples(self):
+        if self.function is not None or not self.children:
+            yield '', self.label_values, self.get()
+
+
+class Timer:
+    def __init__(self, histogram):
+        self.histogram = histogram
+        self.start = None
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.histogram.observe(time.perf_counter() - self.start)
+
+
+class Histogram(Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, description, labels=(),
+                 buckets=LATENCY_BUCKETS):
+        super().__init__(name, description, labels)
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def child(self, labels):
+        return Histogram(self.name, self.description, labels, self.buckets)
+
+    def observe(self, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            self.counts[index] += 1
+            self.count += 1
+            self.sum += value
+
+    def time(self):
+        return Timer(self)
+
+    def quantile(self, q):
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        cumulative = 0
+        lower = 0.0
+        for upper, count in zip(self.buckets, self.counts):
+            if count and cumulative + count >= rank:
+                return lower + (upper - lower) * (rank - cumulative) / count
+            cumulative += count
+            lower = upper
+        return self.buckets[-1]
+
+    def own_samples(self):
+        if not self.count and self.children:
+            return
+        cumulative = 0
+        for upper, count in zip(self.buckets + (float('inf'),),
+                                self.counts):
+            cumulative += count
+            yield '_bucket', self.label_values + (
+                ('le', format_value(upper)),), cumulative
+        yield '_count', self.label_values, self.count
+        yield '_sum', self.label_values, self.sum
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = {}
+        self.lock = threading.Lock()
+
+    def register(self, metric):
+        with self.lock:
+            return self.metrics.setdefault(metric.name, metric)
+
+    def counter(self, name, description):
+        return self.register(Counter(name, description))
+
+    def gauge(self, name, description, function=None):
+        metric = self.register(Gauge(name, description))
+        if function is not None:
+            metric.set_function(function)
+        return metric
+
+    def histogram(self, name, description, buckets=LATENCY_BUCKETS):
+        return self.register(Histogram(name, description, buckets=buckets))
+
+    def exposition(self):
+        return '\n'.join(metric.exposition()
+                         for metric in list(self.metrics.values())) + '\n'
+
+    def points(self, timestamp=None):
+        points = []
+        for metric in list(self.metrics.values()):
+            for m in [metric] + list(metric.children.values()):
+                if isinstance(m, Histogram):
+                    if not m.count:
+                        continue
+                    fields = {'count': m.count, 'sum': m.sum,
+                              'p50': m.quantile(0.5),
+                              'p95': m.quantile(0.95),
+                              'p99': m.quantile(0.99)}
+                elif any(True for _ in m.own_samples()):
+                    fields = {'value': float(m.get())}
+                else:
+                    continue
+                point = {'measurement': metric.name,
+                         'tags': dict(m.label_values),
+                         'fields': fields}
+                if timestamp is not None:
+                    point['time'] = timestamp
+                points.append(point)
+        return points
+
+
+REGISTRY = Registry()
+
+
+def counter(name, description):
+    return REGISTRY.counter(name, description)
+
+
+def gauge(name, description, function=None):
+    return REGISTRY.gauge(name, description, function)
+
+
+def histogram(name, description, buckets=LATENCY_BUCKETS):
+    return REGISTRY.histogram(name, description, buckets)
+
+
+def metrics_handler(registry):
+    import http.server
+
+    class MetricsHandler(http.server.BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split('?')[0] not in ('/', '/metrics'):
+                self.send_error(404)
+                return
+            body = registry.exposition().encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain; version=0.0.4')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            logger.debug(format, *args)
+
+    return MetricsHandler
+
+
+def metrics_server(address, registry):
+    import http.server
+    import socketserver
+
+    class ThreadingHTTPServer(socketserver.ThreadingMixIn,
+                              http.server.HTTPServer):
+        daemon_threads = True
+
+    return ThreadingHTTPServer(address, metrics_handler(registry))
+
+
+class MetricsExporter:
+    def __init__(self, registry=REGISTRY, port=None, host='127.0.0.1',
+                 database=None, interval=10.0):
+        self.registry = registry
+        self.port = port
+        self.host = host
+        self.database = database
+        self.interval = interval
+        self.server = None
+        self.threads = []
+        self.stop_event = threading.Event()
+
+    def start(self):
+        logger.info('Starting metrics exporter')
+        self.stop_event.clear()
+        if self.port is not None:
+            self.server = metrics_server((self.host, self.port),
+                                         self.registry)
+            logger.info('Metrics endpoint: http://{}:{}/metrics'.format(
+                self.host, self.server.server_address[1]))
+            self.threads.append(threading.Thread(
+                target=self.server.serve_forever, daemon=True))
+        if self.database is not None:
+            self.threads.append(threading.Thread(target=self.run,
+                                                 daemon=True))
+        for thread in self.threads:
+            thread.start()
+        logger.info('Metrics exporter started')
+
+    def stop(self):
+        logger.info('Stopping metrics exporter')
+        self.stop_event.set()
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+        for thread in self.threads:
+            thread.join()
+        self.threads = []
+        logger.info('Metrics exporter stopped')
+
+    def run(self):
+        while not self.stop_event.wait(self.interval):
+            self.save()
+
+    def save(self):
+        try:
+            self.database.save_points(
+                self.registry.points(int(time.time() * 10 ** 9)))
+        except Exception:
+            logger.exception('Failed to save metrics')
+
+    def __enter__(self):
+        logger.debug('Entering context manager')
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        logger.debug('Exiting context manager')
+        self.stop()
+
+
+def exporter(settings, component):
+    port = settings.metrics_ports.get(component)
+    database = None
+    if settings.metrics_database:
+        from arinna.database_client import DatabaseClient
+        database = DatabaseClient(db_name=settings.metrics_database)
+    return MetricsExporter(port=port, database=database,
+                           interval=settings.metrics_interval)
@@ -1,10 +1,16 @@
 #!/usr/bin/env python3
 
-import paho.mqtt.client
 import logging
+import threading
+import arinna.metrics as metrics
 
 logger = logging.getLogger(__name__)
 
+MESSAGES_PUBLISHED = metrics.counter(
+    'arinna_mqtt_messages_published_total', 'MQTT messages published')
+PUBLISH_SECONDS = metrics.histogram(
+    'arinna_mqtt_publish_seconds', 'Time spent publishing MQTT messages')
+
 
 class MQTTClient:
     def __init__(self,
@@ -15,6 +21,7 @@ class MQTTClient:
                  on_subscribe=None,
                  user_data=None):
         if not mqtt_client:
+            import paho.mqtt.client
             self.mqtt_client = paho.mqtt.client.Client()
             self.mqtt_client.enable_logger()
         else:
@@ -61,6 +68,13 @@ class MQTTClient:
         self.mqtt_client.on_subscribe = callback
         logger.info('on_subscribe callback set')
 
+    def add_message_callback(self, topic, callback):
+        logger.info('Adding message callback')
+        logger.info('Topic: {}'.format(topic))
+        logger.info('Callback: {}'.format(callback))
+        self.mqtt_client.message_callback_add(topic, callback)
+        logger.info('Message callback added')
+
     def set_user_data(self, data):
         logger.info('Setting user data')
         logger.info('Data: {}'.format(data))
@@ -77,7 +91,9 @@ class MQTTClient:
         logger.info('Publishing message')
         logger.info('Topic: {}'.format(topic))
         logger.info('Payload: {}'.format(payload))
-        self.mqtt_client.publish(topic, payload=payload)
+        with PUBLISH_SECONDS.time():
+            self.mqtt_client.publish(topic, payload=payload)
+        MESSAGES_PUBLISHED.inc()
         logger.info('Message published')
 
     def disconnect(self):
@@ -111,3 +127,107 @@ class MQTTClient:
     def __exit__(self, exc_type, exc_val, exc_tb):
         logger.debug('Exiting context manager')
         self.disconnect()
+
+
+class MessageRouter:
+    def __init__(self, mqtt_client):
+        self.mqtt_client = mqtt_client
+        self.topics = []
+        self.callbacks = {}
+        self.connected = False
+        self.lock = threading.Lock()
+        mqtt_client.set_on_connect(self.on_connect)
+
+    def add_message_callback(self, topic, callback):
+        callbacks = self.callbacks.get(topic)
+        if callbacks is None:
+            callbacks = self.callbacks[topic] = []
+            self.mqtt_client.add_message_callback(
+                topic, lambda client, user_data, message: self.dispatch(
+                    topic, client, user_data, message))
+        callbacks.append(callback)
+
+    def subscribe(self, topic):
+        with self.lock:
+            if topic in self.topics:
+                return
+            self.topics.append(topic)
+            if self.connected:
+                self.mqtt_client.subscribe(topic)
+
+    def dispatch(self, topic, client, user_data, message):
+        for callback in self.callbacks[topic]:
+            callback(client, user_data, message)
+
+    def on_connect(self, client, user_data, flags, rc):
+        logger.info('Connection returned result: {}'.format(rc))
+        with self.lock:
+            self.connected = True
+            for topic in self.topics:
+                client.subscribe(topic)
+
+
+class AsyncMQTTClient:
+    def __init__(self, mqtt_client=None, max_queued_messages=0):
+        self.client = MQTTClient(mqtt_client,
+                                 on_connect=self.on_connect,
+                                 on_message=self.on_message)
+        self.max_queued_messages = max_queued_messages
+        self.loop = None
+        self.messages_queue = None
+        self.connected = None
+        self.topics = []
+        self.dropped_messages = 0
+
+    async def connect(self, host='localhost'):
+        import asyncio
+        self.loop = asyncio.get_event_loop()
+        self.messages_queue = asyncio.Queue(self.max_queued_messages)
+        self.connected = asyncio.Event()
+        await self.loop.run_in_executor(None, self.client.connect, host)
+        self.client.loop_start()
+        await self.connected.wait()
+
+    async def disconnect(self):
+        self.client.disconnect()
+        await self.loop.run_in_executor(None, self.client.loop_stop)
+
+    async def subscribe(self, topic):
+        self.topics.append(topic)
+        self.client.subscribe(topic)
+
+    async def publish(self, topic, payload=None):
+        self.client.publish(topic, payload=payload)
+
+    async def get_message(self):
+        return await self.messages_queue.get()
+
+    async def messages(self):
+        while True:
+            yield await self.messages_queue.get()
+
+    def on_connect(self, client, user_data, flags, rc):
+        logger.info('Connection returned result: {}'.format(rc))
+        for topic in self.topics:
+            client.subscribe(topic)
+        self.loop.call_soon_threadsafe(self.connected.set)
+
+    def on_message(self, client, user_data, message):
+        self.loop.call_soon_threadsafe(self.put_message, message)
+
+    def put_message(self, message):
+        if self.messages_queue.full():
+            self.dropped_messages += 1
+            logger.warning('Message queue is full, dropping message: '
+                           '{}'.format(message.topic))
+            return
+        self.messages_queue.put_nowait(message)
+
+    async def __aenter__(self):
+        logger.debug('Entering async context manager')
+        await self.connect()
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        logger.debug('Exiting async context manager')
+        await self.disconnect()
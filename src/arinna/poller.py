@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+
+import json
+import logging
+import threading
+import time
+import arinna.schema as schema
+
+logger = logging.getLogger(__name__)
+
+
+class CommandRate:
+    def __init__(self, command, min_interval, max_interval, thresholds=None,
+                 backoff=2.0):
+        self.command = command
+        self.min_interval = min_interval
+        self.max_interval = max(min_interval, max_interval)
+        self.thresholds = dict(thresholds or {})
+        self.backoff = backoff
+        self.interval = min_interval
+        self.next_poll = None
+        self.last_values = {}
+        self.changed = False
+        self.polls = 0
+
+    def observe(self, measurement, value):
+        last_value = self.last_values.get(measurement)
+        self.last_values[measurement] = value
+        if last_value is None or self.changed:
+            return
+        threshold = self.thresholds[measurement]
+        try:
+            delta = abs(float(value) - float(last_value))
+        except (TypeError, ValueError):
+            self.changed = value != last_value
+            return
+        self.changed = delta > threshold
+
+    def is_due(self, now):
+        return self.next_poll is None or now >= self.next_poll
+
+    def schedule(self, now):
+        if self.next_poll is not None:
+            if self.changed:
+                self.interval = self.min_interval
+            else:
+                self.interval = min(self.interval * self.backoff,
+                                    self.max_interval)
+        self.changed = False
+        self.next_poll = now + self.interval
+        self.polls += 1
+
+
+class AdaptivePoller:
+    def __init__(self, rates, publish, clock=time.monotonic):
+        self.rates = [CommandRate(command, **rate)
+                      for command, rate in rates.items()]
+        self.publish = publish
+        self.clock = clock
+        self.lock = threading.Lock()
+        self.stop_event = threading.Event()
+        self.fields = {}
+        for rate in self.rates:
+            for measurement in rate.thresholds:
+                self.fields[measurement] = rate
+        self.decoders = schema.load_decoders()
+        self.topic_decoders = schema.topic_decoders(self.decoders,
+                                                    'inverter/response/')
+
+    def observe(self, measurement, value):
+        rate = self.fields.get(measurement)
+        if rate is None:
+            return
+        with self.lock:
+            rate.observe(measurement, value)
+
+    def poll(self):
+        now = self.clock()
+        with self.lock:
+            due = [rate for rate in self.rates if rate.is_due(now)]
+            for rate in due:
+                rate.schedule(now)
+        for rate in due:
+            logger.info('Polling {}, next in {:.1f} s'.format(
+                rate.command, rate.interval))
+            self.publish(rate.command)
+        return [rate.command for rate in due]
+
+    def next_poll(self):
+        with self.lock:
+            return min(rate.next_poll for rate in self.rates)
+
+    def run(self):
+        logger.info('Starting adaptive poller')
+        self.stop_event.clear()
+        while not self.stop_event.is_set():
+            try:
+                self.poll()
+            except Exception:
+                logger.exception('Unknown exception occurred while polling')
+            self.stop_event.wait(max(0.0, self.next_poll() - self.clock()))
+        logger.info('Adaptive poller stopped')
+
+    def stop(self):
+        logger.info('Stopping adaptive poller')
+        self.stop_event.set()
+
+    def subscribe(self, mqtt_client, snapshots=False):
+        if snapshots:
+            topic = 'inverter/snapshot/+'
+            mqtt_client.add_message_callback(topic, self.on_snapshot)
+        else:
+            topic = 'inverter/response/#'
+            mqtt_client.add_message_callback(topic, self.on_message)
+        mqtt_client.subscribe(topic)
+
+    def on_message(self, _, user_data, message):
+        try:
+            decoder = self.topic_decoders.get(message.topic)
+            if decoder is None:
+                return
+            measurement, parse = decoder
+            self.observe(measurement, parse(message.payload))
+        except Exception:
+            logger.exception('Unknown exception occurred in on_message')
+
+    def on_snapshot(self, _, user_data, message):
+        try:
+            snapshot = json.loads(message.payload.decode())
+            for key, raw_value in snapshot.items():
+                decoder = self.decoders.get(key)
+                if decoder is None:
+                    continue
+                measurement, parse = decoder
+                self.observe(measurement, parse(str(raw_value).encode()))
+        except Exception:
+            logger.exception('Unknown exception occurred in on_snapshot')
+
+    def stats(self):
+        with self.lock:
+            return {rate.command: {'polls': rate.polls,
+                                   'interval': rate.interval}
+                    for rate in self.rates}
@@ -1,22 +1,65 @@
 #!/usr/bin/env python3
 
+import argparse
+import arinna.config as config
 import arinna.inverter_provider as inverter_provider
 import logging
 import arinna.log as log
 import sys
 import arinna.mqtt_client
+from arinna.poller import AdaptivePoller
 
 logger = logging.getLogger(__name__)
 
+REQUESTS = ['QPIGS', 'QMOD']
 
-def main():
+
+def publish_requests(publisher):
+    for request in REQUESTS:
+        publisher.publish_request(request)
+
+
+def run_adaptive(settings):
+    try:
+        with arinna.mqtt_client.MQTTClient() as mqtt_client:
+            router = arinna.mqtt_client.MessageRouter(mqtt_client)
+            mqtt_client.loop_start()
+            publisher = inverter_provider.InverterMQTTPublisher(mqtt_client)
+            poller = AdaptivePoller(settings.polling_rates,
+                                    publisher.publish_request)
+            poller.subscribe(router, settings.publish_snapshots)
+            try:
+                poller.run()
+            finally:
+                logger.info('Polls: {}'.format(poller.stats()))
+                mqtt_client.loop_stop()
+    except KeyboardInterrupt:
+        logger.info('Adaptive poller stopped by user')
+    except Exception:
+        logger.exception('Unknown exception occurred')
+        return 1
+    return 0
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Arinna publisher')
+    parser.add_argument('--adaptive', action='store_true',
+                        help='keep running and poll at a rate that follows '
+                             'how fast the values change')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
     log.setup_logging()
 
+    if args.adaptive:
+        return run_adaptive(config.load())
+
     with arinna.mqtt_client.MQTTClient() as mqtt_client:
         mqtt_client.loop_start()
         publisher = inverter_provider.InverterMQTTPublisher(mqtt_client)
-        publisher.publish_request('QPIGS')
-        publisher.publish_request('QMOD')
+        publish_requests(publisher)
         mqtt_client.loop_stop()
 
     return 0
@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+
+import collections
+import json
+import logging
+import math
+import threading
+import time
+import arinna.schema as schema
+from arinna.database_client import time_window_seconds
+
+logger = logging.getLogger(__name__)
+
+
+class RollingWindow:
+    def __init__(self, duration, max_points):
+        self.duration = duration
+        self.max_points = max_points
+        self.points = collections.deque()
+        self.min_candidates = collections.deque()
+        self.max_candidates = collections.deque()
+        self.sequence = 0
+        self.shift = None
+        self.sum = 0.0
+        self.sum_of_squares = 0.0
+        self.true_count = 0
+
+    def __len__(self):
+        return len(self.points)
+
+    def add(self, timestamp, value):
+        if self.shift is None:
+            self.shift = float(value)
+        self.sequence += 1
+        self.points.append((self.sequence, timestamp, value))
+        x = float(value) - self.shift
+        self.sum += x
+        self.sum_of_squares += x * x
+        if value is True:
+            self.true_count += 1
+
+        while self.min_candidates and self.min_candidates[-1][1] >= value:
+            self.min_candidates.pop()
+        self.min_candidates.append((self.sequence, value))
+        while self.max_candidates and self.max_candidates[-1][1] <= value:
+            self.max_candidates.pop()
+        self.max_candidates.append((self.sequence, value))
+
+        while len(self.points) > self.max_points:
+            self.pop()
+        self.evict(timestamp)
+
+    def evict(self, now):
+        threshold = now - self.duration
+        while self.points and self.points[0][1] <= threshold:
+            self.pop()
+
+    def pop(self):
+        sequence, _, value = self.points.popleft()
+        x = float(value) - self.shift
+        self.sum -= x
+        self.sum_of_squares -= x * x
+        if value is True:
+            self.true_count -= 1
+        if self.min_candidates[0][0] == sequence:
+            self.min_candidates.popleft()
+        if self.max_candidates[0][0] == sequence:
+            self.max_candidates.popleft()
+        if not self.points:
+            self.shift = None
+            self.sum = 0.0
+            self.sum_of_squares = 0.0
+
+    def mean(self):
+        return self.shift + self.sum / len(self.points)
+
+    def stddev(self):
+        n = len(self.points)
+        variance = (self.sum_of_squares - self.sum * self.sum / n) / (n - 1)
+        return math.sqrt(max(variance, 0.0))
+
+    def min(self):
+        return self.min_candidates[0][1]
+
+    def max(self):
+        return self.max_candidates[0][1]
+
+    def true_percentage(self):
+        return self.true_count / len(self.points)
+
+
+class RollingAggregator:
+    def __init__(self, specs, min_interval=1.0, clock=time.time):
+        self.clock = clock
+        self.lock = threading.Lock()
+        self.windows = {}
+        self.decoders = schema.load_decoders()
+        self.topic_decoders = schema.topic_decoders(self.decoders,
+                                                    'inverter/response/')
+        for _, measurement, time_window in specs:
+            key = (measurement, time_window)
+            if key in self.windows:
+                continue
+            duration = time_window_seconds(time_window)
+            max_points = int(duration / min_interval) + 1
+            self.windows[key] = RollingWindow(duration, max_points)
+        self.measurements = {}
+        for measurement, time_window in self.windows:
+            self.measurements.setdefault(measurement, []).append(
+                self.windows[(measurement, time_window)])
+
+    def add(self, measurement, value, timestamp=None):
+        if timestamp is None:
+            timestamp = self.clock()
+        with self.lock:
+            for window in self.measurements.get(measurement, []):
+                window.add(timestamp, value)
+
+    def warm(self, database):
+        logger.info('Warming rolling aggregator')
+        for (measurement, time_window), window in self.windows.items():
+            points = database.load_points(measurement, time_window)
+            with self.lock:
+                for timestamp, value in points:
+                    window.add(timestamp, value)
+            logger.info('Loaded {} points for {} over {}'.format(
+                len(points), measurement, time_window))
+        logger.info('Rolling aggregator warmed')
+
+    def subscribe(self, mqtt_client, snapshots=False):
+        if snapshots:
+            topic = 'inverter/snapshot/+'
+            mqtt_client.add_message_callback(topic, self.on_snapshot)
+        else:
+            topic = 'inverter/response/#'
+            mqtt_client.add_message_callback(topic, self.on_message)
+        mqtt_client.subscribe(topic)
+
+    def on_message(self, _, user_data, message):
+        try:
+            decoder = self.topic_decoders.get(message.topic)
+            if decoder is None:
+                return
+            measurement, parse = decoder
+            self.add(measurement, parse(message.payload))
+        except Exception:
+            logger.exception('Unknown exception occurred in on_message')
+
+    def on_snapshot(self, _, user_data, message):
+        try:
+            snapshot = json.loads(message.payload.decode())
+            timestamp = self.clock()
+            for key, raw_value in snapshot.items():
+                decoder = self.decoders.get(key)
+                if decoder is None:
+                    continue
+                measurement, parse = decoder
+                self.add(measurement, parse(str(raw_value).encode()),
+                         timestamp)
+        except Exception:
+            logger.exception('Unknown exception occurred in on_snapshot')
+
+    def aggregate(self, aggregate, measurement, time_window):
+        window = self.windows.get((measurement, time_window))
+        if window is None:
+            raise RuntimeError(
+                'Time window \"{}\" is not tracked for measurement \"{}\"'
+                ''.format(time_window, measurement))
+        with self.lock:
+            window.evict(self.clock())
+            if not window or (aggregate == 'stddev' and len(window) < 2):
+                raise RuntimeError(
+                    'No moving {} available for measurement \"{}\"'
+                    ' and time window \"{}\"'.format(
+                        aggregate.replace('_', ' '), measurement,
+                        time_window))
+            if aggregate == 'average':
+                return window.mean()
+            return getattr(window, aggregate)()
+
+    def moving_average(self, measurement, time_window):
+        return self.aggregate('average', measurement, time_window)
+
+    def moving_stddev(self, measurement, time_window):
+        return self.aggregate('stddev', measurement, time_window)
+
+    def moving_min(self, measurement, time_window):
+        return self.aggregate('min', measurement, time_window)
+
+    def moving_max(self, measurement, time_window):
+        return self.aggregate('max', measurement, time_window)
+
+    def moving_true_percentage(self, measurement, time_window):
+        return self.aggregate('true_percentage', measurement, time_window)
+
+    def moving_aggregates(self, specs):
+        return {spec: self.aggregate(*spec) for spec in specs}
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+
+import collections
+import logging
+import arinna.schema as schema
+
+logger = logging.getLogger(__name__)
+
+Rollup = collections.namedtuple('Rollup', ['policy', 'interval', 'duration'])
+
+ROLLUPS = (
+    Rollup('rollup_1m', '1m', '52w'),
+    Rollup('rollup_1h', '1h', '260w'),
+)
+
+NUMERIC_TYPES = ('float', 'int')
+
+
+def intervals(rollups=ROLLUPS):
+    return [(rollup.policy, rollup.interval) for rollup in rollups]
+
+
+def numeric_measurements(field_types):
+    return sorted(name for name, field_type in field_types.items()
+                  if field_type in NUMERIC_TYPES)
+
+
+def sources(rollups=ROLLUPS):
+    source = None
+    for rollup in rollups:
+        yield rollup, source
+        source = rollup.policy
+
+
+def continuous_query_name(measurement, rollup):
+    return '{}_{}'.format(measurement, rollup.policy)
+
+
+def select_statement(database, measurement, rollup, source=None):
+    if source is None:
+        fields = 'MEAN("value") AS "mean", MIN("value") AS "min", ' \
+                 'MAX("value") AS "max"'
+        origin = '"{}"'.format(measurement)
+    else:
+        fields = 'MEAN("mean") AS "mean", MIN("min") AS "min", ' \
+                 'MAX("max") AS "max"'
+        origin = '"{}"."{}"."{}"'.format(database, source, measurement)
+    return 'SELECT {} INTO "{}"."{}"."{}" FROM {}'.format(
+        fields, database, rollup.policy, measurement, origin)
+
+
+def retention_policy_statement(database, rollup):
+    return 'CREATE RETENTION POLICY "{}" ON "{}" DURATION {} ' \
+           'REPLICATION 1'.format(rollup.policy, database, rollup.duration)
+
+
+def continuous_query_statement(database, measurement, rollup, source=None):
+    return 'CREATE CONTINUOUS QUERY "{}" ON "{}" BEGIN {} ' \
+           'GROUP BY time({}) END'.format(
+               continuous_query_name(measurement, rollup), database,
+               select_statement(database, measurement, rollup, source),
+               rollup.interval)
+
+
+def drop_continuous_query_statement(database, measurement, rollup):
+    return 'DROP CONTINUOUS QUERY "{}" ON "{}"'.format(
+        continuous_query_name(measurement, rollup), database)
+
+
+def backfill_statement(database, measurement, rollup, source, window):
+    return '{} WHERE time > now() - {} GROUP BY time({})'.format(
+        select_statement(database, measurement, rollup, source), window,
+        rollup.interval)
+
+
+def plan(database, measurements, rollups=ROLLUPS, existing=(),
+         replace=False, backfill=None):
+    statements = [retention_policy_statement(database, rollup)
+                  for rollup in rollups]
+    for rollup, source in sources(rollups):
+        for measurement in measurements:
+            name = continuous_query_name(measurement, rollup)
+            if name in existing:
+                if not replace:
+                    continue
+                statements.append(drop_continuous_query_statement(
+                    database, measurement, rollup))
+            statements.append(continuous_query_statement(
+                database, measurement, rollup, source))
+    if backfill:
+        for rollup, source in sources(rollups):
+            statements.extend(
+                backfill_statement(database, measurement, rollup, source,
+                                   backfill)
+                for measurement in measurements)
+    return statements
+
+
+def existing_continuous_queries(db_client, database):
+    result = db_client.query('SHOW CONTINUOUS QUERIES')
+    return {p['name'] for p in result.get_points(database)}
+
+
+def apply(db_client, database, statements):
+    for statement in statements:
+        logger.info('Executing: {}'.format(statement))
+        db_client.query(statement, database=database, method='POST')
+    logger.info('Executed {} statements'.format(len(statements)))
+
+
+def add_arguments(parser):
+    parser.add_argument('--host', default='localhost')
+    parser.add_argument('--port', type=int, default=8086)
+    parser.add_argument('--database', default='inverter')
+    parser.add_argument('--backfill', metavar='WINDOW',
+                        help='Also fill rollups from raw data this far back, '
+                             'e.g. 52w')
+    parser.add_argument('--replace', action='store_true',
+                        help='Recreate existing continuous queries')
+    parser.add_argument('--dry-run', action='store_true',
+                        help='Only print the statements')
+
+
+def run(args):
+    measurements = numeric_measurements(schema.field_types(schema.load()))
+    if args.dry_run:
+        for statement in plan(args.database, measurements,
+                              backfill=args.backfill):
+            print(statement)
+        return 0
+    import influxdb
+    db_client = influxdb.InfluxDBClient(args.host, args.port)
+    try:
+        existing = existing_continuous_queries(db_client, args.database)
+        apply(db_client, args.database,
+              plan(args.database, measurements, existing=existing,
+                   replace=args.replace, backfill=args.backfill))
+    finally:
+        db_client.close()
+    return 0
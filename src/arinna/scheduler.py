@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class PeriodicScheduler:
+    def __init__(self, period, task, clock=time.monotonic):
+        self.period = period
+        self.task = task
+        self.clock = clock
+        self.stop_event = threading.Event()
+        self.runs = 0
+        self.skipped_runs = 0
+
+    def run(self, iterations=None):
+        logger.info('Starting scheduler')
+        logger.info('Period: {}'.format(self.period))
+        next_run = self.clock()
+        while not self.stop_event.is_set():
+            self.run_task()
+            if iterations is not None and self.runs >= iterations:
+                break
+            next_run += self.period
+            now = self.clock()
+            if next_run <= now:
+                missed = int((now - next_run) // self.period) + 1
+                logger.warning('Task overran period, skipping {} runs'.format(
+                    missed))
+                self.skipped_runs += missed
+                next_run += missed * self.period
+            self.stop_event.wait(next_run - now)
+        logger.info('Scheduler stopped')
+
+    def run_task(self):
+        start = self.clock()
+        try:
+            self.task()
+        except Exception:
+            logger.exception('Unknown exception occurred in scheduled task')
+        self.runs += 1
+        logger.info('Task took {:.3f} s'.format(self.clock() - start))
+
+    def stop(self):
+        logger.info('Stopping scheduler')
+        self.stop_event.set()
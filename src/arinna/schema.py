@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+
+import os
+
+
+def parse_float(payload):
+    try:
+        return float(payload)
+    except ValueError:
+        return float(payload.replace(b',', b'.'))
+
+
+def parse_int(payload):
+    return int(payload)
+
+
+def parse_percent(payload):
+    return int(payload) / 100
+
+
+def parse_bool(payload):
+    return int(payload) != 0
+
+
+DEVICE_MODES = {
+    b'Power On': 0,
+    b'Standby': 1,
+    b'Line': 2,
+    b'Battery': 3,
+    b'Fault': 4,
+    b'Power Saving': 5
+}
+
+
+def parse_device_mode(payload):
+    return DEVICE_MODES[payload]
+
+
+PARSERS = {
+    'float': parse_float,
+    'int': parse_int,
+    'percent': parse_percent,
+    'bool_from_string': parse_bool,
+    'int_from_device_mode': parse_device_mode,
+}
+
+FIELD_TYPES = {
+    'float': 'float',
+    'int': 'int',
+    'percent': 'float',
+    'bool_from_string': 'bool',
+    'int_from_device_mode': 'int',
+}
+
+
+def schema_path():
+    return os.path.join(os.path.dirname(__file__), 'schema.yaml')
+
+
+def load(path=None):
+    import yaml
+    with open(path or schema_path()) as f:
+        return yaml.safe_load(f)
+
+
+def compile_decoders(schema):
+    decoders = {}
+    for name, parser in schema.items():
+        if parser not in PARSERS:
+            raise ValueError(
+                'Unknown parser \"{}\" for \"{}\"'.format(parser, name))
+        decoders[name] = (name, PARSERS[parser])
+    return decoders
+
+
+def load_decoders(path=None):
+    return compile_decoders(load(path))
+
+
+def field_types(schema):
+    return {name: FIELD_TYPES[parser] for name, parser in schema.items()}
+
+
+def topic_decoders(decoders, prefix):
+    return {prefix + name: decoder for name, decoder in decoders.items()}
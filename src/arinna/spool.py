@@ -0,0 +1,272 @@
+#!/usr/bin/env python3
+
+import json
+import logging
+import mmap
+import os
+import struct
+import threading
+import zlib
+
+logger = logging.getLogger(__name__)
+
+HEADER = struct.Struct('<II')
+SEGMENT_SUFFIX = '.seg'
+CHECKPOINT_NAME = 'checkpoint'
+
+
+def encode_record(points):
+    payload = json.dumps(points, separators=(',', ':')).encode()
+    return HEADER.pack(len(payload), zlib.crc32(payload)) + payload
+
+
+def decode_record(data, offset):
+    end = offset + HEADER.size
+    if end > len(data):
+        return None, offset
+    length, crc = HEADER.unpack_from(data, offset)
+    if length == 0 or end + length > len(data):
+        return None, offset
+    payload = data[end:end + length]
+    if zlib.crc32(payload) != crc:
+        return None, offset
+    return json.loads(payload.decode()), end + length
+
+
+def segment_name(segment):
+    return '{:08d}{}'.format(segment, SEGMENT_SUFFIX)
+
+
+class Spool:
+    def __init__(self, path, max_bytes=64 * 2 ** 20,
+                 segment_bytes=4 * 2 ** 20):
+        self.path = path
+        self.segment_bytes = segment_bytes
+        self.max_segments = max(2, max_bytes // segment_bytes)
+        self.lock = threading.Lock()
+        self.segments = []
+        self.segment_sizes = {}
+        self.file = None
+        self.mmap = None
+        self.write_offset = 0
+        self.checkpoint = (0, 0)
+        self.points_spooled = 0
+        self.points_replayed = 0
+        self.evicted_segments = 0
+
+    def open(self):
+        logger.info('Opening spool')
+        logger.info('Path: {}'.format(self.path))
+        os.makedirs(self.path, exist_ok=True)
+        self.segments = sorted(
+            int(name[:-len(SEGMENT_SUFFIX)])
+            for name in os.listdir(self.path)
+            if name.endswith(SEGMENT_SUFFIX))
+        for segment in self.segments:
+            self.segment_sizes[segment] = os.path.getsize(
+                self.segment_path(segment))
+        if self.segments:
+            self.map_segment(self.segments[-1])
+            self.write_offset = self.scan(self.mmap)
+        else:
+            self.create_segment(0, self.segment_bytes)
+        self.checkpoint = self.read_checkpoint()
+        logger.info('Spool opened with {} segments'.format(
+            len(self.segments)))
+
+    def close(self):
+        if self.mmap is not None:
+            logger.info('Closing spool')
+            self.mmap.flush()
+            self.mmap.close()
+            self.file.close()
+            self.mmap = None
+            self.file = None
+            logger.info('Spool closed')
+
+    def segment_path(self, segment):
+        return os.path.join(self.path, segment_name(segment))
+
+    def checkpoint_path(self):
+        return os.path.join(self.path, CHECKPOINT_NAME)
+
+    def create_segment(self, segment, size):
+        with open(self.segment_path(segment), 'wb') as f:
+            f.truncate(size)
+        self.segments.append(segment)
+        self.segment_sizes[segment] = size
+        self.map_segment(segment)
+        self.write_offset = 0
+
+    def map_segment(self, segment):
+        self.close()
+        self.file = open(self.segment_path(segment), 'r+b')
+        self.mmap = mmap.mmap(self.file.fileno(),
+                              self.segment_sizes[segment])
+
+    def scan(self, data, offset=0):
+        while True:
+            record, next_offset = decode_record(data, offset)
+            if record is None:
+                return offset
+            offset = next_offset
+
+    def append(self, points):
+        if not points:
+            return
+        record = encode_record(points)
+        with self.lock:
+            current = self.segments[-1]
+            if self.write_offset + len(record) > \
+                    self.segment_sizes[current]:
+                self.create_segment(current + 1,
+                                    max(self.segment_bytes, len(record)))
+                self.evict()
+            self.mmap[self.write_offset:self.write_offset + len(record)] = \
+                record
+            self.mmap.flush()
+            self.write_offset += len(record)
+            self.points_spooled += len(points)
+        logger.info('Spooled {} points'.format(len(points)))
+
+    def evict(self):
+        while len(self.segments) > self.max_segments:
+            segment = self.segments.pop(0)
+            del self.segment_sizes[segment]
+            os.remove(self.segment_path(segment))
+            self.evicted_segments += 1
+            logger.warning('Spool is full, evicted segment: {}'.format(
+                segment))
+            if self.checkpoint[0] <= segment:
+                self.write_checkpoint((self.segments[0], 0))
+
+    def read(self, max_points):
+        points = []
+        with self.lock:
+            segment, offset = self.checkpoint
+            if segment not in self.segment_sizes:
+                segment, offset = self.segments[0], 0
+            index = self.segments.index(segment)
+            while len(points) < max_points:
+                if segment == self.segments[-1]:
+                    while len(points) < max_points and \
+                            offset < self.write_offset:
+                        record, offset = decode_record(self.mmap, offset)
+                        points.extend(record)
+                    break
+                with open(self.segment_path(segment), 'rb') as f, \
+                        mmap.mmap(f.fileno(), 0,
+                                  access=mmap.ACCESS_READ) as data:
+                    while len(points) < max_points:
+                        record, next_offset = decode_record(data, offset)
+                        if record is None:
+                            break
+                        points.extend(record)
+                        offset = next_offset
+                    else:
+                        break
+                index += 1
+                segment, offset = self.segments[index], 0
+        return points, (segment, offset)
+
+    def commit(self, position, count=0):
+        with self.lock:
+            self.write_checkpoint(position)
+            while self.segments[0] < position[0]:
+                segment = self.segments.pop(0)
+                del self.segment_sizes[segment]
+                os.remove(self.segment_path(segment))
+            self.points_replayed += count
+
+    def pending(self):
+        with self.lock:
+            segment, offset = self.checkpoint
+            return segment != self.segments[-1] or \
+                offset < self.write_offset
+
+    def read_checkpoint(self):
+        try:
+            with open(self.checkpoint_path()) as f:
+                checkpoint = json.load(f)
+            return checkpoint['segment'], checkpoint['offset']
+        except FileNotFoundError:
+            return self.segments[0], 0
+
+    def write_checkpoint(self, position):
+        path = self.checkpoint_path()
+        temporary_path = path + '.tmp'
+        with open(temporary_path, 'w') as f:
+            json.dump({'segment': position[0], 'offset': position[1]}, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temporary_path, path)
+        self.checkpoint = tuple(position)
+
+    def __enter__(self):
+        logger.debug('Entering context manager')
+        self.open()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        logger.debug('Exiting context manager')
+        self.close()
+
+
+class SpoolReplayer:
+    def __init__(self, spool, database, batch_size=5000, interval=1.0,
+                 max_backoff=300.0):
+        self.spool = spool
+        self.database = database
+        self.batch_size = batch_size
+        self.interval = interval
+        self.max_backoff = max_backoff
+        self.backoff = interval
+        self.stop_event = threading.Event()
+        self.thread = None
+        self.failures = 0
+
+    def start(self):
+        logger.info('Starting spool replayer')
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+        logger.info('Spool replayer started')
+
+    def stop(self):
+        logger.info('Stopping spool replayer')
+        self.stop_event.set()
+        if self.thread:
+            self.thread.join()
+            self.thread = None
+        logger.info('Spool replayer stopped')
+
+    def run(self):
+        while not self.stop_event.is_set():
+            self.stop_event.wait(self.replay())
+
+    def replay(self):
+        points, position = self.spool.read(self.batch_size)
+        if not points:
+            return self.interval
+        try:
+            self.database.save_points(points)
+        except Exception:
+            self.failures += 1
+            logger.exception('Failed to replay {} points, retrying in '
+                             '{:.1f} s'.format(len(points), self.backoff))
+            delay = self.backoff
+            self.backoff = min(self.backoff * 2, self.max_backoff)
+            return delay
+        self.spool.commit(position, len(points))
+        self.backoff = self.interval
+        logger.info('Replayed {} spooled points'.format(len(points)))
+        return 0 if self.spool.pending() else self.interval
+
+    def __enter__(self):
+        logger.debug('Entering context manager')
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        logger.debug('Exiting context manager')
+        self.stop()
@@ -0,0 +1,299 @@
+#!/usr/bin/env python3
+
+import collections
+import contextlib
+import logging
+import signal
+import threading
+import time
+from datetime import datetime
+import arinna.config as config
+import arinna.database_provider as database_provider
+import arinna.inverter_provider as inverter_provider
+import arinna.metrics as metrics
+import arinna.publisher as publisher
+import arinna.rollup as rollup
+import arinna.schema as schema
+from arinna.charger import Charger, ChargingManager, InverterSettings
+from arinna.command_queue import CommandQueue, ResponsePublisher
+from arinna.database_client import DatabaseClient, create_db_client
+from arinna.load_balancer import Load, LoadBalancer
+from arinna.mqtt_client import MessageRouter, MQTTClient
+from arinna.poller import AdaptivePoller
+from arinna.rolling_aggregator import RollingAggregator
+from arinna.scheduler import PeriodicScheduler
+
+logger = logging.getLogger(__name__)
+
+COMPONENTS = [
+    'database_provider',
+    'inverter_provider',
+    'publisher',
+    'load_balancer',
+    'charger',
+]
+
+DATABASE_COMPONENTS = {'database_provider', 'load_balancer', 'charger'}
+
+TASK_RESTARTS = metrics.counter('arinna_supervisor_restarts_total',
+                                'Supervised task restarts')
+
+
+class SupervisedTask:
+    def __init__(self, name, target, stop=None, restart_delay=1.0,
+                 max_restart_delay=60.0, clock=time.monotonic):
+        self.name = name
+        self.target = target
+        self.stop_callback = stop
+        self.restart_delay = restart_delay
+        self.max_restart_delay = max_restart_delay
+        self.clock = clock
+        self.stop_event = threading.Event()
+        self.thread = None
+        self.restarts = 0
+
+    def start(self):
+        logger.info('Starting task: {}'.format(self.name))
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self.run, name=self.name,
+                                       daemon=True)
+        self.thread.start()
+
+    def stop(self, timeout=None):
+        logger.info('Stopping task: {}'.format(self.name))
+        self.stop_event.set()
+        if self.stop_callback:
+            self.stop_callback()
+        if self.thread:
+            self.thread.join(timeout)
+            self.thread = None
+        logger.info('Task stopped: {}'.format(self.name))
+
+    def run(self):
+        delay = self.restart_delay
+        while not self.stop_event.is_set():
+            started = self.clock()
+            try:
+                self.target()
+            except Exception:
+                logger.exception('Task failed: {}'.format(self.name))
+            else:
+                if self.stop_event.is_set():
+                    break
+                logger.warning('Task exited: {}'.format(self.name))
+            if self.clock() - started >= self.max_restart_delay:
+                delay = self.restart_delay
+            logger.info('Restarting {} in {:.1f} s'.format(self.name, delay))
+            if self.stop_event.wait(delay):
+                break
+            self.restarts += 1
+            TASK_RESTARTS.labels(task=self.name).inc()
+            delay = min(2 * delay, self.max_restart_delay)
+
+
+class Supervisor:
+    def __init__(self, restart_delay=1.0, max_restart_delay=60.0):
+        self.restart_delay = restart_delay
+        self.max_restart_delay = max_restart_delay
+        self.tasks = []
+        self.stop_event = threading.Event()
+
+    def add(self, name, target, stop=None):
+        task = SupervisedTask(name, target, stop, self.restart_delay,
+                              self.max_restart_delay)
+        self.tasks.append(task)
+        return task
+
+    def start(self):
+        logger.info('Starting supervisor')
+        self.stop_event.clear()
+        for task in self.tasks:
+            task.start()
+        logger.info('Supervisor started')
+
+    def stop(self):
+        logger.info('Stopping supervisor')
+        self.stop_event.set()
+        for task in reversed(self.tasks):
+            task.stop()
+        logger.info('Supervisor stopped')
+
+    def wait(self, timeout=None):
+        return self.stop_event.wait(timeout)
+
+    def __enter__(self):
+        logger.debug('Entering context manager')
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        logger.debug('Exiting context manager')
+        self.stop()
+
+
+def bind_user_data(callback, user_data):
+    def on_message(client, _, message):
+        callback(client, user_data, message)
+    return on_message
+
+
+def enabled_components(settings, names=None):
+    if names:
+        unknown = set(names) - set(COMPONENTS)
+        if unknown:
+            raise ValueError('Unknown components: {}'.format(
+                ', '.join(sorted(unknown))))
+        return [name for name in COMPONENTS if name in names]
+    return [name for name in COMPONENTS
+            if settings.components.get(name, True)]
+
+
+class Services:
+    def __init__(self, settings, supervisor, stack, mqtt_client,
+                 db_client=None, serial_adapter=None):
+        self.settings = settings
+        self.supervisor = supervisor
+        self.stack = stack
+        self.mqtt_client = mqtt_client
+        self.router = MessageRouter(mqtt_client)
+        self.db_client = db_client
+        self.serial_adapter = serial_adapter
+        self.inverter_database = db_client
+
+    def build(self, components):
+        logger.info('Components: {}'.format(components))
+        controllers = [c for c in components
+                       if c in ('load_balancer', 'charger')]
+        if controllers and self.settings.use_rolling_aggregator:
+            self.add_rolling_aggregator(controllers)
+        for component in components:
+            getattr(self, 'add_' + component)()
+
+    def add_rolling_aggregator(self, controllers):
+        specs = []
+        if 'load_balancer' in controllers:
+            specs += LoadBalancer.specs
+        if 'charger' in controllers:
+            specs += ChargingManager.day_rate_specs \
+                + ChargingManager.night_rate_specs
+        aggregator = RollingAggregator(specs)
+        aggregator.warm(self.db_client)
+        aggregator.subscribe(self.router, self.settings.publish_snapshots)
+        self.inverter_database = aggregator
+
+    def add_database_provider(self):
+        decoders = schema.load_decoders()
+        if self.settings.publish_snapshots:
+            topic = database_provider.SNAPSHOT_PREFIX + '+'
+        else:
+            topic = database_provider.RESPONSE_PREFIX + '#'
+        user_data = {
+            'decoders': decoders,
+            'topic_decoders': schema.topic_decoders(
+                decoders, database_provider.RESPONSE_PREFIX),
+            'topics': [topic],
+            'unknown_topics': collections.Counter(),
+            'writer': database_provider.open_writer(
+                self.stack, self.settings, self.db_client),
+        }
+        self.router.add_message_callback(
+            topic, bind_user_data(database_provider.on_message, user_data))
+        self.router.subscribe(topic)
+
+    def add_inverter_provider(self):
+        settings = self.settings
+        command_queue = CommandQueue(settings.command_queue_depth)
+        self.router.add_message_callback(
+            'inverter/request',
+            bind_user_data(inverter_provider.on_message, command_queue))
+        self.router.subscribe('inverter/request')
+        response_filter = inverter_provider.create_response_filter(settings)
+        response_publisher = ResponsePublisher(
+            inverter_provider.InverterMQTTPublisher(
+                self.mqtt_client, settings.publish_fields,
+                settings.publish_snapshots, response_filter))
+        response_publisher.start()
+        self.stack.callback(response_publisher.stop)
+        inverter_provider.register_metrics(command_queue, response_filter)
+        serial_adapter = self.serial_adapter or \
+            inverter_provider.create_serial_adapter(settings)
+        stop_event = threading.Event()
+        self.supervisor.add(
+            'inverter_provider',
+            lambda: inverter_provider.serve(command_queue, serial_adapter,
+                                            response_publisher, stop_event),
+            stop_event.set)
+
+    def add_publisher(self):
+        mqtt_publisher = inverter_provider.InverterMQTTPublisher(
+            self.mqtt_client)
+        if self.settings.adaptive_polling:
+            poller = AdaptivePoller(self.settings.polling_rates,
+                                    mqtt_publisher.publish_request)
+            poller.subscribe(self.router, self.settings.publish_snapshots)
+            self.supervisor.add('publisher', poller.run, poller.stop)
+            return
+        self.add_scheduler('publisher', self.settings.publisher_period,
+                           lambda: publisher.publish_requests(mqtt_publisher))
+
+    def add_load_balancer(self):
+        load = Load(DatabaseClient(self.db_client.db_client, 'load'))
+        load_balancer = LoadBalancer(self.inverter_database, load)
+        self.add_scheduler('load_balancer',
+                           self.settings.load_balancer_period,
+                           load_balancer.balance)
+
+    def add_charger(self):
+        inverter_settings = InverterSettings(
+            self.settings.charger_settings_ttl)
+        inverter_settings.subscribe(self.router,
+                                    self.settings.publish_snapshots)
+        charger = Charger(
+            inverter_provider.InverterMQTTPublisher(self.mqtt_client),
+            inverter_settings, self.settings.charger_settings_timeout)
+        charging_manager = ChargingManager(self.inverter_database, charger)
+        self.add_scheduler(
+            'charger', self.settings.charger_period,
+            lambda: charging_manager.process(datetime.now().time()))
+
+    def add_scheduler(self, name, period, task):
+        scheduler = PeriodicScheduler(period, task)
+        self.supervisor.add(name, scheduler.run, scheduler.stop)
+
+
+def add_arguments(parser):
+    parser.add_argument('--component', action='append', dest='components',
+                        choices=COMPONENTS,
+                        help='Component to run, all enabled in the '
+                             'configuration when omitted')
+
+
+def run(args):
+    settings = config.load()
+    components = enabled_components(settings, args.components)
+    supervisor = Supervisor(settings.restart_delay,
+                            settings.max_restart_delay)
+    signal.signal(signal.SIGTERM, lambda *_: supervisor.stop_event.set())
+    try:
+        with contextlib.ExitStack() as stack:
+            db_client = None
+            if DATABASE_COMPONENTS.intersection(components):
+                db_client = stack.enter_context(DatabaseClient(
+                    create_db_client(settings),
+                    rollups=rollup.intervals() if settings.use_rollups
+                    else None))
+            mqtt_client = MQTTClient()
+            Services(settings, supervisor, stack, mqtt_client,
+                     db_client).build(components)
+            stack.enter_context(metrics.exporter(settings, 'supervisor'))
+            stack.enter_context(mqtt_client)
+            mqtt_client.loop_start()
+            stack.callback(mqtt_client.loop_stop)
+            stack.enter_context(supervisor)
+            supervisor.wait()
+    except KeyboardInterrupt:
+        logger.info('Supervisor stopped by user')
+    except Exception:
+        logger.exception('Unknown exception occurred')
+        return 1
+    return 0
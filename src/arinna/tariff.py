@@ -0,0 +1,27 @@
+#!/usr/bin/env python3
+
+from datetime import time
+
+CHEAP_DAY_RATE = (time(13), time(15))
+CHEAP_NIGHT_RATE = (time(22), time(6))
+
+WINDOWS = {
+    'cheap_day': CHEAP_DAY_RATE,
+    'cheap_night': CHEAP_NIGHT_RATE,
+}
+
+DEFAULT_WINDOW = 'standard'
+
+
+def time_in_range(start, end, x):
+    if start <= end:
+        return start <= x < end
+    else:
+        return start <= x or x < end
+
+
+def window(now):
+    for name, (start, end) in WINDOWS.items():
+        if time_in_range(start, end, now):
+            return name
+    return DEFAULT_WINDOW
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+
+import asyncio
+import statistics
+import pytest
+from arinna.database_client import AsyncDatabaseClient, DatabaseClient
+from tests.fakes.database import FakeDatabase, get_points_with_interval
+
+
+def run(coroutine):
+    return asyncio.get_event_loop().run_until_complete(coroutine)
+
+
+@pytest.fixture
+def sample_data():
+    return [2, 5, 1, 6, 23]
+
+
+@pytest.fixture
+def sample_bool_data():
+    return [True, True, False, False, True]
+
+
+@pytest.fixture
+def sample_measurement():
+    return 'sample_measurement'
+
+
+@pytest.fixture
+def sample_database():
+    return 'sample_database'
+
+
+@pytest.fixture
+def database(sample_database):
+    d = FakeDatabase()
+    d.create_database(sample_database)
+    return d
+
+
+@pytest.fixture
+def database_client(database, sample_database):
+    return AsyncDatabaseClient(DatabaseClient(database,
+                                              db_name=sample_database))
+
+
+@pytest.fixture
+def database_client_with_data(database_client, sample_data,
+                              sample_measurement):
+    points = get_points_with_interval(sample_data, sample_measurement)
+    run(database_client.save_points(points))
+    return database_client
+
+
+@pytest.fixture
+def database_client_with_bool_data(database_client, sample_bool_data,
+                                   sample_measurement):
+    points = get_points_with_interval(sample_bool_data, sample_measurement)
+    run(database_client.save_points(points))
+    return database_client
+
+
+def test_async_moving_average_without_measurements(sample_measurement,
+                                                   database_client):
+    with pytest.raises(RuntimeError):
+        run(database_client.moving_average(sample_measurement, '1m'))
+
+
+def test_async_moving_average_of_all_measurements(sample_data,
+                                                  sample_measurement,
+                                                  database_client_with_data):
+    actual = run(database_client_with_data.moving_average(
+        sample_measurement, '{}s'.format(len(sample_data) + 1)))
+    assert statistics.mean(sample_data) == actual
+
+
+def test_async_moving_stddev_of_all_measurements(sample_data,
+                                                 sample_measurement,
+                                                 database_client_with_data):
+    actual = run(database_client_with_data.moving_stddev(
+        sample_measurement, '{}s'.format(len(sample_data) + 1)))
+    assert statistics.stdev(sample_data) == actual
+
+
+def test_async_moving_min_and_max_run_concurrently(sample_data,
+                                                   sample_measurement,
+                                                   database_client_with_data):
+    time_window = '{}s'.format(len(sample_data) + 1)
+
+    async def min_and_max():
+        return await asyncio.gather(
+            database_client_with_data.moving_min(sample_measurement,
+                                                 time_window),
+            database_client_with_data.moving_max(sample_measurement,
+                                                 time_window))
+
+    assert [min(sample_data), max(sample_data)] == run(min_and_max())
+
+
+def test_async_moving_true_percentage_of_all_measurements(
+        sample_bool_data, sample_measurement,
+        database_client_with_bool_data):
+    actual = run(
+        database_client_with_bool_data.moving_true_percentage(
+            sample_measurement, '{}s'.format(len(sample_bool_data) + 1)))
+    assert 0.6 == actual
+
+
+def test_async_moving_aggregates(sample_data, sample_measurement,
+                                 database_client_with_data):
+    specs = [('average', sample_measurement, '1m'),
+             ('max', sample_measurement, '1m')]
+    actual = run(database_client_with_data.moving_aggregates(specs))
+    assert statistics.mean(sample_data) == actual[specs[0]]
+    assert max(sample_data) == actual[specs[1]]
+
+
+def test_async_load(sample_data, sample_measurement,
+                    database_client_with_data):
+    actual = run(database_client_with_data.load(sample_measurement, '1m'))
+    assert sample_data == actual
+
+
+def test_async_database_client_context_manager_support(database_client):
+    async def use():
+        async with database_client as client:
+            return client
+
+    assert database_client is run(use())
@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+
+import asyncio
+from arinna.mqtt_client import AsyncMQTTClient
+from tests.fakes.mqtt import FakeBroker, FakePahoClient
+
+
+def run(coroutine, timeout=5):
+    return asyncio.get_event_loop().run_until_complete(
+        asyncio.wait_for(coroutine, timeout))
+
+
+def test_async_mqtt_client_context_manager_support():
+    async def use():
+        async with AsyncMQTTClient(FakePahoClient()) as mqtt_client:
+            return mqtt_client
+
+    assert run(use())
+
+
+def test_async_mqtt_client_receives_message_from_topic():
+    async def receive():
+        async with AsyncMQTTClient(FakePahoClient()) as mqtt_client:
+            await mqtt_client.subscribe('sample_topic')
+            await mqtt_client.publish('sample_topic', payload=True)
+            return await mqtt_client.get_message()
+
+    message = run(receive())
+    assert 'sample_topic' == message.topic
+    assert b'True' == message.payload
+
+
+def test_async_mqtt_client_iterates_over_messages_from_other_client():
+    broker = FakeBroker()
+
+    async def receive():
+        async with AsyncMQTTClient(FakePahoClient(broker)) as subscriber, \
+                AsyncMQTTClient(FakePahoClient(broker)) as publisher:
+            await subscriber.subscribe('sample/#')
+            for v in range(3):
+                await publisher.publish('sample/{}'.format(v), payload=v)
+            payloads = []
+            async for message in subscriber.messages():
+                payloads.append(message.payload)
+                if len(payloads) == 3:
+                    return payloads
+
+    assert [b'0', b'1', b'2'] == run(receive())
+
+
+def test_async_mqtt_client_drops_messages_when_queue_is_full():
+    async def receive():
+        async with AsyncMQTTClient(FakePahoClient(),
+                                   max_queued_messages=1) as mqtt_client:
+            await mqtt_client.subscribe('sample_topic')
+            await mqtt_client.publish('sample_topic', payload=1)
+            await mqtt_client.publish('sample_topic', payload=2)
+            while not mqtt_client.dropped_messages:
+                await asyncio.sleep(0.01)
+            return await mqtt_client.get_message()
+
+    assert b'1' == run(receive()).payload
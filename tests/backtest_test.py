@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+
+import csv
+import datetime
+import gzip
+import pytest
+import arinna.backtest as backtest
+
+numpy = pytest.importorskip('numpy')
+
+START = datetime.datetime(2026, 1, 5).timestamp()
+
+
+def constant_history(hours=24, period=10.0, **values):
+    times = numpy.arange(START, START + hours * 3600, period)
+    return {measurement: (times, numpy.full(len(times), float(value)))
+            for measurement, value in values.items()}
+
+
+def test_moving_aggregates_match_brute_force():
+    rng = numpy.random.default_rng(0)
+    times = numpy.sort(rng.uniform(0, 1000, 200))
+    values = rng.normal(50, 2, 200)
+    at = numpy.arange(0, 1000, 7.0)
+    for aggregate, function in (('average', numpy.mean), ('max', numpy.max),
+                                ('min', numpy.min),
+                                ('stddev', lambda v: numpy.std(v, ddof=1))):
+        actual = backtest.moving_aggregate(times, values, at, aggregate, 60)
+        for i, t in enumerate(at):
+            window = values[(times > t - 60) & (times <= t)]
+            if len(window) < (2 if aggregate == 'stddev' else 1):
+                assert numpy.isnan(actual[i])
+            else:
+                assert function(window) == pytest.approx(actual[i])
+
+
+def test_history_database_raises_without_data():
+    history = {'battery_voltage': (numpy.array([100.0]),
+                                   numpy.array([50.0]))}
+    database = backtest.HistoryDatabase(history, numpy.array([100.0, 500.0]))
+    spec = ('average', 'battery_voltage', '5m')
+    assert {spec: 50.0} == database.moving_aggregates([spec])
+    database.step = 1
+    with pytest.raises(RuntimeError):
+        database.moving_aggregates([spec])
+
+
+def charger_history(voltage):
+    return constant_history(battery_voltage=voltage,
+                            is_charging_to_floating_enabled=0,
+                            pv_charging_power=0, pv_input_voltage=0,
+                            device_mode=3)
+
+
+def test_charger_replay_uses_thresholds():
+    history = charger_history(53.0)
+    test = backtest.Backtest(history, components=['charger'])
+    result = test.replay('charger')
+    assert 0 == result['errors']
+    assert 2 == pytest.approx(result['enabled_hours_by_window']['cheap_day'],
+                              abs=0.05)
+    assert 0 == result['enabled_hours_by_window']['standard']
+    assert 2 == result['switches']
+    assert result['grid_charging_wh'] == pytest.approx(
+        result['enabled_hours'] * 53.0 * 30)
+    assert 0 == test.replay('charger',
+                            {'day_bulk_voltage': 52.0})['enabled_hours']
+
+
+def test_load_balancer_replay_uses_thresholds():
+    history = constant_history(hours=1, battery_voltage=56.2,
+                               is_charging_to_floating_enabled=0,
+                               pv_charging_power=1000, pv_input_voltage=100,
+                               device_mode=3)
+    test = backtest.Backtest(history, components=['load_balancer'])
+    result = test.replay('load_balancer')
+    assert 1 == pytest.approx(result['enabled_hours'], abs=0.01)
+    assert result['pv_wh_while_enabled'] == pytest.approx(
+        result['enabled_hours'] * 1000)
+    assert 0 == test.replay('load_balancer',
+                            {'bulk_voltage': 57.0})['enabled_hours']
+
+
+def test_sweep_runs_grid_in_worker_processes():
+    test = backtest.Backtest(charger_history(53.0), components=['charger'])
+    parameter_grid = backtest.grid({'day_bulk_voltage': [52.0, 54.0],
+                                    'night_min_voltage': [47.2, 54.0]})
+    results = backtest.sweep(test, 'charger', parameter_grid, workers=2)
+    assert parameter_grid == [r['parameters'] for r in results]
+    hours = [r['enabled_hours_by_window'] for r in results]
+    assert [0, 0, 2, 2] == [round(h['cheap_day']) for h in hours]
+    assert [0, 8, 0, 8] == [round(h['cheap_night']) for h in hours]
+
+
+def test_load_export(tmp_path):
+    for measurement, rows in (('battery_voltage', [(2, '51.5'), (1, '50')]),
+                              ('is_charging_to_floating_enabled',
+                               [(1, 'true'), (2, 'false')])):
+        with gzip.open(str(tmp_path / (measurement + '.csv.gz')), 'wt',
+                       newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(['name', 'tags', 'time', 'value'])
+            writer.writerows([measurement, '', t * 10 ** 9, value]
+                             for t, value in rows)
+    history = backtest.load_export(
+        str(tmp_path), ['battery_voltage', 'is_charging_to_floating_enabled'])
+    times, values = history['battery_voltage']
+    assert [1, 2] == times.tolist()
+    assert [50.0, 51.5] == values.tolist()
+    assert [1.0, 0.0] == history['is_charging_to_floating_enabled'][1].tolist()
@@ -1,5 +1,11 @@
+import json
 from datetime import time
-from arinna.charger import ChargingManager
+from arinna.charger import Charger, ChargingManager, InverterSettings
+from arinna.charger import DISABLED_SETTINGS, ENABLED_SETTINGS
+from arinna.database_client import DatabaseClient
+from tests.fakes.database import FakeDatabase, get_points_with_interval
+from tests.fakes.inverter import FakeInverter
+from tests.fakes.mqtt import FakeMessage
 
 
 def test_charging_manager_is_in_cheap_day_rate():
@@ -22,3 +28,130 @@ def test_charging_manager_is_in_cheap_night_rate():
     assert True is ChargingManager.is_in_cheap_night_rate(time(5, 0))
     assert True is ChargingManager.is_in_cheap_night_rate(time(5, 59))
     assert False is ChargingManager.is_in_cheap_night_rate(time(6, 0))
+
+
+class FakeCharger:
+    def __init__(self):
+        self.is_enabled = None
+
+    def enable(self):
+        self.is_enabled = True
+
+    def disable(self):
+        self.is_enabled = False
+
+
+def database_with(measurements):
+    database = FakeDatabase()
+    database.create_database('inverter')
+    for measurement, values in measurements.items():
+        database.write_points(get_points_with_interval(values, measurement),
+                              database='inverter')
+    return DatabaseClient(database)
+
+
+def test_charging_manager_enables_charger_in_cheap_day_rate():
+    database = database_with({
+        'battery_voltage': [50.0],
+        'is_charging_to_floating_enabled': [False],
+    })
+    charger = FakeCharger()
+    ChargingManager(database, charger).process(time(14, 0))
+    assert True is charger.is_enabled
+
+
+def test_charging_manager_disables_charger_when_floating_at_night():
+    database = database_with({
+        'battery_voltage': [50.0],
+        'is_charging_to_floating_enabled': [True],
+    })
+    charger = FakeCharger()
+    ChargingManager(database, charger).process(time(23, 0))
+    assert False is charger.is_enabled
+
+
+def test_charging_manager_disables_charger_outside_cheap_rate():
+    charger = FakeCharger()
+    ChargingManager(database_with({}), charger).process(time(10, 0))
+    assert False is charger.is_enabled
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_charger_without_settings_sends_all_commands():
+    inverter = FakeInverter()
+    Charger(inverter).enable()
+    assert ['POP00', 'PCP02', 'MUCHGC030'] == inverter.requests
+
+
+def test_charger_sends_only_differing_settings():
+    settings = InverterSettings(clock=FakeClock())
+    inverter = FakeInverter(settings, dict(DISABLED_SETTINGS,
+                                           output_source_priority=0))
+    charger = Charger(inverter, settings, timeout=0)
+    charger.enable()
+    assert ['QPIRI', 'PCP02', 'MUCHGC030', 'QPIRI'] == inverter.requests
+    assert ENABLED_SETTINGS == inverter.values
+    assert 2 == charger.sent
+    assert 1 == charger.skipped
+
+
+def test_charger_uses_cached_settings_until_ttl_expires():
+    clock = FakeClock()
+    settings = InverterSettings(ttl=600, clock=clock)
+    inverter = FakeInverter(settings, dict(DISABLED_SETTINGS))
+    charger = Charger(inverter, settings, timeout=0)
+    charger.disable()
+    clock.now = 300
+    charger.disable()
+    assert ['QPIRI'] == inverter.requests
+    clock.now = 601
+    charger.disable()
+    assert ['QPIRI', 'QPIRI'] == inverter.requests
+    assert 0 == charger.sent
+    assert 9 == charger.skipped
+
+
+def test_charger_falls_back_to_all_commands_without_response():
+    settings = InverterSettings(clock=FakeClock())
+    inverter = FakeInverter()
+    Charger(inverter, settings, timeout=0).disable()
+    assert ['QPIRI', 'POP02', 'PCP01', 'MUCHGC010', 'QPIRI'] == \
+        inverter.requests
+
+
+def test_inverter_settings_from_mqtt_messages():
+    settings = InverterSettings(clock=FakeClock())
+    settings.on_message(None, None, FakeMessage(
+        'inverter/response/output_source_priority', b'2'))
+    settings.on_message(None, None, FakeMessage(
+        'inverter/response/charger_source_priority', b'1'))
+    assert settings.current() is None
+    settings.on_snapshot(None, None, FakeMessage(
+        'inverter/snapshot/QPIRI', json.dumps({
+            'max_ac_charging_current': '010',
+            'battery_type': '1'}).encode()))
+    assert DISABLED_SETTINGS == settings.current()
+    settings.invalidate()
+    assert settings.current() is None
+
+
+def test_charger_understands_mppsolar_option_labels():
+    settings = InverterSettings(clock=FakeClock())
+    inverter = FakeInverter(settings, dict(DISABLED_SETTINGS),
+                            driver='mppsolar')
+    charger = Charger(inverter, settings, timeout=0)
+    charger.disable()
+    assert ['QPIRI'] == inverter.requests
+    settings.on_snapshot(None, None, FakeMessage(
+        'inverter/snapshot/QPIRI', json.dumps({
+            'output_source_priority': 'Utility first',
+            'charger_source_priority': 'Solar + Utility',
+            'max_ac_charging_current': '30'}).encode()))
+    assert ENABLED_SETTINGS == settings.current()
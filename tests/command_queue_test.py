@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+
+import queue
+import pytest
+from arinna.command_queue import CommandQueue, ResponsePublisher, is_query
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class FakeMQTTPublisher:
+    def __init__(self):
+        self.responses = []
+
+    def publish_response(self, response, command=None):
+        self.responses.append((command, response))
+
+
+def test_is_query():
+    assert True is is_query('QPIGS')
+    assert True is is_query('QMOD')
+    assert False is is_query('POP00')
+    assert False is is_query('MUCHGC030')
+
+
+def test_command_queue_coalesces_duplicate_queries():
+    command_queue = CommandQueue()
+    for command in ['QPIGS', 'QMOD', 'QPIGS', 'QMOD', 'QPIGS']:
+        command_queue.put(command)
+    assert 2 == command_queue.qsize()
+    assert 3 == command_queue.coalesced
+    assert 'QPIGS' == command_queue.get()
+    assert 'QMOD' == command_queue.get()
+
+
+def test_command_queue_does_not_coalesce_settings():
+    command_queue = CommandQueue()
+    command_queue.put('POP00')
+    command_queue.put('POP00')
+    assert 2 == command_queue.qsize()
+
+
+def test_command_queue_serves_settings_before_queries():
+    command_queue = CommandQueue()
+    for command in ['QPIGS', 'QMOD', 'POP00', 'PCP02', 'MUCHGC030']:
+        command_queue.put(command)
+    served = [command_queue.get() for _ in range(5)]
+    assert ['POP00', 'PCP02', 'MUCHGC030', 'QPIGS', 'QMOD'] == served
+
+
+def test_command_queue_drops_oldest_query_when_full():
+    command_queue = CommandQueue(max_depth=2)
+    for command in ['QPIGS', 'POP00', 'QMOD']:
+        command_queue.put(command)
+    assert 1 == command_queue.dropped
+    assert ['POP00', 'QMOD'] == [command_queue.get() for _ in range(2)]
+
+
+def test_command_queue_measures_wait_time():
+    clock = FakeClock()
+    command_queue = CommandQueue(clock=clock)
+    command_queue.put('QPIGS')
+    clock.now += 2.5
+    command_queue.get()
+    assert 2.5 == command_queue.last_wait_time
+    assert 2.5 == command_queue.mean_wait_time()
+
+
+def test_command_queue_get_times_out():
+    with pytest.raises(queue.Empty):
+        CommandQueue().get(timeout=0.01)
+
+
+def test_response_publisher_publishes_in_background():
+    mqtt_publisher = FakeMQTTPublisher()
+    response_publisher = ResponsePublisher(mqtt_publisher)
+    response_publisher.start()
+    response_publisher.put('QMOD', {'device_mode': ['Battery', '']})
+    response_publisher.stop()
+    assert [('QMOD', {'device_mode': ['Battery', '']})] == \
+        mqtt_publisher.responses
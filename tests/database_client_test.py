@@ -260,3 +260,49 @@ def test_true_percentage():
     assert 0.0 == true_percentage(data)
     data = [False]
     assert 0.0 == true_percentage(data)
+
+
+def test_moving_aggregates_without_measurements(sample_measurement,
+                                                sample_database,
+                                                database):
+    database_client = DatabaseClient(database,
+                                     db_name=sample_database)
+    with pytest.raises(RuntimeError):
+        database_client.moving_aggregates([
+            ('average', sample_measurement, '1m'),
+            ('max', sample_measurement, '1m'),
+        ])
+
+
+def test_moving_aggregates_of_all_measurements(sample_data, sample_measurement,
+                                               sample_database,
+                                               database_with_data):
+    database_client = DatabaseClient(database_with_data,
+                                     db_name=sample_database)
+    time_window = '{}s'.format(len(sample_data) + 1)
+    specs = [
+        ('average', sample_measurement, time_window),
+        ('stddev', sample_measurement, time_window),
+        ('min', sample_measurement, time_window),
+        ('max', sample_measurement, time_window),
+        ('max', sample_measurement, '4s'),
+    ]
+    expected = {
+        specs[0]: statistics.mean(sample_data),
+        specs[1]: statistics.stdev(sample_data),
+        specs[2]: min(sample_data),
+        specs[3]: max(sample_data),
+        specs[4]: max(sample_data[-3:]),
+    }
+    assert expected == database_client.moving_aggregates(specs)
+
+
+def test_moving_aggregates_of_true_percentage(sample_bool_data,
+                                              sample_measurement,
+                                              sample_database,
+                                              database_with_bool_data):
+    database_client = DatabaseClient(database_with_bool_data,
+                                     db_name=sample_database)
+    spec = ('true_percentage', sample_measurement, '4s')
+    expected = {spec: true_percentage(sample_bool_data[-3:])}
+    assert expected == database_client.moving_aggregates([spec])
@@ -1,6 +1,32 @@
 #!/usr/bin/env python3
 
+import collections
 import arinna.database_provider as db
+import arinna.schema as schema
+from tests.fakes.mqtt import FakeMessage
+
+
+class FakeWriter:
+    def __init__(self):
+        self.points = []
+
+    def add(self, measurement, value, timestamp=None):
+        self.points.append({'measurement': measurement,
+                            'fields': {'value': value}})
+
+    def add_points(self, points):
+        self.points.extend(points)
+
+
+def user_data(writer):
+    decoders = schema.load_decoders()
+    return {
+        'decoders': decoders,
+        'topic_decoders': schema.topic_decoders(decoders,
+                                                db.RESPONSE_PREFIX),
+        'unknown_topics': collections.Counter(),
+        'writer': writer
+    }
 
 
 def test_bool_from_string_true():
@@ -27,3 +53,32 @@ def test_int_from_device_mode():
     assert 3 == db.int_from_device_mode('Battery')
     assert 4 == db.int_from_device_mode('Fault')
     assert 5 == db.int_from_device_mode('Power Saving')
+
+
+def test_on_message_adds_point_to_writer():
+    writer = FakeWriter()
+    db.on_message(None, user_data(writer), FakeMessage(
+        'inverter/response/battery_voltage', b'52,5'))
+    assert 1 == len(writer.points)
+    assert 'battery_voltage' == writer.points[0]['measurement']
+    assert 52.5 == writer.points[0]['fields']['value']
+
+
+def test_on_message_adds_snapshot_points_with_one_timestamp():
+    writer = FakeWriter()
+    db.on_message(None, user_data(writer), FakeMessage(
+        'inverter/snapshot/QPIGS',
+        b'{"battery_voltage":"52.5","is_load_on":"1","unknown":"0"}'))
+    values = {p['measurement']: p['fields']['value'] for p in writer.points}
+    assert {'battery_voltage': 52.5, 'is_load_on': True} == values
+    assert 1 == len({p['time'] for p in writer.points})
+
+
+def test_on_message_counts_unknown_topics():
+    writer = FakeWriter()
+    data = user_data(writer)
+    for _ in range(2):
+        db.on_message(None, data, FakeMessage(
+            'inverter/response/unknown', b'1'))
+    assert [] == writer.points
+    assert 2 == data['unknown_topics']['inverter/response/unknown']
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+
+import time
+import pytest
+from arinna.database_client import DatabaseClient
+from arinna.database_writer import DatabaseWriter, point
+from tests.fakes.database import FakeDatabase
+
+
+class CountingDatabase(FakeDatabase):
+    def __init__(self):
+        super().__init__()
+        self.write_count = 0
+
+    def write_points(self, points, database=None):
+        self.write_count += 1
+        super().write_points(points, database=database)
+
+
+@pytest.fixture
+def sample_database():
+    return 'sample_database'
+
+
+@pytest.fixture
+def database(sample_database):
+    d = CountingDatabase()
+    d.create_database(sample_database)
+    return d
+
+
+@pytest.fixture
+def database_client(database, sample_database):
+    return DatabaseClient(database, db_name=sample_database)
+
+
+def wait_for(condition, timeout=5):
+    time_end = time.time() + timeout
+    while time.time() < time_end and not condition():
+        time.sleep(0.01)
+
+
+def test_point_has_timestamp():
+    p = point('sample_measurement', 1)
+    assert 'sample_measurement' == p['measurement']
+    assert {'value': 1} == p['fields']
+    assert isinstance(p['time'], int)
+
+
+def test_writer_flushes_when_batch_is_full(database, database_client,
+                                           sample_database):
+    with DatabaseWriter(database_client, batch_size=3,
+                        flush_interval=60) as writer:
+        for v in range(3):
+            writer.add('sample_measurement', v)
+        wait_for(lambda: database.write_count)
+        assert 1 == database.write_count
+        assert 3 == len(database.data[sample_database])
+
+
+def test_writer_flushes_after_interval(database, database_client,
+                                       sample_database):
+    with DatabaseWriter(database_client, batch_size=100,
+                        flush_interval=0.05) as writer:
+        writer.add('sample_measurement', 1)
+        wait_for(lambda: database.write_count)
+        assert 1 == database.write_count
+        assert 1 == len(database.data[sample_database])
+
+
+def test_writer_flushes_on_stop(database, database_client, sample_database):
+    writer = DatabaseWriter(database_client, batch_size=100,
+                            flush_interval=60)
+    writer.start()
+    writer.add('sample_measurement', 1)
+    writer.add('sample_measurement', 2)
+    writer.stop()
+    assert 1 == database.write_count
+    assert 2 == writer.points_written
+    assert [1, 2] == [p['fields']['value']
+                      for p in database.data[sample_database]]
+
+
+def test_writer_survives_failed_flush(database_client):
+    writer = DatabaseWriter(database_client)
+    writer.add_points([point('sample_measurement', 1)])
+    writer.database = DatabaseClient(FakeDatabase(), db_name='missing')
+    writer.flush()
+    assert 0 == writer.points_written
+    assert [] == writer.buffer
+    assert 1 == writer.points_dropped
+
+
+def test_writer_counts_points_it_cannot_spool(database_client):
+    class BrokenSpool:
+        def append(self, points):
+            raise OSError('No space left on device')
+
+    writer = DatabaseWriter(database_client, spool=BrokenSpool())
+    writer.add_points([point('sample_measurement', 1),
+                       point('sample_measurement', 2)])
+    writer.database = DatabaseClient(FakeDatabase(), db_name='missing')
+    writer.flush()
+    assert 2 == writer.points_dropped
+    assert [] == writer.buffer
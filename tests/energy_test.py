@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+
+import datetime
+import pytest
+import arinna.energy as energy
+import arinna.tariff as tariff
+from arinna.database_client import DatabaseClient
+from arinna.memory_database import MemoryDatabase
+
+numpy = pytest.importorskip('numpy')
+
+DAY = datetime.datetime(2026, 1, 5)
+
+
+def timestamp(hour, minute=0):
+    return (DAY + datetime.timedelta(hours=hour, minutes=minute)).timestamp()
+
+
+def columns(n, pv=0.0, load=0.0, current=0.0, voltage=50.0):
+    return {
+        'pv_charging_power': numpy.full(n, pv),
+        'ac_output_active_power': numpy.full(n, load),
+        'battery_charging_current': numpy.full(n, current),
+        'battery_voltage': numpy.full(n, voltage),
+    }
+
+
+def test_tariff_window():
+    assert 'cheap_day' == tariff.window(datetime.time(13))
+    assert 'cheap_night' == tariff.window(datetime.time(5, 59))
+    assert 'standard' == tariff.window(datetime.time(6))
+
+
+def test_integrate_is_trapezoidal():
+    times = numpy.arange(0, 3601, 10.0)
+    assert 1000 == pytest.approx(energy.integrate(times, times / 1.8))
+
+
+def test_integrate_skips_gaps():
+    times = numpy.concatenate((numpy.arange(0, 101, 10.0),
+                               numpy.arange(1000, 1101, 10.0)))
+    power = numpy.full(len(times), 3600.0)
+    power[3] = numpy.nan
+    assert 200 == pytest.approx(energy.integrate(times, power))
+
+
+def test_hold_bridges_suppressed_values_up_to_max_gap():
+    times = numpy.arange(0, 100, 10.0)
+    values = numpy.full(len(times), numpy.nan)
+    values[0] = 1.0
+    held = energy.hold(times, values, 30)
+    assert [1.0] * 4 == held[:4].tolist()
+    assert numpy.isnan(held[4:]).all()
+
+
+def test_grid_charging_power_excludes_pv():
+    assert [0.0, 100.0] == energy.grid_charging_power(
+        numpy.array([50.0, 50.0]), numpy.array([10.0, 10.0]),
+        numpy.array([600.0, 400.0])).tolist()
+
+
+def test_ledger_splits_days_and_tariff_windows():
+    times = numpy.arange(timestamp(12), timestamp(16) + 1, 60.0)
+    ledger = energy.EnergyLedger()
+    ledger.update(times, columns(len(times), pv=3600.0, current=20.0))
+    pv_yield = ledger.days[DAY.date().isoformat()]['pv_yield']
+    assert 3600 * 2 == pytest.approx(pv_yield['cheap_day'])
+    assert 3600 * 2 == pytest.approx(pv_yield['standard'])
+    assert 3600 * 4 == pytest.approx(pv_yield['total'])
+    assert 'grid_charging' not in ledger.days[DAY.date().isoformat()]
+
+
+def test_ledger_is_incremental_and_resumes_from_checkpoint(tmp_path):
+    path = str(tmp_path / 'energy.json')
+    times = numpy.arange(timestamp(21), timestamp(23) + 1, 10.0)
+    whole = energy.EnergyLedger()
+    whole.update(times, columns(len(times), load=500.0))
+    half = len(times) // 2
+    energy.EnergyLedger(path).update(times[:half],
+                                     columns(half, load=500.0))
+    ledger = energy.EnergyLedger(path)
+    assert 0 == ledger.update(times[:half], columns(half, load=500.0))
+    ledger.update(times, columns(len(times), load=500.0))
+    day = DAY.date().isoformat()
+    consumption = ledger.days[day]['load_consumption']
+    assert 500 == pytest.approx(consumption['cheap_night'])
+    assert 500 == pytest.approx(consumption['standard'])
+    assert whole.days[day]['load_consumption'] == pytest.approx(consumption)
+
+
+def test_update_from_database():
+    now = int(timestamp(14)) * 10 ** 9
+    database = MemoryDatabase(clock=lambda: now)
+    database.create_database('inverter')
+    for measurement, value in (('pv_charging_power', 360),
+                               ('ac_output_active_power', 720),
+                               ('battery_charging_current', 0),
+                               ('battery_voltage', 52.0)):
+        database.write_points([
+            {'measurement': measurement,
+             'time': now - age * 10 ** 9,
+             'fields': {'value': value}}
+            for age in range(3600, 0, -10)], database='inverter')
+    ledger = energy.EnergyLedger()
+    energy.update(DatabaseClient(database), ledger, '10s', '1h',
+                  now=now / 10 ** 9)
+    day = ledger.days[DAY.date().isoformat()]
+    assert 360 == pytest.approx(day['pv_yield']['total'], rel=0.01)
+    assert 720 == pytest.approx(day['load_consumption']['cheap_day'],
+                                rel=0.01)
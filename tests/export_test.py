@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+
+import csv
+import gzip
+import os
+import pytest
+from arinna.cli import parse_args
+from arinna.export import Checkpoint, export, export_measurement, parse_time
+from arinna.memory_database import MemoryDatabase
+
+SECOND = 10 ** 9
+
+
+@pytest.fixture
+def database():
+    d = MemoryDatabase()
+    d.create_database('inverter')
+    write(d, 'battery_voltage', [(1, 52.5), (2, 52.75), (3, 53.0)])
+    write(d, 'is_load_on', [(1, True), (2, False)])
+    return d
+
+
+def write(database, measurement, points):
+    database.write_points([{'measurement': measurement, 'time': t * SECOND,
+                            'fields': {'value': v}} for t, v in points],
+                          database='inverter')
+
+
+def read_rows(path):
+    with gzip.open(path, 'rt', newline='') as f:
+        return list(csv.reader(f))
+
+
+def test_parse_time():
+    assert None is parse_time(None)
+    assert 5 == parse_time('5')
+    assert SECOND == parse_time('1970-01-01T00:00:01Z')
+
+
+def test_export_discovers_and_writes_all_measurements(database, tmp_path):
+    total, failed = export(database, 'inverter', str(tmp_path), page_size=2)
+    assert 5 == total
+    assert [] == failed
+    assert [['name', 'tags', 'time', 'value'],
+            ['battery_voltage', '', str(SECOND), '52.5'],
+            ['battery_voltage', '', str(2 * SECOND), '52.75'],
+            ['battery_voltage', '', str(3 * SECOND), '53.0']] == \
+        read_rows(str(tmp_path / 'battery_voltage.csv.gz'))
+    assert ['true', 'false'] == [
+        r[3] for r in read_rows(str(tmp_path / 'is_load_on.csv.gz'))[1:]]
+
+
+def test_export_time_range(database, tmp_path):
+    count = export_measurement(database, 'inverter', 'battery_voltage',
+                               str(tmp_path), start=2 * SECOND,
+                               end=3 * SECOND)
+    assert 1 == count
+    assert [str(2 * SECOND)] == [
+        r[2] for r in read_rows(str(tmp_path / 'battery_voltage.csv.gz'))[1:]]
+
+
+def test_export_resumes_from_checkpoint(database, tmp_path):
+    checkpoint_path = str(tmp_path / 'checkpoint.json')
+    output = str(tmp_path / 'out')
+    export(database, 'inverter', output, ['battery_voltage'],
+           checkpoint_path=checkpoint_path)
+    assert 3 * SECOND == Checkpoint(checkpoint_path).get('battery_voltage')
+    write(database, 'battery_voltage', [(4, 53.25)])
+    total, _ = export(database, 'inverter', output, ['battery_voltage'],
+                      checkpoint_path=checkpoint_path)
+    assert 1 == total
+    rows = read_rows(os.path.join(output, 'battery_voltage.csv.gz'))
+    assert 5 == len(rows)
+    assert ['52.5', '52.75', '53.0', '53.25'] == [r[3] for r in rows[1:]]
+
+
+def test_export_reports_failed_measurements(database, tmp_path):
+    total, failed = export(database, 'missing', str(tmp_path),
+                           ['battery_voltage'])
+    assert 0 == total
+    assert ['battery_voltage'] == failed
+
+
+def test_cli_parses_export_arguments():
+    args = parse_args(['export', '--measurement', 'battery_voltage',
+                       '--workers', '2', '--start', '2020-01-01T00:00:00Z'])
+    assert ['battery_voltage'] == args.measurements
+    assert 2 == args.workers
+    assert 'inverter' == args.database
@@ -0,0 +1,32 @@
+#!/usr/bin/env python3
+
+from arinna.charger import SETTING_COMMANDS
+from arinna.inverter_serial import QPIRI_OPTIONS
+
+
+class FakeInverter:
+    def __init__(self, settings=None, values=None, driver='native'):
+        self.settings = settings
+        self.values = dict(values or {})
+        self.driver = driver
+        self.requests = []
+
+    def format_value(self, field, value):
+        if self.driver == 'mppsolar':
+            if field in QPIRI_OPTIONS:
+                return QPIRI_OPTIONS[field][value]
+            return str(value)
+        return '{:02d}'.format(value)
+
+    def publish_request(self, request):
+        self.requests.append(request)
+        if request == 'QPIRI':
+            if self.settings is not None:
+                for field, value in self.values.items():
+                    self.settings.update(field,
+                                         self.format_value(field, value))
+            return
+        for field, command in SETTING_COMMANDS.items():
+            prefix = command.split('{')[0]
+            if request.startswith(prefix):
+                self.values[field] = int(request[len(prefix):])
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+
+import queue
+import threading
+from paho.mqtt.client import topic_matches_sub
+
+
+class FakeMessage:
+    def __init__(self, topic, payload):
+        self.topic = topic
+        self.payload = payload
+
+
+class FakeMQTTClient:
+    def __init__(self):
+        self.published = []
+        self.subscriptions = []
+        self.message_callbacks = {}
+
+    def publish(self, topic, payload=None):
+        self.published.append((topic, payload))
+
+    def subscribe(self, topic):
+        self.subscriptions.append(topic)
+
+    def add_message_callback(self, topic, callback):
+        self.message_callbacks[topic] = callback
+
+
+class FakeBroker:
+    def __init__(self):
+        self.clients = []
+
+    def publish(self, topic, payload):
+        for client in list(self.clients):
+            client.deliver(FakeMessage(topic, payload))
+
+
+class FakePahoClient:
+    def __init__(self, broker=None):
+        self.broker = broker or FakeBroker()
+        self.on_connect = None
+        self.on_disconnect = None
+        self.on_message = None
+        self.on_subscribe = None
+        self.user_data = None
+        self.subscriptions = []
+        self.message_callbacks = {}
+        self.events = queue.Queue()
+        self.thread = None
+
+    def connect(self, host='localhost'):
+        self.broker.clients.append(self)
+        self.events.put(lambda: self.on_connect and self.on_connect(
+            self, self.user_data, {}, 0))
+
+    def disconnect(self):
+        if self in self.broker.clients:
+            self.broker.clients.remove(self)
+        self.events.put(lambda: self.on_disconnect and self.on_disconnect(
+            self, self.user_data, 0))
+        self.events.put(None)
+
+    def user_data_set(self, data):
+        self.user_data = data
+
+    def message_callback_add(self, topic, callback):
+        self.message_callbacks[topic] = callback
+
+    def subscribe(self, topic):
+        self.subscriptions.append(topic)
+
+    def publish(self, topic, payload=None):
+        if payload is None:
+            payload = b''
+        elif not isinstance(payload, bytes):
+            payload = str(payload).encode()
+        self.broker.publish(topic, payload)
+
+    def deliver(self, message):
+        if any(topic_matches_sub(s, message.topic)
+               for s in self.subscriptions):
+            self.events.put(lambda: self.dispatch(message))
+
+    def dispatch(self, message):
+        callbacks = [c for s, c in self.message_callbacks.items()
+                     if topic_matches_sub(s, message.topic)]
+        if not callbacks and self.on_message:
+            callbacks = [self.on_message]
+        for callback in callbacks:
+            callback(self, self.user_data, message)
+
+    def loop_start(self):
+        self.thread = threading.Thread(target=self.loop_forever, daemon=True)
+        self.thread.start()
+
+    def loop_stop(self):
+        if self.thread:
+            self.events.put(None)
+            self.thread.join()
+            self.thread = None
+
+    def loop_forever(self):
+        while True:
+            event = self.events.get()
+            if event is None:
+                return
+            event()
@@ -4,8 +4,9 @@
 class FakeSerial:
     def __init__(self):
         self._last_written_data = None
-        self._response = None
+        self._response = bytearray()
         self.read_data = []
+        self.is_open = True
 
     @property
     def last_written_data(self):
@@ -19,17 +20,47 @@ class FakeSerial:
     def response(self, value):
         self._response = bytearray(value)
 
+    @property
+    def in_waiting(self):
+        return len(self._response)
+
     def write(self, data):
         self._last_written_data = data
 
-    def read(self):
-        while self._response:
-            yield bytes([self._response.pop(0)])
+    def read(self, size=1):
+        output = bytes(self._response[:size])
+        del self._response[:size]
+        return output
 
     def read_until(self, expected):
         output = b''
-        for b in self.read():
+        while self._response:
+            b = self.read()
             if b == expected:
                 break
             output += b
         return output
+
+    def reset_input_buffer(self):
+        if not self.is_open:
+            raise OSError('Port is closed')
+
+    def close(self):
+        self.is_open = False
+
+
+class FakeInverterSerial(FakeSerial):
+    def __init__(self, payloads):
+        super().__init__()
+        self.payloads = payloads
+        self.commands = []
+
+    def write(self, data):
+        super().write(data)
+        from arinna.inverter_serial import crc16
+        command = bytes(data[:-3]).decode()
+        self.commands.append(command)
+        payload = self.payloads.get(command)
+        if payload is not None:
+            frame = b'(' + payload
+            self.response = frame + crc16(frame) + b'\r'
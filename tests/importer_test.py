@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+
+import pytest
+from arinna.cli import parse_args
+from arinna.export import export
+from arinna.importer import Importer, InvalidRow, LineConverter
+from arinna.memory_database import MemoryDatabase
+
+SECOND = 10 ** 9
+
+FIELD_TYPES = {
+    'battery_voltage': 'float',
+    'bus_voltage': 'int',
+    'is_load_on': 'bool',
+}
+
+
+class FailingClient:
+    def write_points(self, *args, **kwargs):
+        raise ConnectionError('Database unavailable')
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def database():
+    d = MemoryDatabase()
+    d.create_database('inverter')
+    return d
+
+
+def row(name, value, t=SECOND):
+    return {'name': name, 'tags': '', 'time': str(t), 'value': value}
+
+
+def values(database, measurement):
+    series = database.databases['inverter'][measurement]['value']
+    return list(zip(series.times, (series.value(v) for v in series.values)))
+
+
+def write_csv(path, rows):
+    with open(path, 'w') as f:
+        f.write('name,tags,time,value\n')
+        for r in rows:
+            f.write('{},,{},{}\n'.format(*r))
+
+
+def test_converter_uses_field_types():
+    converter = LineConverter(FIELD_TYPES)
+    assert 'battery_voltage value=52.5 1000000000' == \
+        converter.convert(row('battery_voltage', '52,5'))
+    assert 'bus_voltage value=460i 1000000000' == \
+        converter.convert(row('bus_voltage', '460'))
+    assert 'is_load_on value=t 1000000000' == \
+        converter.convert(row('is_load_on', 'true'))
+
+
+def test_converter_infers_unknown_types_and_escapes():
+    converter = LineConverter()
+    assert r'sample\ name value="a \"b\"" 1000000000' == \
+        converter.convert(row('sample name', 'a "b"'))
+    assert 'is_enabled value=f 1000000000' == \
+        converter.convert(row('is_enabled', 'false'))
+
+
+def test_converter_precision():
+    converter = LineConverter(FIELD_TYPES, precision='s')
+    assert 'bus_voltage value=1i 1' == \
+        converter.convert(row('bus_voltage', '1'))
+    assert 'bus_voltage value=1i 1' == \
+        converter.convert(row('bus_voltage', '1', '1970-01-01T00:00:01Z'))
+
+
+def test_converter_rejects_invalid_rows():
+    converter = LineConverter(FIELD_TYPES)
+    for r in [row('bus_voltage', '1.5'), row('is_load_on', 'maybe'),
+              row('bus_voltage', ''), {'name': 'bus_voltage'}]:
+        with pytest.raises(InvalidRow):
+            converter.convert(r)
+
+
+def test_import_round_trips_export_and_is_idempotent(database, tmp_path):
+    source = MemoryDatabase()
+    source.create_database('inverter')
+    source.write_points(
+        [{'measurement': 'bus_voltage', 'time': t * SECOND,
+          'fields': {'value': t}} for t in range(1, 11)] +
+        [{'measurement': 'is_load_on', 'time': SECOND,
+          'fields': {'value': True}}], database='inverter')
+    export(source, 'inverter', str(tmp_path))
+    paths = [str(tmp_path / 'bus_voltage.csv.gz'),
+             str(tmp_path / 'is_load_on.csv.gz')]
+    importer = Importer(lambda: database, 'inverter', batch_size=3,
+                        connections=2, field_types=FIELD_TYPES)
+    for _ in range(2):
+        stats = importer.run(paths)
+        assert 11 == stats.points
+        assert 11 == stats.written
+    assert [(t * SECOND, t) for t in range(1, 11)] == \
+        values(database, 'bus_voltage')
+    assert [(SECOND, True)] == values(database, 'is_load_on')
+
+
+def test_dry_run_only_validates(database, tmp_path):
+    path = str(tmp_path / 'input.csv')
+    write_csv(path, [('bus_voltage', SECOND, '1'),
+                     ('bus_voltage', 2 * SECOND, 'x')])
+    importer = Importer(lambda: database, 'inverter',
+                        field_types=FIELD_TYPES, dry_run=True)
+    stats = importer.run([path])
+    assert 1 == stats.points
+    assert 1 == stats.invalid
+    assert {} == database.databases['inverter']
+
+
+def test_import_counts_failed_batches(tmp_path):
+    path = str(tmp_path / 'input.csv')
+    write_csv(path, [('bus_voltage', t, '1') for t in range(5)])
+    importer = Importer(FailingClient, 'inverter', batch_size=2,
+                        field_types=FIELD_TYPES)
+    stats = importer.run([path])
+    assert 3 == stats.failed_batches
+    assert 0 == stats.written
+
+
+def test_cli_parses_import_arguments():
+    args = parse_args(['import', 'a.csv.gz', 'b.csv', '--precision', 's',
+                       '--dry-run'])
+    assert ['a.csv.gz', 'b.csv'] == args.paths
+    assert 's' == args.precision
+    assert args.dry_run
@@ -3,8 +3,11 @@
 import arinna.inverter_provider as ip
 import arinna.mqtt_client
 import asyncio
+import json
 import queue
 import time
+from arinna.command_queue import CommandQueue, ResponsePublisher
+from tests.fakes.mqtt import FakeMQTTClient
 
 
 def test_mqtt_subscriber_puts_received_command_into_queue():
@@ -67,3 +70,99 @@ def test_mqtt_publisher_publishes_request():
         loop.stop()
 
         assert request == mutable_object['payload']
+
+
+def test_mqtt_publisher_publishes_snapshot():
+    mqtt_client = FakeMQTTClient()
+    response = {'battery_voltage': ['52.5', 'V'], 'is_load_on': ['1', '']}
+    mqtt_adapter = ip.InverterMQTTPublisher(mqtt_client,
+                                            publish_fields=False,
+                                            publish_snapshots=True)
+    mqtt_adapter.publish_response(response, 'QPIGS')
+    assert 1 == len(mqtt_client.published)
+    topic, payload = mqtt_client.published[0]
+    assert 'inverter/snapshot/QPIGS' == topic
+    assert {'battery_voltage': '52.5', 'is_load_on': '1'} == \
+        json.loads(payload)
+
+
+def test_mqtt_publisher_publishes_fields_and_snapshot():
+    mqtt_client = FakeMQTTClient()
+    response = {'battery_voltage': ['52.5', 'V'], 'is_load_on': ['1', '']}
+    mqtt_adapter = ip.InverterMQTTPublisher(mqtt_client,
+                                            publish_snapshots=True)
+    mqtt_adapter.publish_response(response, 'QPIGS')
+    topics = [topic for topic, _ in mqtt_client.published]
+    assert ['inverter/response/battery_voltage',
+            'inverter/response/is_load_on',
+            'inverter/snapshot/QPIGS'] == topics
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_exception_filter_suppresses_unchanged_fields():
+    clock = FakeClock()
+    response_filter = ip.ExceptionFilter(keyframe_interval=60,
+                                         deadbands={'battery_voltage': 0.1},
+                                         clock=clock)
+    response = {'battery_voltage': ['52.50', 'V'],
+                'eeprom_version': ['00', '']}
+    assert response == response_filter.filter(response, 'QPIGS')
+    clock.now += 10
+    response = {'battery_voltage': ['52.55', 'V'],
+                'eeprom_version': ['00', '']}
+    assert {} == response_filter.filter(response, 'QPIGS')
+    clock.now += 10
+    response = {'battery_voltage': ['52.70', 'V'],
+                'eeprom_version': ['00', '']}
+    assert {'battery_voltage': ['52.70', 'V']} == \
+        response_filter.filter(response, 'QPIGS')
+    assert 3 / 6 == response_filter.suppression_ratio()
+
+
+def test_exception_filter_publishes_keyframes():
+    clock = FakeClock()
+    response_filter = ip.ExceptionFilter(keyframe_interval=60, clock=clock)
+    response = {'eeprom_version': ['00', '']}
+    response_filter.filter(response, 'QPIGS')
+    clock.now += 30
+    assert {} == response_filter.filter(response, 'QPIGS')
+    assert response == response_filter.filter(response, 'QMOD')
+    clock.now += 30
+    assert response == response_filter.filter(response, 'QPIGS')
+
+
+def test_exception_filter_always_publishes_settings():
+    response_filter = ip.ExceptionFilter(clock=FakeClock())
+    response = {'output_source_priority': ['2', '']}
+    response_filter.filter(response, 'QPIRI')
+    assert response == response_filter.filter(response, 'QPIRI')
+
+
+def test_mqtt_publisher_skips_unchanged_response():
+    mqtt_client = FakeMQTTClient()
+    response_filter = ip.ExceptionFilter(clock=FakeClock())
+    mqtt_adapter = ip.InverterMQTTPublisher(mqtt_client,
+                                            publish_snapshots=True,
+                                            response_filter=response_filter)
+    response = {'eeprom_version': ['00', '']}
+    mqtt_adapter.publish_response(response, 'QPIGS')
+    mqtt_adapter.publish_response(response, 'QPIGS')
+    assert 2 == len(mqtt_client.published)
+
+
+def test_handle_command_skips_serial_errors():
+    class BrokenSerial:
+        def send_command(self, command):
+            raise OSError('Device disconnected')
+
+    response_publisher = ResponsePublisher(None)
+    ip.handle_command('QPIGS', BrokenSerial(), CommandQueue(),
+                      response_publisher)
+    assert response_publisher.responses.empty()
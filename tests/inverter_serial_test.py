@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+
+import pytest
+from arinna.inverter_serial import InverterSerial, ProtocolError
+from arinna.inverter_serial import command_frame, crc16, normalise_options
+from tests.fakes.serial import FakeInverterSerial, FakeSerial
+
+QPIGS_PAYLOAD = b'000.0 00.0 230.0 49.9 0161 0119 003 460 57.50 012 100 ' \
+                b'0069 0014 103.8 57.49 00000 00110110 00 00 00856 010'
+QPIRI_PAYLOAD = b'230.0 21.7 230.0 50.0 21.7 5000 4000 48.0 46.0 42.0 ' \
+                b'56.4 54.0 2 30 060 1 0 2 9 01 0 0 54.0 0 1'
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        self.now += 0.5
+        return self.now
+
+
+def driver_for(serial):
+    return InverterSerial('/dev/null', 2400,
+                          serial_factory=lambda *args: serial,
+                          clock=FakeClock())
+
+
+def test_command_frame_has_known_crc():
+    assert b'QPIGS\xb7\xa9\r' == command_frame('QPIGS')
+
+
+def test_crc_avoids_reserved_bytes():
+    for data in [b'QMOD', b'QPIRI', b'POP00', b'PCP02', b'MUCHGC030']:
+        assert not set(crc16(data)) & {0x0a, 0x0d, 0x28}
+
+
+def test_send_command_decodes_qpigs():
+    serial = FakeInverterSerial({'QPIGS': QPIGS_PAYLOAD})
+    response = driver_for(serial).send_command('QPIGS')
+    assert command_frame('QPIGS') == serial.last_written_data
+    assert 30 == len(response)
+    assert ['230.0', 'V'] == response['ac_output_voltage']
+    assert ['57.50', 'V'] == response['battery_voltage']
+    assert ['1', ''] == response['is_load_on']
+    assert ['0', ''] == response['is_sbu_priority_version_added']
+    assert ['00856', 'W'] == response['pv_charging_power']
+    assert ['1', ''] == response['is_switch_on']
+
+
+def test_send_command_decodes_qmod():
+    serial = FakeInverterSerial({'QMOD': b'B'})
+    response = driver_for(serial).send_command('QMOD')
+    assert {'device_mode': ['Battery', '']} == response
+
+
+def test_send_command_decodes_qpiri():
+    serial = FakeInverterSerial({'QPIRI': QPIRI_PAYLOAD})
+    response = driver_for(serial).send_command('QPIRI')
+    assert ['30', 'A'] == response['max_ac_charging_current']
+    assert ['0', ''] == response['output_source_priority']
+    assert ['2', ''] == response['charger_source_priority']
+    assert ['1', ''] == response['pv_power_balance']
+
+
+def test_send_command_accepts_setting_acknowledgement():
+    serial = FakeInverterSerial({'POP00': b'ACK'})
+    assert {} == driver_for(serial).send_command('POP00')
+
+
+def test_send_command_rejects_nak():
+    serial = FakeInverterSerial({'POP00': b'NAK'})
+    with pytest.raises(ProtocolError):
+        driver_for(serial).send_command('POP00')
+
+
+def test_send_command_rejects_invalid_crc():
+    serial = FakeSerial()
+    serial.response = b'(B\x00\x00\r'
+    with pytest.raises(ProtocolError):
+        driver_for(serial).send_command('QMOD')
+
+
+def test_send_command_rejects_truncated_qpigs():
+    serial = FakeInverterSerial({'QPIGS': QPIGS_PAYLOAD[:40]})
+    with pytest.raises(ProtocolError):
+        driver_for(serial).send_command('QPIGS')
+
+
+def test_send_command_times_out_and_reconnects_after_stall():
+    serials = []
+
+    def serial_factory(*args):
+        serials.append(FakeSerial())
+        return serials[-1]
+
+    driver = InverterSerial('/dev/null', 2400, stall_limit=2,
+                            serial_factory=serial_factory,
+                            clock=FakeClock())
+    for _ in range(2):
+        with pytest.raises(ProtocolError):
+            driver.send_command('QMOD')
+    assert 1 == driver.reconnects
+    assert 2 == len(serials)
+    assert False is serials[0].is_open
+
+
+def test_send_command_reopens_port_after_serial_error():
+    serials = []
+
+    def serial_factory(*args):
+        serials.append(FakeInverterSerial({'QMOD': b'B'}))
+        return serials[-1]
+
+    driver = InverterSerial('/dev/null', 2400, serial_factory=serial_factory,
+                            clock=FakeClock())
+    driver.open()
+    serials[0].is_open = False
+    with pytest.raises(OSError):
+        driver.send_command('QMOD')
+    assert driver.serial is None
+    assert 1 == driver.failures
+    assert {'device_mode': ['Battery', '']} == driver.send_command('QMOD')
+    assert 2 == len(serials)
+    assert 0 == driver.failures
+
+
+def test_normalise_options_maps_mppsolar_labels_to_codes():
+    assert {'output_source_priority': ['2', ''],
+            'charger_source_priority': ['3', ''],
+            'max_ac_charging_current': ['30', 'A']} == normalise_options({
+                'output_source_priority': ['SBU first', ''],
+                'charger_source_priority': ['Only solar charging permitted',
+                                            ''],
+                'max_ac_charging_current': ['30', 'A']})
+    assert {'charger_source_priority': ['02', '']} == normalise_options(
+        {'charger_source_priority': ['02', '']})
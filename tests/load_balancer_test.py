@@ -1 +1,62 @@
 #!/usr/bin/env python3
+
+import pytest
+from arinna.database_client import DatabaseClient
+from arinna.load_balancer import LoadBalancer
+from tests.fakes.database import FakeDatabase, get_points_with_interval
+
+
+class FakeLoad:
+    def __init__(self):
+        self.is_enabled = None
+
+    def enable(self):
+        self.is_enabled = True
+
+    def disable(self):
+        self.is_enabled = False
+
+
+@pytest.fixture
+def sample_database():
+    return 'sample_database'
+
+
+def database_with(sample_database, measurements):
+    database = FakeDatabase()
+    database.create_database(sample_database)
+    for measurement, values in measurements.items():
+        database.write_points(get_points_with_interval(values, measurement),
+                              database=sample_database)
+    return DatabaseClient(database, db_name=sample_database)
+
+
+def test_load_balancer_enables_load_on_battery_with_full_battery(
+        sample_database):
+    database = database_with(sample_database, {
+        'device_mode': [3],
+        'battery_voltage': [56.5],
+        'pv_input_voltage': [120.0],
+        'is_charging_to_floating_enabled': [False],
+    })
+    load = FakeLoad()
+    LoadBalancer(database, load).balance()
+    assert True is load.is_enabled
+
+
+def test_load_balancer_disables_load_without_pv(sample_database):
+    database = database_with(sample_database, {
+        'device_mode': [3],
+        'battery_voltage': [56.5],
+        'pv_input_voltage': [20.0],
+        'is_charging_to_floating_enabled': [False],
+    })
+    load = FakeLoad()
+    LoadBalancer(database, load).balance()
+    assert False is load.is_enabled
+
+
+def test_load_balancer_raises_without_data(sample_database):
+    database = database_with(sample_database, {})
+    with pytest.raises(RuntimeError):
+        LoadBalancer(database, FakeLoad()).balance()
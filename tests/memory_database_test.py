@@ -0,0 +1,294 @@
+#!/usr/bin/env python3
+
+import datetime
+import statistics
+import pytest
+from arinna.config import Config
+from arinna.database_client import DatabaseClient, create_db_client
+from arinna.memory_database import HotTierDatabase, MemoryDatabase
+from arinna.memory_database import rfc3339, time_ns
+
+SECOND = 10 ** 9
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000 * SECOND
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+@pytest.fixture
+def database(clock):
+    d = MemoryDatabase(clock=clock)
+    d.create_database('sample_database')
+    return d
+
+
+def write(database, values, clock, measurement='sample_measurement'):
+    database.write_points([
+        {'measurement': measurement,
+         'time': clock.now - (len(values) - i) * SECOND,
+         'fields': {'value': v}}
+        for i, v in enumerate(values)], database='sample_database')
+
+
+def query(database, q, **kwargs):
+    result = database.query(q, database='sample_database', **kwargs)
+    return list(result.get_points('sample_measurement'))
+
+
+def test_time_ns_converts_datetimes_and_precisions():
+    assert SECOND == time_ns(datetime.datetime(1970, 1, 1, 0, 0, 1))
+    assert SECOND == time_ns('1970-01-01T00:00:01Z')
+    assert SECOND == time_ns(1, 's')
+    assert '1970-01-01T00:00:01.5Z' == rfc3339(SECOND + SECOND // 2)
+
+
+def test_time_ns_keeps_nanoseconds_and_offsets():
+    t = 1700000000123456789
+    assert t == time_ns(rfc3339(t))
+    assert SECOND == time_ns('1970-01-01T01:00:01+01:00')
+    with pytest.raises(ValueError):
+        time_ns('yesterday')
+
+
+def test_aggregates(database, clock):
+    values = [2, 5, 1, 6, 23]
+    write(database, values, clock)
+    source = 'FROM "sample_measurement" WHERE time > now() - 10s'
+    assert statistics.mean(values) == \
+        query(database, 'SELECT MEAN("value") ' + source)[0]['mean']
+    assert pytest.approx(statistics.stdev(values)) == \
+        query(database, 'SELECT STDDEV("value") ' + source)[0]['stddev']
+    assert 1 == query(database, 'SELECT MIN("value") ' + source)[0]['min']
+    assert 23 == query(database, 'SELECT MAX("value") ' + source)[0]['max']
+
+
+def test_window_excludes_points_at_boundary(database, clock):
+    write(database, [1, 2, 3], clock)
+    points = query(database, 'SELECT "value" FROM "sample_measurement" '
+                             'WHERE time > now() - 2s', epoch='s')
+    assert [{'time': 999, 'value': 3}] == points
+
+
+def test_raw_select_keeps_value_types(database, clock):
+    write(database, [True, False], clock)
+    points = query(database, 'SELECT "value"FROM "sample_measurement" '
+                             'WHERE time > now() - 1m')
+    assert [True, False] == [p['value'] for p in points]
+    assert '1970-01-01T00:16:38Z' == points[0]['time']
+
+
+def test_empty_result(database):
+    assert [] == query(database, 'SELECT MEAN("value") '
+                                 'FROM "sample_measurement" '
+                                 'WHERE time > now() - 1m')
+
+
+def test_points_are_sorted_and_deduplicated(database, clock):
+    points = [{'measurement': 'sample_measurement', 'time': t,
+               'fields': {'value': v}}
+              for t, v in [(3, 3), (1, 1), (2, 2), (2, 4)]]
+    database.write_points(points, database='sample_database',
+                          time_precision='s')
+    series = database.databases['sample_database']['sample_measurement'][
+        'value']
+    assert [SECOND, 2 * SECOND, 3 * SECOND] == list(series.times)
+    assert [1, 4, 3] == list(series.values)
+
+
+def test_retention_evicts_old_points(clock):
+    database = MemoryDatabase(retention=2, clock=clock)
+    database.create_database('sample_database')
+    write(database, [1, 2, 3, 4], clock)
+    series = database.databases['sample_database']['sample_measurement'][
+        'value']
+    assert [3, 4] == list(series.values)
+    assert 2 == database.points_evicted
+
+
+def test_multiple_statements(database, clock):
+    write(database, [1, 3], clock)
+    results = database.query(
+        'SELECT MIN("value") FROM "sample_measurement" '
+        'WHERE time > now() - 1m; '
+        'SELECT MAX("value") FROM "sample_measurement" '
+        'WHERE time > now() - 1m', database='sample_database')
+    assert [{'min': 1}, {'max': 3}] == [
+        {k: v for k, v in next(r.get_points()).items() if k != 'time'}
+        for r in results]
+
+
+def test_errors(database, clock):
+    write(database, [True], clock)
+    with pytest.raises(ValueError):
+        query(database, 'SELECT MEAN("value") FROM "sample_measurement" '
+                        'WHERE time > now() - 1m')
+    with pytest.raises(ValueError):
+        query(database, 'DROP MEASUREMENT "sample_measurement"')
+    with pytest.raises(ValueError):
+        write(database, [1.0], clock)
+    with pytest.raises(RuntimeError):
+        database.query('SELECT "value" FROM "sample_measurement" '
+                       'WHERE time > now() - 1m', database='missing')
+
+
+def test_database_client_on_memory_database(database, clock):
+    write(database, [1, 2, 3], clock)
+    write(database, [True, False, True, True], clock, 'sample_flag')
+    database_client = DatabaseClient(database, db_name='sample_database')
+    specs = [('average', 'sample_measurement', '5m'),
+             ('true_percentage', 'sample_flag', '5m')]
+    assert {specs[0]: 2, specs[1]: 0.75} == \
+        database_client.moving_aggregates(specs)
+    assert [(997, 1), (998, 2), (999, 3)] == database_client.load_points(
+        'sample_measurement', '5m')
+
+
+def test_hot_tier_answers_covered_windows(clock):
+    backend = MemoryDatabase(clock=clock)
+    database = HotTierDatabase(backend, retention=60, clock=clock)
+    database.create_database('sample_database')
+    clock.now += 30 * SECOND
+    write(database, [1, 2, 3], clock)
+    mean = 'SELECT MEAN("value") FROM "sample_measurement" ' \
+           'WHERE time > now() - {}'
+    assert 2 == query(database, mean.format('10s'))[0]['mean']
+    assert 1 == database.hot_queries
+    query(database, mean.format('1m'))
+    assert 1 == database.backend_queries
+    clock.now += 60 * SECOND
+    query(database, mean.format('1m'))
+    assert 2 == database.hot_queries
+
+
+def test_retention_policies_are_separate(clock):
+    backend = MemoryDatabase(clock=clock)
+    database = HotTierDatabase(backend, retention=60, clock=clock)
+    database.create_database('sample_database')
+    clock.now += 60 * SECOND
+    write(database, [1], clock)
+    database.write_points([{'measurement': 'sample_measurement',
+                            'time': clock.now - SECOND,
+                            'fields': {'mean': 5.0}}],
+                          database='sample_database',
+                          retention_policy='rollup_1m')
+    rollup = 'SELECT MEAN("mean") FROM "rollup_1m"."sample_measurement" ' \
+             'WHERE time > now() - 10s'
+    assert 5 == query(database, rollup)[0]['mean']
+    assert 1 == database.backend_queries
+    result = database.query('SHOW MEASUREMENTS', database='sample_database')
+    assert [{'name': 'sample_measurement'}] == list(result.get_points())
+
+
+def test_show_measurements(database, clock):
+    write(database, [1], clock, 'b')
+    write(database, [1], clock, 'a')
+    result = database.query('SHOW MEASUREMENTS', database='sample_database')
+    assert [{'name': 'a'}, {'name': 'b'}] == list(result.get_points())
+
+
+def test_chunked_query_with_time_range(database, clock):
+    write(database, list(range(10)), clock)
+    start = clock.now - 8 * SECOND
+    chunks = database.query(
+        'SELECT "value" FROM "sample_measurement" '
+        'WHERE time >= {} AND time < {}'.format(start, start + 5 * SECOND),
+        database='sample_database', epoch='ns', chunked=True, chunk_size=2)
+    values = [[p['value'] for p in chunk.get_points('sample_measurement')]
+              for chunk in chunks]
+    assert [[2, 3], [4, 5], [6]] == values
+
+
+def test_limit(database, clock):
+    write(database, [1, 2, 3], clock)
+    points = query(database, 'SELECT "value" FROM "sample_measurement" '
+                             'WHERE time > 0 ORDER BY time LIMIT 2')
+    assert [1, 2] == [p['value'] for p in points]
+
+
+def test_count_with_filter(database, clock):
+    write(database, [True, False, True, True], clock)
+    count = 'SELECT COUNT("value") FROM "sample_measurement" ' \
+            'WHERE time > now() - 1m'
+    assert 4 == query(database, count)[0]['count']
+    assert 3 == query(database, count + ' AND "value" = true')[0]['count']
+    assert 1 == query(database, count + ' AND "value" != true')[0]['count']
+    points = query(database, 'SELECT "value" FROM "sample_measurement" '
+                             'WHERE time > now() - 1m AND "value" = false')
+    assert [False] == [p['value'] for p in points]
+
+
+def test_database_client_true_percentage_without_true_values(database,
+                                                             clock):
+    write(database, [False, False], clock)
+    database_client = DatabaseClient(database, db_name='sample_database')
+    assert 0 == database_client.moving_true_percentage(
+        'sample_measurement', '5m')
+
+
+def test_database_client_streams_points_in_pages(database, clock):
+    write(database, list(range(7)), clock)
+    database_client = DatabaseClient(database, db_name='sample_database')
+    points = database_client.iter_load_points('sample_measurement', '5m',
+                                              chunk_size=3)
+    assert [(993 + i, i) for i in range(7)] == list(points)
+    assert list(range(7)) == list(database_client.iter_load(
+        'sample_measurement', '5m', chunk_size=7))
+
+
+def test_group_by_time_with_fill(database, clock):
+    database.write_points([
+        {'measurement': 'sample_measurement',
+         'time': clock.now - age * SECOND,
+         'fields': {'value': value}}
+        for age, value in ((6, 1.0), (5, 3.0), (2, 8.0))],
+        database='sample_database')
+    grouped = 'SELECT MEAN("value") FROM "sample_measurement" ' \
+              'WHERE time >= {} AND time < {} GROUP BY time(2s) fill({})'
+    start = clock.now - 8 * SECOND
+    end = clock.now
+    means = {fill: [p['mean'] for p in query(database, grouped.format(
+                 start, end, fill))]
+             for fill in ('null', 'none', 'previous', 'linear', '0')}
+    assert [None, 2.0, None, 8.0] == means['null']
+    assert [2.0, 8.0] == means['none']
+    assert [None, 2.0, 2.0, 8.0] == means['previous']
+    assert [None, 2.0, 5.0, 8.0] == means['linear']
+    assert [0, 2.0, 0, 8.0] == means['0']
+
+
+def test_database_client_series_aligns_measurements(database, clock):
+    numpy = pytest.importorskip('numpy')
+    clock.now = 1000 * SECOND
+    write(database, [1.0, 3.0, 5.0, 7.0], clock, 'a')
+    write(database, [2.0, 4.0], clock, 'b')
+    database_client = DatabaseClient(database, db_name='sample_database')
+    series = database_client.series(['a', 'b'], '4s', '2s')
+    assert [996, 998, 1000] == series.time.tolist()
+    assert [3.0, 6.0] == series.columns['a'][:2].tolist()
+    assert [False, True, False] == \
+        (~numpy.isnan(series.columns['b'])).tolist()
+    assert 3.0 == series.columns['b'][1]
+    series = database_client.series(['a', 'b'], '4s', '2s', 'max', 'none')
+    assert [998] == series.time.tolist()
+    assert [7.0] == series.columns['a'].tolist()
+    with pytest.raises(ValueError):
+        database_client.series(['a'], '4s', '2s', fill='zero')
+
+
+def test_create_db_client_wraps_influxdb_in_hot_tier():
+    pytest.importorskip('influxdb')
+    settings = Config()
+    assert not isinstance(create_db_client(settings), HotTierDatabase)
+    settings.settings['hot_tier_retention'] = 10800
+    db_client = create_db_client(settings)
+    assert isinstance(db_client, HotTierDatabase)
+    assert 10800 == db_client.retention
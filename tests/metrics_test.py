@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+
+import urllib.request
+import pytest
+import arinna.database_provider as database_provider
+from arinna.metrics import MetricsExporter, Registry
+from tests.fakes.mqtt import FakeMessage
+
+
+@pytest.fixture
+def registry():
+    return Registry()
+
+
+class FakeDatabaseClient:
+    def __init__(self):
+        self.points = []
+
+    def save_points(self, points):
+        self.points.extend(points)
+
+
+def test_counter_exposition(registry):
+    counter = registry.counter('sample_total', 'Sample counter')
+    counter.inc()
+    counter.inc(2)
+    assert '# HELP sample_total Sample counter\n' \
+           '# TYPE sample_total counter\n' \
+           'sample_total 3.0\n' == registry.exposition()
+
+
+def test_registry_returns_existing_metric(registry):
+    assert registry.counter('sample_total', '') is \
+        registry.counter('sample_total', '')
+
+
+def test_gauge_reads_function(registry):
+    values = [1]
+    registry.gauge('sample', 'Sample gauge', lambda: len(values))
+    values.append(2)
+    assert 'sample 2.0' in registry.exposition()
+
+
+def test_labeled_histogram_exposition(registry):
+    histogram = registry.histogram('sample_seconds', 'Sample histogram',
+                                   buckets=(0.1, 1.0))
+    histogram.labels(command='QPIGS').observe(0.05)
+    histogram.labels(command='QPIGS').observe(0.5)
+    exposition = registry.exposition()
+    assert 'sample_seconds_bucket{command="QPIGS",le="0.1"} 1.0' in exposition
+    assert 'sample_seconds_bucket{command="QPIGS",le="1.0"} 2.0' in exposition
+    assert 'sample_seconds_bucket{command="QPIGS",le="+Inf"} 2.0' \
+        in exposition
+    assert 'sample_seconds_count{command="QPIGS"} 2.0' in exposition
+    assert 'sample_seconds_sum{command="QPIGS"} 0.55' in exposition
+
+
+def test_histogram_quantile(registry):
+    histogram = registry.histogram('sample_seconds', '', buckets=(1, 2, 3))
+    for v in [0.5, 1.5, 1.5, 2.5]:
+        histogram.observe(v)
+    assert 1.5 == histogram.quantile(0.5)
+    assert 3 == histogram.quantile(1.0)
+
+
+def test_histogram_timer_observes_duration(registry):
+    histogram = registry.histogram('sample_seconds', '')
+    with histogram.time():
+        pass
+    assert 1 == histogram.count
+    assert 0 <= histogram.sum
+
+
+def test_registry_points(registry):
+    registry.counter('sample_total', '').inc()
+    registry.histogram('sample_seconds', '').labels(command='QPIGS').observe(
+        0.1)
+    points = registry.points(timestamp=1)
+    assert {'measurement': 'sample_total', 'tags': {},
+            'fields': {'value': 1.0}, 'time': 1} == points[0]
+    assert 'sample_seconds' == points[1]['measurement']
+    assert {'command': 'QPIGS'} == points[1]['tags']
+    assert 1 == points[1]['fields']['count']
+
+
+def test_exporter_serves_metrics(registry):
+    registry.counter('sample_total', '').inc()
+    with MetricsExporter(registry, port=0) as exporter:
+        port = exporter.server.server_address[1]
+        url = 'http://127.0.0.1:{}/metrics'.format(port)
+        with urllib.request.urlopen(url, timeout=5) as response:
+            assert 200 == response.status
+            assert b'sample_total 1.0' in response.read()
+
+
+def test_exporter_saves_metrics_into_database(registry):
+    registry.counter('sample_total', '').inc()
+    database = FakeDatabaseClient()
+    exporter = MetricsExporter(registry, database=database)
+    exporter.save()
+    assert 'sample_total' == database.points[0]['measurement']
+
+
+def test_database_provider_counts_messages():
+    received = database_provider.MESSAGES_RECEIVED.value
+    errors = database_provider.MESSAGE_ERRORS.value
+    database_provider.on_message(None, {}, FakeMessage('sample', b''))
+    assert received + 1 == database_provider.MESSAGES_RECEIVED.value
+    assert errors + 1 == database_provider.MESSAGE_ERRORS.value
@@ -2,6 +2,7 @@ import asyncio
 import threading
 import pytest
 import arinna.mqtt_client
+from tests.fakes.mqtt import FakeMessage, FakePahoClient
 
 
 @pytest.fixture
@@ -77,3 +78,30 @@ def test_mqtt_client_receives_message_from_topic(mqtt_client_with_loop):
     loop.stop()
 
     assert True is mutable_object['message_received']
+
+
+def test_message_router_dispatches_to_all_callbacks():
+    paho_client = FakePahoClient()
+    router = arinna.mqtt_client.MessageRouter(
+        arinna.mqtt_client.MQTTClient(paho_client))
+    received = []
+    router.add_message_callback('a/#', lambda c, u, m: received.append(1))
+    router.add_message_callback('a/#', lambda c, u, m: received.append(2))
+    router.subscribe('a/#')
+    router.subscribe('a/#')
+    router.on_connect(paho_client, None, {}, 0)
+    assert ['a/#'] == paho_client.subscriptions
+    paho_client.dispatch(FakeMessage('a/b', b'1'))
+    assert [1, 2] == received
+
+
+def test_message_router_resubscribes_on_reconnect():
+    paho_client = FakePahoClient()
+    router = arinna.mqtt_client.MessageRouter(
+        arinna.mqtt_client.MQTTClient(paho_client))
+    router.subscribe('a')
+    router.on_connect(paho_client, None, {}, 0)
+    router.subscribe('b')
+    assert ['a', 'b'] == paho_client.subscriptions
+    router.on_connect(paho_client, None, {}, 0)
+    assert ['a', 'b', 'a', 'b'] == paho_client.subscriptions
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+
+import json
+from arinna.poller import AdaptivePoller, CommandRate
+from tests.fakes.mqtt import FakeMessage
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_command_rate_backs_off_when_stable():
+    rate = CommandRate('QPIGS', 2, 10, {'battery_voltage': 0.2})
+    intervals = []
+    for now in range(5):
+        rate.observe('battery_voltage', 52.0)
+        rate.schedule(now)
+        intervals.append(rate.interval)
+    assert [2, 4, 8, 10, 10] == intervals
+
+
+def test_command_rate_speeds_up_on_large_delta():
+    rate = CommandRate('QPIGS', 2, 10, {'battery_voltage': 0.2})
+    rate.schedule(0)
+    rate.observe('battery_voltage', 52.0)
+    rate.schedule(2)
+    rate.observe('battery_voltage', 52.1)
+    rate.schedule(6)
+    assert 8 == rate.interval
+    rate.observe('battery_voltage', 52.5)
+    rate.observe('battery_voltage', 52.5)
+    rate.schedule(14)
+    assert 2 == rate.interval
+
+
+def test_command_rate_compares_non_numeric_values():
+    rate = CommandRate('QMOD', 1, 8, {'device_mode': 0})
+    rate.schedule(0)
+    rate.observe('device_mode', 'Line')
+    rate.observe('device_mode', 'Battery')
+    rate.schedule(1)
+    assert 1 == rate.interval
+
+
+def test_poller_polls_commands_at_own_rates():
+    clock = FakeClock()
+    published = []
+    poller = AdaptivePoller({
+        'QPIGS': {'min_interval': 2, 'max_interval': 4},
+        'QPIRI': {'min_interval': 60, 'max_interval': 60},
+    }, published.append, clock)
+    while clock.now < 60:
+        poller.poll()
+        clock.now = poller.next_poll()
+    assert ['QPIGS', 'QPIRI'] == published[:2]
+    assert 1 == published.count('QPIRI')
+    assert 16 == published.count('QPIGS')
+    assert 60 == poller.next_poll()
+
+
+def test_poller_observes_responses_and_snapshots():
+    clock = FakeClock()
+    poller = AdaptivePoller({
+        'QPIGS': {'min_interval': 2, 'max_interval': 16,
+                  'thresholds': {'battery_voltage': 0.2,
+                                 'pv_input_voltage': 5.0}},
+    }, lambda command: None, clock)
+    for _ in range(3):
+        poller.poll()
+        clock.now = poller.next_poll()
+    assert 8 == poller.stats()['QPIGS']['interval']
+    poller.on_message(None, None, FakeMessage(
+        'inverter/response/battery_voltage', b'52.00'))
+    poller.on_snapshot(None, None, FakeMessage(
+        'inverter/snapshot/QPIGS', json.dumps(
+            {'battery_voltage': '52.50', 'unknown': '1'}).encode()))
+    poller.poll()
+    assert 2 == poller.stats()['QPIGS']['interval']
+    assert 4 == poller.stats()['QPIGS']['polls']
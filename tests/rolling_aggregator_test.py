@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+
+import statistics
+import pytest
+from arinna.database_client import DatabaseClient
+from arinna.rolling_aggregator import RollingAggregator, RollingWindow
+from tests.fakes.database import FakeDatabase, get_points_with_interval
+from tests.fakes.mqtt import FakeMessage
+
+
+class FakeClock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def sample_data():
+    return [2, 5, 1, 6, 23]
+
+
+@pytest.fixture
+def sample_measurement():
+    return 'battery_voltage'
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+@pytest.fixture
+def aggregator(sample_measurement, clock):
+    return RollingAggregator([('average', sample_measurement, '3s'),
+                              ('max', sample_measurement, '10s')],
+                             clock=clock)
+
+
+@pytest.fixture
+def aggregator_with_data(aggregator, sample_measurement, sample_data, clock):
+    for v in sample_data:
+        clock.now += 1
+        aggregator.add(sample_measurement, v)
+    return aggregator
+
+
+def test_moving_aggregates_of_all_measurements(sample_data,
+                                               sample_measurement,
+                                               aggregator_with_data):
+    a = aggregator_with_data
+    time_window = '10s'
+    assert statistics.mean(sample_data) == pytest.approx(
+        a.moving_average(sample_measurement, time_window))
+    assert statistics.stdev(sample_data) == pytest.approx(
+        a.moving_stddev(sample_measurement, time_window))
+    assert min(sample_data) == a.moving_min(sample_measurement, time_window)
+    assert max(sample_data) == a.moving_max(sample_measurement, time_window)
+
+
+def test_moving_aggregates_of_last_3_measurements(sample_data,
+                                                  sample_measurement,
+                                                  aggregator_with_data):
+    a = aggregator_with_data
+    assert statistics.mean(sample_data[-3:]) == pytest.approx(
+        a.moving_average(sample_measurement, '3s'))
+    assert min(sample_data[-3:]) == a.moving_min(sample_measurement, '3s')
+    assert max(sample_data[-3:]) == a.moving_max(sample_measurement, '3s')
+
+
+def test_moving_aggregates_expire_with_time(sample_measurement,
+                                            aggregator_with_data, clock):
+    clock.now += 60
+    with pytest.raises(RuntimeError):
+        aggregator_with_data.moving_average(sample_measurement, '3s')
+
+
+def test_moving_aggregates_of_untracked_window(sample_measurement,
+                                               aggregator_with_data):
+    with pytest.raises(RuntimeError):
+        aggregator_with_data.moving_average(sample_measurement, '1h')
+
+
+def test_moving_true_percentage(clock):
+    aggregator = RollingAggregator(
+        [('true_percentage', 'is_charging_on', '1m')], clock=clock)
+    for v in [True, True, False, False, True]:
+        clock.now += 1
+        aggregator.add('is_charging_on', v)
+    spec = ('true_percentage', 'is_charging_on', '1m')
+    assert {spec: 0.6} == aggregator.moving_aggregates([spec])
+
+
+def test_window_bounds_number_of_points():
+    window = RollingWindow(duration=3600, max_points=3)
+    for t, v in enumerate([9, 1, 2, 3]):
+        window.add(t, v)
+    assert 3 == len(window)
+    assert 1 == window.min()
+    assert 3 == window.max()
+    assert 2 == window.mean()
+
+
+def test_on_message_decodes_inverter_response(sample_measurement,
+                                              aggregator, clock):
+    aggregator.on_message(None, None, FakeMessage(
+        'inverter/response/' + sample_measurement, b'52,5'))
+    aggregator.on_message(None, None, FakeMessage(
+        'inverter/response/unknown', b'1'))
+    assert 52.5 == aggregator.moving_max(sample_measurement, '10s')
+
+
+def test_warm_loads_points_from_database(sample_data, sample_measurement):
+    database = FakeDatabase()
+    database.create_database('inverter')
+    database.write_points(get_points_with_interval(sample_data,
+                                                   sample_measurement),
+                          database='inverter')
+    aggregator = RollingAggregator([('max', sample_measurement, '1m')])
+    aggregator.warm(DatabaseClient(database))
+    assert max(sample_data) == aggregator.moving_max(sample_measurement, '1m')
+
+
+def test_on_snapshot_decodes_inverter_snapshot(sample_measurement,
+                                               aggregator):
+    aggregator.on_snapshot(None, None, FakeMessage(
+        'inverter/snapshot/QPIGS',
+        b'{"battery_voltage":"52.5","unknown":"1"}'))
+    assert 52.5 == aggregator.moving_max(sample_measurement, '10s')
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+
+import pytest
+from arinna.cli import parse_args
+from arinna.database_client import DatabaseClient, aggregate_query
+from arinna.memory_database import MemoryDatabase
+from arinna.rollup import ROLLUPS, continuous_query_statement, intervals
+from arinna.rollup import numeric_measurements, plan
+
+SECOND = 10 ** 9
+NOW = 10 ** 6 * SECOND
+
+
+@pytest.fixture
+def database():
+    d = MemoryDatabase(clock=lambda: NOW)
+    d.create_database('inverter')
+    write(d, None, [(10, 54.0), (100, 50.0)])
+    write(d, 'rollup_1m', [(3600, 51.0), (7200, 53.0)])
+    write(d, 'rollup_1h', [(86400, 48.0), (2 * 86400, 56.0)])
+    return d
+
+
+def write(database, retention_policy, points):
+    database.write_points([
+        {'measurement': 'battery_voltage',
+         'time': NOW - age * SECOND,
+         'fields': {'value': v} if retention_policy is None
+         else {'mean': v, 'min': v - 1, 'max': v + 1}}
+        for age, v in points],
+        database='inverter', retention_policy=retention_policy)
+
+
+def test_numeric_measurements():
+    assert numeric_measurements({
+        'battery_voltage': 'float',
+        'device_mode': 'int',
+        'is_load_on': 'bool',
+        'serial_number': 'str',
+    }) == ['battery_voltage', 'device_mode']
+
+
+def test_continuous_queries():
+    one_minute, one_hour = ROLLUPS
+    assert continuous_query_statement('inverter', 'battery_voltage',
+                                      one_minute) == \
+        'CREATE CONTINUOUS QUERY "battery_voltage_rollup_1m" ON "inverter" ' \
+        'BEGIN SELECT MEAN("value") AS "mean", MIN("value") AS "min", ' \
+        'MAX("value") AS "max" ' \
+        'INTO "inverter"."rollup_1m"."battery_voltage" ' \
+        'FROM "battery_voltage" GROUP BY time(1m) END'
+    assert continuous_query_statement('inverter', 'battery_voltage',
+                                      one_hour, 'rollup_1m') == \
+        'CREATE CONTINUOUS QUERY "battery_voltage_rollup_1h" ON "inverter" ' \
+        'BEGIN SELECT MEAN("mean") AS "mean", MIN("min") AS "min", ' \
+        'MAX("max") AS "max" ' \
+        'INTO "inverter"."rollup_1h"."battery_voltage" ' \
+        'FROM "inverter"."rollup_1m"."battery_voltage" GROUP BY time(1h) END'
+
+
+def test_plan_skips_existing_continuous_queries():
+    statements = plan('inverter', ['battery_voltage', 'grid_voltage'],
+                      existing={'battery_voltage_rollup_1m'})
+    assert statements[:2] == [
+        'CREATE RETENTION POLICY "rollup_1m" ON "inverter" DURATION 52w '
+        'REPLICATION 1',
+        'CREATE RETENTION POLICY "rollup_1h" ON "inverter" DURATION 260w '
+        'REPLICATION 1',
+    ]
+    assert [s.split('"')[1] for s in statements[2:]] == [
+        'grid_voltage_rollup_1m',
+        'battery_voltage_rollup_1h',
+        'grid_voltage_rollup_1h',
+    ]
+
+
+def test_plan_replace_and_backfill():
+    statements = plan('inverter', ['battery_voltage'],
+                      existing={'battery_voltage_rollup_1m'}, replace=True,
+                      backfill='52w')
+    assert statements[2] == \
+        'DROP CONTINUOUS QUERY "battery_voltage_rollup_1m" ON "inverter"'
+    assert statements[-2:] == [
+        'SELECT MEAN("value") AS "mean", MIN("value") AS "min", '
+        'MAX("value") AS "max" INTO "inverter"."rollup_1m"."battery_voltage" '
+        'FROM "battery_voltage" WHERE time > now() - 52w GROUP BY time(1m)',
+        'SELECT MEAN("mean") AS "mean", MIN("min") AS "min", '
+        'MAX("max") AS "max" INTO "inverter"."rollup_1h"."battery_voltage" '
+        'FROM "inverter"."rollup_1m"."battery_voltage" '
+        'WHERE time > now() - 52w GROUP BY time(1h)',
+    ]
+
+
+def test_rollup_aggregate_query():
+    assert aggregate_query('max', 'battery_voltage', '7d', 'rollup_1h') == \
+        'SELECT MAX("max") FROM "rollup_1h"."battery_voltage" ' \
+        'WHERE time > now() - 7d'
+
+
+def test_rollup_selection():
+    client = DatabaseClient(MemoryDatabase(), rollups=intervals())
+    assert client.rollup('average', '30m') is None
+    assert client.rollup('average', '1h') == 'rollup_1m'
+    assert client.rollup('min', '59h') == 'rollup_1m'
+    assert client.rollup('max', '60h') == 'rollup_1h'
+    assert client.rollup('stddev', '60h') is None
+    assert client.rollup('true_percentage', '60h') is None
+
+
+def test_moving_aggregates_use_rollups(database):
+    client = DatabaseClient(database, rollups=intervals())
+    assert client.moving_average('battery_voltage', '1m') == 54.0
+    assert client.moving_average('battery_voltage', '3h') == 52.0
+    assert client.moving_min('battery_voltage', '3h') == 50.0
+    assert client.moving_max('battery_voltage', '3d') == 57.0
+    assert client.moving_stddev('battery_voltage', '3d') == \
+        pytest.approx(2.828, abs=1e-3)
+    assert client.moving_aggregates([
+        ('average', 'battery_voltage', '3d'),
+        ('average', 'battery_voltage', '30s'),
+    ]) == {
+        ('average', 'battery_voltage', '3d'): 52.0,
+        ('average', 'battery_voltage', '30s'): 54.0,
+    }
+
+
+def test_moving_aggregates_without_rollups(database):
+    client = DatabaseClient(database)
+    assert client.moving_average('battery_voltage', '3d') == 52.0
+    assert client.moving_max('battery_voltage', '3d') == 54.0
+
+
+def test_rollups_command():
+    args = parse_args(['rollups', '--dry-run', '--backfill', '4w'])
+    assert args.dry_run
+    assert args.backfill == '4w'
+    assert args.database == 'inverter'
@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+
+import threading
+import time
+from arinna.scheduler import PeriodicScheduler
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_scheduler_runs_task_given_number_of_times():
+    calls = []
+    scheduler = PeriodicScheduler(0.001, lambda: calls.append(1))
+    scheduler.run(iterations=3)
+    assert 3 == len(calls)
+    assert 3 == scheduler.runs
+
+
+def test_scheduler_survives_failing_task():
+    def task():
+        raise RuntimeError('Failure')
+
+    scheduler = PeriodicScheduler(0.001, task)
+    scheduler.run(iterations=2)
+    assert 2 == scheduler.runs
+
+
+def test_scheduler_skips_overrun_periods():
+    clock = FakeClock()
+
+    def task():
+        clock.now += 0.025
+
+    scheduler = PeriodicScheduler(0.01, task, clock=clock)
+    scheduler.run(iterations=2)
+    assert 2 == scheduler.skipped_runs
+
+
+def test_scheduler_stops():
+    scheduler = PeriodicScheduler(60, lambda: None)
+    t = threading.Thread(target=scheduler.run)
+    t.start()
+    time_end = time.time() + 5
+    while time.time() < time_end and not scheduler.runs:
+        time.sleep(0.01)
+    scheduler.stop()
+    t.join(timeout=5)
+    assert False is t.is_alive()
+    assert 1 == scheduler.runs
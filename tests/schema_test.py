@@ -0,0 +1,27 @@
+#!/usr/bin/env python3
+
+import pytest
+import arinna.schema as schema
+
+
+def test_decoders_cover_every_schema_field():
+    decoders = schema.load_decoders()
+    assert schema.load().keys() == decoders.keys()
+    for name, (measurement, _) in decoders.items():
+        assert name == measurement
+
+
+def test_decoders_parse_payloads():
+    decoders = schema.load_decoders()
+    assert 52.5 == decoders['battery_voltage'][1](b'52,5')
+    assert 52.5 == decoders['battery_voltage'][1](b'52.5')
+    assert 161 == decoders['ac_output_apparent_power'][1](b'0161')
+    assert 0.03 == decoders['output_load_percent'][1](b'003')
+    assert True is decoders['is_load_on'][1](b'1')
+    assert False is decoders['is_load_on'][1](b'0')
+    assert 3 == decoders['device_mode'][1](b'Battery')
+
+
+def test_compile_decoders_rejects_unknown_parser():
+    with pytest.raises(ValueError):
+        schema.compile_decoders({'sample_measurement': 'unknown'})
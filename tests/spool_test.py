@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+
+import os
+import pytest
+from arinna.database_client import DatabaseClient
+from arinna.database_writer import DatabaseWriter, point
+from arinna.spool import Spool, SpoolReplayer, segment_name
+from tests.fakes.database import FakeDatabase
+
+
+class FailingDatabaseClient:
+    def __init__(self, failures):
+        self.failures = failures
+        self.points = []
+
+    def save_points(self, points):
+        if self.failures:
+            self.failures -= 1
+            raise ConnectionError('Database unavailable')
+        self.points.extend(points)
+
+
+@pytest.fixture
+def spool_path(tmp_path):
+    return str(tmp_path / 'spool')
+
+
+def points(values):
+    return [point('sample_measurement', v, i) for i, v in enumerate(values)]
+
+
+def test_spool_reads_appended_points(spool_path):
+    with Spool(spool_path) as spool:
+        spool.append(points([1, 2]))
+        spool.append(points([3]))
+        spooled, _ = spool.read(100)
+        assert [1, 2, 3] == [p['fields']['value'] for p in spooled]
+        assert spool.pending()
+
+
+def test_spool_does_not_return_committed_points_after_reopen(spool_path):
+    with Spool(spool_path) as spool:
+        spool.append(points([1]))
+        spool.append(points([2]))
+        spooled, position = spool.read(1)
+        spool.commit(position, len(spooled))
+    with Spool(spool_path) as spool:
+        spooled, _ = spool.read(100)
+        assert [2] == [p['fields']['value'] for p in spooled]
+        spool.append(points([3]))
+        spooled, _ = spool.read(100)
+        assert [2, 3] == [p['fields']['value'] for p in spooled]
+
+
+def test_spool_ignores_torn_record(spool_path):
+    with Spool(spool_path) as spool:
+        spool.append(points([1]))
+        offset = spool.write_offset
+        spool.append(points([2]))
+        spool.mmap[offset + 8] ^= 0xff
+    with Spool(spool_path) as spool:
+        assert offset == spool.write_offset
+        spooled, _ = spool.read(100)
+        assert [1] == [p['fields']['value'] for p in spooled]
+
+
+def test_spool_rolls_segments_and_evicts_oldest(spool_path):
+    with Spool(spool_path, max_bytes=2048, segment_bytes=1024) as spool:
+        for v in range(20):
+            spool.append(points([v] * 3))
+        assert 2 == len(spool.segments)
+        assert 0 < spool.evicted_segments
+        assert not os.path.exists(os.path.join(spool_path, segment_name(0)))
+        spooled, _ = spool.read(1000)
+        values = [p['fields']['value'] for p in spooled]
+        assert 19 == values[-1]
+        assert 0 not in values
+
+
+def test_spool_reads_across_segments(spool_path):
+    with Spool(spool_path, max_bytes=10240, segment_bytes=1024) as spool:
+        for v in range(20):
+            spool.append(points([v]))
+        assert 1 < len(spool.segments)
+        spooled, position = spool.read(1000)
+        assert list(range(20)) == [p['fields']['value'] for p in spooled]
+        spool.commit(position, len(spooled))
+        assert 1 == len(spool.segments)
+        assert not spool.pending()
+
+
+def test_replayer_backs_off_and_drains_spool(spool_path):
+    database = FailingDatabaseClient(failures=2)
+    with Spool(spool_path) as spool:
+        spool.append(points([1, 2]))
+        spool.append(points([3]))
+        replayer = SpoolReplayer(spool, database, batch_size=2, interval=1,
+                                 max_backoff=3)
+        assert 1 == replayer.replay()
+        assert 2 == replayer.replay()
+        assert 0 == replayer.replay()
+        assert 1 == replayer.replay()
+        assert [1, 2, 3] == [p['fields']['value'] for p in database.points]
+        assert 3 == spool.points_replayed
+        assert not spool.pending()
+
+
+def test_writer_spools_failed_flush(spool_path):
+    with Spool(spool_path) as spool:
+        writer = DatabaseWriter(
+            DatabaseClient(FakeDatabase(), db_name='missing'), spool=spool)
+        writer.add_points(points([1, 2]))
+        writer.flush()
+        assert 0 == writer.points_written
+        assert 2 == spool.points_spooled
+        spooled, _ = spool.read(100)
+        assert [1, 2] == [p['fields']['value'] for p in spooled]
@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+
+import os
+import subprocess
+import sys
+import pytest
+
+ENTRY_POINTS = [
+    'arinna.publisher',
+    'arinna.charger',
+    'arinna.load_balancer',
+    'arinna.database_provider',
+    'arinna.inverter_provider',
+    'arinna.cli',
+]
+
+HEAVY_MODULES = [
+    'influxdb',
+    'requests',
+    'dateutil',
+    'pytz',
+    'paho',
+    'yaml',
+    'mppsolar',
+    'serial',
+    'numpy',
+    'asyncio',
+    'http.server',
+]
+
+BUDGET_US = 120000
+RUNS = 3
+
+
+def run_python(*args):
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(sys.path))
+    return subprocess.run([sys.executable] + list(args), env=env,
+                          stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                          universal_newlines=True, check=True)
+
+
+def import_time(module):
+    result = run_python('-X', 'importtime', '-c', 'import ' + module)
+    for line in result.stderr.splitlines():
+        parts = line.split('|')
+        if len(parts) == 3 and parts[2].strip() == module:
+            return int(parts[1])
+    raise RuntimeError('No import time for {}'.format(module))
+
+
+@pytest.mark.parametrize('module', ENTRY_POINTS)
+def test_entry_point_does_not_import_heavy_modules(module):
+    result = run_python('-c', 'import sys, {}; print(\"\\n\".join('
+                              'sys.modules))'.format(module))
+    loaded = set(result.stdout.split())
+    assert [] == [m for m in HEAVY_MODULES if m in loaded]
+
+
+@pytest.mark.parametrize('module', ENTRY_POINTS)
+def test_entry_point_import_time(module):
+    best = min(import_time(module) for _ in range(RUNS))
+    assert best < BUDGET_US, \
+        '{} took {} us to import, budget is {} us'.format(module, best,
+                                                          BUDGET_US)
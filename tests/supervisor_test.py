@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+
+import contextlib
+import threading
+import time
+import pytest
+from arinna.config import Config
+from arinna.database_client import DatabaseClient
+from arinna.inverter_serial import InverterSerial
+from arinna.mqtt_client import MQTTClient
+from arinna.supervisor import Services, SupervisedTask
+from arinna.supervisor import Supervisor, enabled_components
+from tests.fakes.database import FakeDatabase
+from tests.fakes.mqtt import FakeBroker, FakePahoClient
+from tests.fakes.serial import FakeInverterSerial
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+def test_supervised_task_restarts_after_failure():
+    calls = []
+    stop_event = threading.Event()
+
+    def target():
+        calls.append(1)
+        if len(calls) < 3:
+            raise RuntimeError('Failure')
+        stop_event.wait()
+
+    task = SupervisedTask('sample_task', target, stop_event.set,
+                          restart_delay=0.001)
+    task.start()
+    assert wait_for(lambda: len(calls) == 3)
+    task.stop()
+    assert 2 == task.restarts
+    assert 3 == len(calls)
+
+
+def test_supervisor_stops_tasks():
+    stop_event = threading.Event()
+    supervisor = Supervisor()
+    task = supervisor.add('sample_task', stop_event.wait, stop_event.set)
+    with supervisor:
+        assert task.thread.is_alive()
+    assert task.thread is None
+    assert 0 == task.restarts
+
+
+def test_enabled_components():
+    settings = Config()
+    settings.settings['components'] = {'publisher': False}
+    assert ['database_provider', 'inverter_provider', 'load_balancer',
+            'charger'] == enabled_components(settings)
+    assert ['inverter_provider', 'charger'] == enabled_components(
+        settings, ['charger', 'inverter_provider'])
+    with pytest.raises(ValueError):
+        enabled_components(settings, ['unknown'])
+
+
+def test_services_share_mqtt_connection_and_writer():
+    settings = Config()
+    settings.settings['database_flush_interval'] = 0.01
+    broker = FakeBroker()
+    database = FakeDatabase()
+    database.create_database('inverter')
+    serial = InverterSerial(
+        '/dev/null', 2400,
+        serial_factory=lambda *args: FakeInverterSerial({'QMOD': b'B'}))
+    mqtt_client = MQTTClient(FakePahoClient(broker))
+    supervisor = Supervisor()
+    with contextlib.ExitStack() as stack:
+        Services(settings, supervisor, stack, mqtt_client,
+                 DatabaseClient(database), serial).build(
+            ['database_provider', 'inverter_provider'])
+        mqtt_client.connect()
+        mqtt_client.loop_start()
+        stack.callback(mqtt_client.loop_stop)
+        stack.enter_context(supervisor)
+        requester = FakePahoClient(broker)
+        assert wait_for(lambda: mqtt_client.mqtt_client.subscriptions)
+        requester.publish('inverter/request', 'QMOD')
+        assert wait_for(lambda: database.data['inverter'])
+    assert [mqtt_client.mqtt_client] == broker.clients
+    assert 'device_mode' == database.data['inverter'][0]['measurement']